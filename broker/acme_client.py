@@ -1,20 +1,276 @@
+import collections
 import datetime
+import json
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
-from acme.client import ClientV2
+import josepy
+from acme.client import ClientNetwork, ClientV2
 from acme import messages
-from acme import errors
+import requests
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+
+from broker.extensions import config, db, redis
+from broker.lib.acme_order_watcher import ACMEOrderWatcher
+from broker.lib.ca_health import CAHealth
+from broker.lib.issuance_quota import IssuanceQuota
+from broker.models import ACMEUser
+
+USER_AGENT = "cloud.gov external domain broker"
+
+# how many accounts' clients each worker thread keeps around
+MAX_CACHED_CLIENTS = 50
+
+_directories = {}
+_directories_lock = threading.Lock()
+_clients = threading.local()
+
+# the threads live as long as the worker, so their cached clients do too
+_executor = ThreadPoolExecutor(
+    max_workers=config.ACME_CONCURRENCY, thread_name_prefix="acme"
+)
+
+# what client_for needs from an ACMEUser, so other threads don't touch the model
+_Account = collections.namedtuple(
+    "_Account", "id private_key_pem registration_json acme_directory"
+)
+
+CertificateAuthority = collections.namedtuple(
+    "CertificateAuthority", "name directory eab_kid eab_hmac_key rate_limits"
+)
+
+# errors that are the CA's fault, rather than ours or the domain owner's
+CA_ERROR_CODES = {"serverInternal", "rateLimited"}
+
+
+def certificate_authorities() -> list[CertificateAuthority]:
+    """the CAs we can order certificates from, most preferred first"""
+    cas = config.ACME_CAS or [
+        {"name": "letsencrypt", "directory": config.ACME_DIRECTORY}
+    ]
+    return [
+        CertificateAuthority(
+            ca["name"],
+            ca["directory"],
+            ca.get("eab_kid"),
+            ca.get("eab_hmac_key"),
+            ca.get("rate_limits", config.ACME_RATE_LIMITS),
+        )
+        for ca in cas
+    ]
+
+
+def account_directory(acme_user) -> str:
+    """the directory of the CA `acme_user` is registered with"""
+    # accounts registered before we recorded it are with the original CA
+    return acme_user.acme_directory or config.ACME_DIRECTORY
 
 
 class AcmeClient(ClientV2):
-    def get_cert_for_finalized_order(self, orderr, deadline):
-        while datetime.datetime.now() < deadline:
-            time.sleep(1)
-            response = self._post_as_get(orderr.uri)
-            body = messages.Order.from_json(response.json())
-            if body.error is not None:
-                raise errors.IssuanceError(body.error)
-            if body.certificate is not None:
-                certificate_response = self._post_as_get(body.certificate).text
-                return orderr.update(body=body, fullchain_pem=certificate_response)
-        raise errors.TimeoutError()
+    def __init__(self, directory, net, directory_url=None):
+        super().__init__(directory, net=net)
+        # which CA this is, for tracking its health
+        self.directory_url = directory_url
+
+    def _post(self, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            response = super()._post(*args, **kwargs)
+        except messages.Error as e:
+            ca_health.record(
+                self.directory_url,
+                time.monotonic() - started,
+                ok=e.code not in CA_ERROR_CODES,
+            )
+            raise
+        except requests.exceptions.RequestException:
+            ca_health.record(self.directory_url, time.monotonic() - started, ok=False)
+            raise
+        ca_health.record(self.directory_url, time.monotonic() - started, ok=True)
+        return response
+
+    def get_order(self, order_uri) -> tuple[messages.Order, datetime.datetime]:
+        """the order, and when the CA would like us to check on it again"""
+        response = self._post_as_get(order_uri)
+        return messages.Order.from_json(response.json()), self.retry_after(
+            response, default=0
+        )
+
+    def get_authorization(self, url) -> messages.AuthorizationResource:
+        return self._authzr_from_response(self._post_as_get(url), uri=url)
+
+    def get_certificate(self, certificate_url) -> str:
+        """the fullchain PEM of a valid order's certificate"""
+        return self._post_as_get(certificate_url).text
+
+
+def get_directory(net: ClientNetwork, url: str) -> messages.Directory:
+    """the ACME directory at `url`, fetched at most once per TTL per worker"""
+    with _directories_lock:
+        cached = _directories.get(url)
+    if cached is not None:
+        fetched_at, directory = cached
+        if fetched_at > time.monotonic() - config.ACME_DIRECTORY_TTL_IN_SECONDS:
+            return directory
+    directory = messages.Directory.from_json(net.get(url).json())
+    with _directories_lock:
+        _directories[url] = (time.monotonic(), directory)
+    return directory
+
+
+def client_for(acme_user) -> AcmeClient:
+    """
+    a ready-to-use client for `acme_user`, shared by every step this worker
+    thread runs for the account.
+
+    Cached clients keep their HTTP session open, so steps skip parsing the
+    account key, fetching the directory, and setting up a new connection.
+    They also keep the nonce from the CA's last response, which saves a
+    newNonce request on the next step's first POST. If the CA has forgotten
+    the nonce by then, the POST is retried once after a badNonce error, which
+    still costs less than a new client. Clients idle for longer than
+    ACME_CLIENT_IDLE_TTL_IN_SECONDS are replaced. ClientNetwork isn't safe to
+    share between threads, so each thread has its own cache.
+    """
+    cache = getattr(_clients, "cache", None)
+    if cache is None:
+        cache = _clients.cache = collections.OrderedDict()
+
+    # the key's in there so a recycled ID can't get another account's client
+    directory_url = account_directory(acme_user)
+    key = (acme_user.id, acme_user.private_key_pem, directory_url)
+    cached = cache.pop(key, None)
+    if cached is not None:
+        net, last_used = cached
+        if last_used < time.monotonic() - config.ACME_CLIENT_IDLE_TTL_IN_SECONDS:
+            net.session.close()
+            cached = None
+    if cached is None:
+        net = _network_for(acme_user)
+
+    directory = get_directory(net, directory_url)
+    cache[key] = (net, time.monotonic())
+    while len(cache) > MAX_CACHED_CLIENTS:
+        net, _ = cache.popitem(last=False)[1]
+        net.session.close()
+    return AcmeClient(directory, net=net, directory_url=directory_url)
+
+
+def _network_for(acme_user) -> ClientNetwork:
+    account_key = serialization.load_pem_private_key(
+        acme_user.private_key_pem.encode(), password=None, backend=default_backend()
+    )
+    return ClientNetwork(
+        josepy.JWKRSA(key=account_key),
+        user_agent=USER_AGENT,
+        account=json.loads(acme_user.registration_json),
+    )
+
+
+def _submit_concurrently(acme_user, fn, items) -> list:
+    account = _Account(
+        acme_user.id,
+        acme_user.private_key_pem,
+        acme_user.registration_json,
+        acme_user.acme_directory,
+    )
+    return [
+        _executor.submit(lambda item: fn(client_for(account), item), item)
+        for item in items
+    ]
+
+
+def map_concurrently(acme_user, fn, items) -> list:
+    """
+    call `fn(client, item)` for each of `items` at the same time, each on an
+    ACME thread with its own client for `acme_user`. Returns the results in
+    order, or raises the first error once every call has finished.
+    """
+    futures = _submit_concurrently(acme_user, fn, items)
+    wait(futures)
+    return [future.result() for future in futures]
+
+
+def completed_concurrently(acme_user, fn, items):
+    """
+    like map_concurrently, but yields each item with its future as soon as its
+    call finishes, so callers can save what succeeded before handling errors
+    """
+    futures = dict(zip(_submit_concurrently(acme_user, fn, items), items))
+    for future in as_completed(futures):
+        yield futures[future], future
+
+
+def order_status(order: messages.Order, retry_after: datetime.datetime) -> dict:
+    """what ACMEOrderWatcher keeps about an order"""
+    return {
+        "status": order.status.name,
+        "certificate": order.certificate,
+        "error": None if order.error is None else order.error.to_json(),
+        "retry_after": retry_after.timestamp(),
+    }
+
+
+def _fetch_order_status(acme_user_id: int, order_uri: str) -> dict:
+    acme_user = db.session.get(ACMEUser, acme_user_id)
+    return order_status(*client_for(acme_user).get_order(order_uri))
+
+
+# polls the orders pipelines are waiting on for all of them
+order_watcher = ACMEOrderWatcher(
+    _fetch_order_status,
+    config.ACME_ORDER_WATCHER_ENABLED,
+    config.ACME_INITIAL_POLL_WAIT_TIME_IN_SECONDS,
+    config.ACME_ORDER_POLL_RATE,
+    redis,
+)
+
+# there's only something to choose between with more than one CA
+ca_health = CAHealth(
+    len(certificate_authorities()) > 1,
+    config.ACME_CA_MAX_ERROR_RATE,
+    config.ACME_CA_MAX_LATENCY_IN_SECONDS,
+    redis,
+)
+
+_quotas = {}
+
+
+def quota_for(ca: CertificateAuthority) -> IssuanceQuota:
+    """keeps issuance under the CA's rate limits across all workers"""
+    if ca.name not in _quotas:
+        _quotas[ca.name] = IssuanceQuota(
+            ca.name,
+            ca.rate_limits,
+            config.ACME_RATE_LIMITS_ENABLED,
+            redis,
+        )
+    return _quotas[ca.name]
+
+
+def certificate_authority_for(directory: str) -> CertificateAuthority | None:
+    for ca in certificate_authorities():
+        if ca.directory == directory:
+            return ca
+    return None
+
+
+def ranked_certificate_authorities(
+    preferred: str | None = None,
+) -> list[CertificateAuthority]:
+    """
+    the CAs in the order orders should try them: healthy ones before unhealthy
+    ones, then the `preferred` directory (e.g. the one that issued the current
+    certificate), then the configured order
+    """
+    cas = certificate_authorities()
+    return sorted(
+        cas,
+        key=lambda ca: (
+            not ca_health.is_healthy(ca.directory),
+            ca.directory != preferred,
+            cas.index(ca),
+        ),
+    )
@@ -40,6 +40,7 @@ from broker.lib.client_error import ClientError
 from broker.lib.tags import generate_instance_tags
 from broker.lib.utils import (
     parse_domain_options,
+    parse_key_type,
     validate_domain_name_changes,
 )
 from broker.models import (
@@ -191,6 +192,8 @@ class API(ServiceBroker):
         if not config.IGNORE_DUPLICATE_DOMAINS:
             validators.UniqueDomains(domain_names).validate()
 
+        key_type = parse_key_type(params)
+
         if details.plan_id == CDN_PLAN_ID:
             instance = provision_cdn_instance(instance_id, domain_names, params)
             queue = queue_all_cdn_provision_tasks_for_operation
@@ -222,6 +225,8 @@ class API(ServiceBroker):
         else:
             raise NotImplementedError()
 
+        instance.key_type = key_type
+
         self.logger.info("setting origin hostname")
         self.logger.info("creating operation")
 
@@ -329,11 +334,20 @@ class API(ServiceBroker):
         if has_domain_updates:
             instance.domain_names = domains_to_apply
 
-        if is_cdn_instance(instance) and not has_domain_updates:
+        # switching key types needs a new certificate, just like new domains
+        key_type = parse_key_type(params)
+        has_key_type_update = (
+            key_type is not None
+            and instance.current_certificate is not None
+            and instance.current_certificate.key_type != key_type
+        )
+        needs_new_certificate = has_domain_updates or has_key_type_update
+
+        if is_cdn_instance(instance) and not needs_new_certificate:
             self.logger.info("domains unchanged, no need for new certificate")
             instance.new_certificate = instance.current_certificate
 
-        noop = not has_domain_updates
+        noop = not needs_new_certificate
         if instance.instance_type == ServiceInstanceTypes.CDN.value:
             noop = False
 
@@ -407,7 +421,14 @@ class API(ServiceBroker):
             else:
                 raise ClientError("Updating to this service plan is not supported")
 
+        if key_type is not None:
+            # set late, since changing the instance's type drops changes
+            instance.key_type = key_type
+
         if noop:
+            if key_type is not None:
+                db.session.add(instance)
+                db.session.commit()
             return UpdateServiceSpec(False)
 
         operation = Operation(
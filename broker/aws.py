@@ -1,19 +1,40 @@
 import boto3
 
-from broker.extensions import config
+from broker.extensions import config, redis
+from broker.lib.aws_rate_limiter import AWSRateLimiter
+from broker.lib.aws_status_watcher import AWSStatusWatcher
 from broker.lib.cache_policy_manager import CachePolicyManager
 from broker.lib.origin_request_policy_manager import OriginRequestPolicyManager
+from broker.lib.route53_coalescer import Route53ChangeCoalescer
+
+# every worker shares these limits, so a wave of renewals is slowed down
+# instead of running into AWS throttling
+rate_limiter = AWSRateLimiter(config.AWS_RATE_LIMITS, redis)
 
 commercial_session = boto3.Session(
     region_name=config.AWS_COMMERCIAL_REGION,
     aws_access_key_id=config.AWS_COMMERCIAL_ACCESS_KEY_ID,
     aws_secret_access_key=config.AWS_COMMERCIAL_SECRET_ACCESS_KEY,
 )
-route53 = commercial_session.client("route53")
+route53 = rate_limiter.attach(commercial_session.client("route53"))
+# record changes from every worker, submitted together
+route53_changes = Route53ChangeCoalescer(
+    route53,
+    config.ROUTE53_ZONE_ID,
+    config.ROUTE53_CHANGE_WINDOW_IN_SECONDS,
+    redis,
+)
 # iam for cloudfront distributions needs to be in commercial
-iam_commercial = commercial_session.client("iam")
-cloudfront = commercial_session.client("cloudfront")
-shield = commercial_session.client("shield")
+iam_commercial = rate_limiter.attach(commercial_session.client("iam"))
+cloudfront = rate_limiter.attach(commercial_session.client("cloudfront"))
+shield = rate_limiter.attach(commercial_session.client("shield"))
+# shares the status of distributions and DNS changes pipelines are waiting on
+status_watcher = AWSStatusWatcher(
+    cloudfront,
+    route53,
+    config.AWS_STATUS_WATCHER_ENABLED,
+    redis,
+)
 
 # Some services need to explicitly use the global region
 commercial_global_session = boto3.Session(
@@ -21,15 +42,17 @@ commercial_global_session = boto3.Session(
     aws_access_key_id=config.AWS_COMMERCIAL_ACCESS_KEY_ID,
     aws_secret_access_key=config.AWS_COMMERCIAL_SECRET_ACCESS_KEY,
 )
-wafv2 = commercial_global_session.client("wafv2")
-cloudwatch_commercial = commercial_global_session.client("cloudwatch")
-sns_commercial = commercial_global_session.client("sns")
+wafv2 = rate_limiter.attach(commercial_global_session.client("wafv2"))
+cloudwatch_commercial = rate_limiter.attach(
+    commercial_global_session.client("cloudwatch")
+)
+sns_commercial = rate_limiter.attach(commercial_global_session.client("sns"))
 
 govcloud_session = boto3.Session(
     region_name=config.AWS_GOVCLOUD_REGION,
     aws_access_key_id=config.AWS_GOVCLOUD_ACCESS_KEY_ID,
     aws_secret_access_key=config.AWS_GOVCLOUD_SECRET_ACCESS_KEY,
 )
-alb = govcloud_session.client("elbv2")
+alb = rate_limiter.attach(govcloud_session.client("elbv2"))
 # iam for albs needs to be govcloud
-iam_govcloud = govcloud_session.client("iam")
+iam_govcloud = rate_limiter.attach(govcloud_session.client("iam"))
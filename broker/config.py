@@ -33,10 +33,27 @@ class Config:
         self.cfenv = AppEnv()
         self.FLASK_ENV = self.env("FLASK_ENV")
         self.TMPDIR = self.env("TMPDIR", "/app/tmp/")
-        # how long we wait for DNS before trying an acme challenge
+        self.DNS_PROPAGATION_CHECK_ENABLED = self.env.bool(
+            "DNS_PROPAGATION_CHECK_ENABLED", True
+        )
+        # the longest we wait for DNS to propagate before trying an acme
+        # challenge anyway. With the check enabled, we check every
+        # DNS_PROPAGATION_CHECK_INTERVAL seconds and answer as soon as the zone's
+        # nameservers and all the DNS_PROPAGATION_RESOLVERS ("host:port") see the
+        # TXT records. Without it, we always wait this long
         self.DNS_PROPAGATION_SLEEP_TIME = self.env.int(
             "DNS_PROPAGATION_SLEEP_TIME", 300
         )
+        self.DNS_PROPAGATION_CHECK_INTERVAL = self.env.int(
+            "DNS_PROPAGATION_CHECK_INTERVAL", 10
+        )
+        # how long each check can spend looking up the TXT records, in total
+        self.DNS_PROPAGATION_QUERY_TIMEOUT = self.env.int(
+            "DNS_PROPAGATION_QUERY_TIMEOUT", 5
+        )
+        self.DNS_PROPAGATION_RESOLVERS = self.env.list(
+            "DNS_PROPAGATION_RESOLVERS", ["8.8.8.8:53", "1.1.1.1:53", "9.9.9.9:53"]
+        )
         # how long we wait between updating DNS to point to a new ALB and removing the
         # certificate from an old ALB
         self.ALB_OVERLAP_SLEEP_TIME = self.env.int("ALB_OVERLAP_SLEEP_TIME", 900)
@@ -46,8 +63,83 @@ class Config:
         self.ACME_POLL_TIMEOUT_IN_SECONDS = self.env.int(
             "ACME_POLL_TIMEOUT_IN_SECONDS", 90
         )
+        # how many ACME accounts new service instances share. 0 registers a new
+        # account for every instance
+        self.ACME_ACCOUNT_POOL_SIZE = self.env.int("ACME_ACCOUNT_POOL_SIZE", 10)
+        # key type for certificates of instances that didn't ask for one, RSA or
+        # ECDSA (P-256)
+        self.DEFAULT_CERTIFICATE_KEY_TYPE = self.env.str(
+            "DEFAULT_CERTIFICATE_KEY_TYPE", "RSA"
+        ).upper()
+        # how many requests to the CA each worker makes at once, e.g. to answer
+        # every challenge for an instance together
+        self.ACME_CONCURRENCY = self.env.int("ACME_CONCURRENCY", 8)
+        # how long workers keep an account's ACME client around between uses.
+        # Steps for the same order run minutes apart, so this needs to be longer
+        # than the waits between them for the client to be reused
+        self.ACME_CLIENT_IDLE_TTL_IN_SECONDS = self.env.int(
+            "ACME_CLIENT_IDLE_TTL_IN_SECONDS", 900
+        )
+        # how long workers reuse the ACME directory before fetching it again
+        self.ACME_DIRECTORY_TTL_IN_SECONDS = self.env.int(
+            "ACME_DIRECTORY_TTL_IN_SECONDS", 3600
+        )
+        # ACME orders are checked starting at this interval, doubling up to
+        # ACME_POLL_WAIT_TIME_IN_SECONDS, for up to ACME_POLL_TIMEOUT_IN_SECONDS
+        self.ACME_INITIAL_POLL_WAIT_TIME_IN_SECONDS = 2
+        self.ACME_POLL_WAIT_TIME_IN_SECONDS = 30
+        # poll the ACME orders pipelines are waiting on from cron, see
+        # broker/lib/acme_order_watcher.py
+        self.ACME_ORDER_WATCHER_ENABLED = False
+        # requests per second cron makes to the CA checking on orders
+        self.ACME_ORDER_POLL_RATE = 5
+        # Let's Encrypt's rate limits, as [requests, window in seconds], see
+        # https://letsencrypt.org/docs/rate-limits/. New orders wait for room
+        # under them, see broker/lib/issuance_quota.py
+        self.ACME_RATE_LIMITS = {
+            "new_orders_per_account": [300, 3 * 60 * 60],
+            "certificates_per_registered_domain": [50, 7 * 24 * 60 * 60],
+            "certificates_per_exact_set": [5, 7 * 24 * 60 * 60],
+            "failed_validations_per_hostname": [5, 60 * 60],
+        }
+        self.ACME_RATE_LIMITS_ENABLED = False
+        # the CAs to order certificates from, most preferred first, as a list of
+        # {"name", "directory"} with optional "eab_kid" and "eab_hmac_key" for
+        # CAs that need external account binding, and "rate_limits" for CAs
+        # whose limits differ from ACME_RATE_LIMITS. None orders everything
+        # from ACME_DIRECTORY
+        self.ACME_CAS = None
+        # CAs with more of their recent requests failing than this, or taking
+        # this long on average, are only used when every other CA is too
+        self.ACME_CA_MAX_ERROR_RATE = 0.5
+        self.ACME_CA_MAX_LATENCY_IN_SECONDS = 10
         self.AWS_POLL_WAIT_TIME_IN_SECONDS = 60
         self.AWS_POLL_MAX_ATTEMPTS = 10
+        # Route53 changes are polled starting at this interval, doubling up to
+        # AWS_POLL_WAIT_TIME_IN_SECONDS
+        self.ROUTE53_INITIAL_POLL_WAIT_TIME_IN_SECONDS = 2
+        # requests per second allowed across all workers, by AWS service (e.g.
+        # "route53") or API (e.g. "cloudfront.UpdateDistribution"). See
+        # broker/lib/aws_rate_limiter.py
+        self.AWS_RATE_LIMITS = {}
+        # how long Route53 record changes are held so changes from other
+        # pipelines can be submitted in the same batch. 0 submits them right away
+        self.ROUTE53_CHANGE_WINDOW_IN_SECONDS = 0
+        # share CloudFront and Route53 statuses between pipelines through redis,
+        # see broker/lib/aws_status_watcher.py
+        self.AWS_STATUS_WATCHER_ENABLED = False
+        # create CDN distributions while their certificate is being issued,
+        # adding the certificate and domains once it is, see
+        # broker/pipelines/cdn.py
+        self.CDN_CREATE_DISTRIBUTION_EARLY = False
+        # how many certificate private keys cron keeps generated ahead of time,
+        # and how many processes it uses to generate them. Steps generate keys
+        # themselves when the pool is empty, so 0 turns the pool off
+        self.PRIVATE_KEY_POOL_SIZE = 0
+        self.PRIVATE_KEY_POOL_PROCESSES = 2
+        # renewals for certificates expiring within this many days are queued
+        # ahead of routine renewals
+        self.URGENT_RENEWAL_DAYS = self.env.int("URGENT_RENEWAL_DAYS", 7)
         self.IGNORE_DUPLICATE_DOMAINS = self.env.bool("IGNORE_DUPLICATE_DOMAINS", False)
 
         # https://docs.aws.amazon.com/Route53/latest/APIReference/API_AliasTarget.html
@@ -84,6 +176,28 @@ class Config:
             "Managed-AllViewerAndCloudFrontHeaders-2022-06",
         ]
 
+        # see https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/origin-shield.html#choose-origin-shield-region
+        self.ALLOWED_ORIGIN_SHIELD_REGIONS = [
+            "us-east-1",
+            "us-east-2",
+            "us-west-1",
+            "us-west-2",
+            "ap-south-1",
+            "ap-northeast-1",
+            "ap-northeast-2",
+            "ap-northeast-3",
+            "ap-southeast-1",
+            "ap-southeast-2",
+            "eu-central-1",
+            "eu-west-1",
+            "eu-west-2",
+            "sa-east-1",
+        ]
+
+        # see https://docs.aws.amazon.com/cloudfront/latest/APIReference/API_DistributionConfig.html#cloudfront-Type-DistributionConfig-HttpVersion
+        self.ALLOWED_HTTP_VERSIONS = ["http2", "http2and3"]
+        self.DEFAULT_HTTP_VERSION = "http2and3"
+
 
 class AppConfig(Config):
     """Base class for apps running in Cloud Foundry"""
@@ -160,6 +274,37 @@ class AppConfig(Config):
 
         self.WAF_CLOUDWATCH_LOG_GROUP_ARN = self.env("WAF_CLOUDWATCH_LOG_GROUP_ARN")
 
+        # These are a bit below the account-level limits AWS documents, since
+        # the API and anything else using the account share them too
+        self.AWS_RATE_LIMITS = self.env.json(
+            "AWS_RATE_LIMITS",
+            {
+                "route53": 4,
+                "cloudfront": 5,
+                "cloudfront.CreateDistribution": 1,
+                "cloudfront.UpdateDistribution": 1,
+                "iam": 10,
+                "elbv2": 10,
+            },
+        )
+        self.ROUTE53_CHANGE_WINDOW_IN_SECONDS = self.env.int(
+            "ROUTE53_CHANGE_WINDOW_IN_SECONDS", 2
+        )
+        self.PRIVATE_KEY_POOL_SIZE = self.env.int("PRIVATE_KEY_POOL_SIZE", 100)
+        self.PRIVATE_KEY_POOL_PROCESSES = self.env.int("PRIVATE_KEY_POOL_PROCESSES", 2)
+        self.AWS_STATUS_WATCHER_ENABLED = self.env.bool(
+            "AWS_STATUS_WATCHER_ENABLED", True
+        )
+        self.CDN_CREATE_DISTRIBUTION_EARLY = self.env.bool(
+            "CDN_CREATE_DISTRIBUTION_EARLY", False
+        )
+        self.ACME_ORDER_WATCHER_ENABLED = self.env.bool(
+            "ACME_ORDER_WATCHER_ENABLED", True
+        )
+        self.ACME_RATE_LIMITS = self.env.json("ACME_RATE_LIMITS", self.ACME_RATE_LIMITS)
+        self.ACME_RATE_LIMITS_ENABLED = self.env.bool("ACME_RATE_LIMITS_ENABLED", True)
+        self.ACME_CAS = self.env.json("ACME_CAS", None)
+
 
 class ProductionConfig(AppConfig):
     def __init__(self):
@@ -244,6 +389,7 @@ class DockerConfig(Config):
         self.BROKER_PASSWORD = "sekrit"
         self.ACME_DIRECTORY = "https://localhost:14000/dir"
         self.DNS_VERIFICATION_SERVER = "127.0.0.1:8053"
+        self.DNS_PROPAGATION_RESOLVERS = [self.DNS_VERIFICATION_SERVER]
         self.ROUTE53_ZONE_ID = "TestZoneID"
         self.DNS_ROOT_DOMAIN = "domains.cloud.test"
         self.DATABASE_ENCRYPTION_KEY = "Local Dev Encrytpion Key"
@@ -300,9 +446,12 @@ class LocalDebuggingConfig(DockerConfig):
 class TestConfig(DockerConfig):
     def __init__(self):
         super().__init__()
+        self.DNS_PROPAGATION_CHECK_ENABLED = False
         self.DNS_PROPAGATION_SLEEP_TIME = 0
         self.ALB_OVERLAP_SLEEP_TIME = 0
         self.ACME_POLL_TIMEOUT_IN_SECONDS = 10
+        self.ACME_INITIAL_POLL_WAIT_TIME_IN_SECONDS = 0.05
+        self.ACME_POLL_WAIT_TIME_IN_SECONDS = 0.2
         self.AWS_POLL_WAIT_TIME_IN_SECONDS = 0
         self.AWS_POLL_MAX_ATTEMPTS = 10
         # if you need to see what sqlalchemy is doing
@@ -1,13 +1,27 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import dns.exception
 import dns.resolver
 
 from broker.extensions import config
 
+logger = logging.getLogger(__name__)
+
 (_nameserver, _port) = config.DNS_VERIFICATION_SERVER.split(":")
 _root_dns = config.DNS_ROOT_DOMAIN
 _resolver = dns.resolver.Resolver(configure=False)
 _resolver.nameservers = [_nameserver]
 _resolver.port = int(_port)
 
+# the zone's nameservers, looked up the first time they're needed
+_authoritative_nameservers = None
+
+# checks ask every nameserver at once, so one that doesn't answer doesn't hold
+# up the others
+_executor = ThreadPoolExecutor(thread_name_prefix="dns")
+
 
 def get_cname(domain: str) -> str:
     try:
@@ -28,3 +42,100 @@ def acme_challenge_cname_target(domain: str) -> str:
 
 def acme_challenge_cname_name(domain: str) -> str:
     return f"_acme-challenge.{domain}"
+
+
+def get_txt(name: str, resolver: dns.resolver.Resolver = _resolver) -> list[str]:
+    try:
+        answers = resolver.resolve(name, "TXT")
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return []
+    return [b"".join(answer.strings).decode() for answer in answers]
+
+
+def _resolver_for(nameserver: str, port: int = 53) -> dns.resolver.Resolver:
+    resolver = dns.resolver.Resolver(configure=False)
+    resolver.nameservers = [nameserver]
+    resolver.port = port
+    return resolver
+
+
+def authoritative_nameservers() -> list[str]:
+    """addresses of the nameservers for the zone our TXT records are in"""
+    global _authoritative_nameservers
+    if _authoritative_nameservers is None:
+        addresses = []
+        for ns in _resolver.resolve(_root_dns, "NS"):
+            for answer in _resolver.resolve(ns.target, "A"):
+                addresses.append(answer.address)
+        _authoritative_nameservers = sorted(addresses)
+    return _authoritative_nameservers
+
+
+def _is_missing_challenges(
+    nameserver: str, port: int, is_authoritative: bool, records, deadline: float
+) -> bool:
+    resolver = _resolver_for(nameserver, port)
+    for name, contents in records:
+        if is_authoritative:
+            name = f"{name}.{_root_dns}"
+        resolver.lifetime = deadline - time.monotonic()
+        if resolver.lifetime <= 0:
+            return True
+        try:
+            found = contents in get_txt(name, resolver)
+        except dns.exception.DNSException as e:
+            logger.info(f"Couldn't look up {name} on {nameserver}: {e}")
+            found = False
+        if not found:
+            return True
+    return False
+
+
+def servers_missing_challenges(challenges) -> list[str]:
+    """
+    The nameservers that don't serve the TXT record for every challenge yet.
+
+    The zone's own nameservers are asked for the record itself, and each of
+    DNS_PROPAGATION_RESOLVERS is asked for it through the customer's
+    _acme-challenge CNAME, the same way the CA will look it up. The servers
+    are asked at the same time, and any that haven't answered for every
+    challenge within DNS_PROPAGATION_QUERY_TIMEOUT seconds count as missing.
+    """
+    try:
+        authoritative = authoritative_nameservers()
+    except dns.exception.DNSException:
+        logger.exception(f"Couldn't find the nameservers for {_root_dns}")
+        authoritative = []
+    checks = [(nameserver, 53, True) for nameserver in authoritative]
+    for server in config.DNS_PROPAGATION_RESOLVERS:
+        nameserver, port = server.split(":")
+        checks.append((nameserver, int(port), False))
+
+    # read them here, the checks don't run on this thread's database session
+    records = [
+        (challenge.validation_domain, challenge.validation_contents)
+        for challenge in challenges
+    ]
+    deadline = time.monotonic() + config.DNS_PROPAGATION_QUERY_TIMEOUT
+    futures = [
+        (
+            nameserver,
+            _executor.submit(
+                _is_missing_challenges,
+                nameserver,
+                port,
+                is_authoritative,
+                records,
+                deadline,
+            ),
+        )
+        for nameserver, port, is_authoritative in checks
+    ]
+    wait(
+        [future for _, future in futures], timeout=config.DNS_PROPAGATION_QUERY_TIMEOUT
+    )
+    return [
+        nameserver
+        for nameserver, future in futures
+        if not future.done() or future.result()
+    ]
@@ -1,8 +1,24 @@
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from redis import ConnectionPool, Redis, SSLConnection
 
 from broker.config import config_from_env
 
 config = config_from_env()
 db = SQLAlchemy(disable_autonaming=True)
 migrate = Migrate()
+
+if config.REDIS_SSL:
+    redis_kwargs = dict(connection_class=SSLConnection, ssl_cert_reqs=None)
+else:
+    redis_kwargs = dict()
+
+# one pool per process, shared by huey and everything else that keeps state in
+# redis
+redis_pool = ConnectionPool(
+    host=config.REDIS_HOST,
+    port=config.REDIS_PORT,
+    password=config.REDIS_PASSWORD,
+    **redis_kwargs,
+)
+redis = Redis(connection_pool=redis_pool)
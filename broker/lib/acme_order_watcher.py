@@ -0,0 +1,150 @@
+import json
+import logging
+import time
+
+from redis import Redis
+
+from broker.lib.redis_scripts import SAVE_IF_NEWER, TAKE_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# orders in these states don't change until the pipeline does something with
+# them (ready) or ever again (valid, invalid), so there's no point polling them
+SETTLED_STATUSES = {"ready", "valid", "invalid"}
+
+# statuses aren't trusted for long anyway, this just cleans them up
+STATUS_EXPIRES_IN_SECONDS = 60 * 60
+
+# steps re-register the orders they're waiting on every time they check, so
+# anything that hasn't been asked about for this long isn't being waited on
+WATCH_EXPIRES_IN_SECONDS = 15 * 60
+
+WATCH_KEY = "acme-orders:watching"
+# which account each watched order belongs to, so cron can poll it
+ACCOUNTS_KEY = "acme-orders:accounts"
+LOCK_KEY = "acme-orders:lock"
+
+
+class ACMEOrderWatcher:
+    """
+    Keeps the status of ACME orders that pipelines are waiting on in redis, so
+    a wave of issuances is polled by one worker instead of tying up a worker
+    per order.
+
+    Steps ask for an order's status no older than they can use, the same way
+    they ask AWSStatusWatcher about distributions. `refresh`, run by cron,
+    polls the orders being waited on that are due in one pass: each order is
+    checked no more often than every `interval` seconds, or later if the CA
+    asked for that with Retry-After, and every request to the CA takes a
+    token from a bucket shared by all workers, refilled at `rate` per second.
+    Orders that come due between passes are fetched by the steps waiting on
+    them.
+
+    `fetch(acme_user_id, order_uri)` gets an order's status from the CA, as a
+    dict with its `status`, `certificate` URL, `error`, and `retry_after` (a
+    timestamp).
+    """
+
+    def __init__(
+        self, fetch, enabled: bool, interval: float, rate: float, redis: Redis
+    ):
+        self.fetch = fetch
+        self.enabled = enabled
+        self.interval = interval
+        self.rate = rate
+        self.redis = redis
+        self._save_if_newer = None
+        self._take_token = None
+
+    def status_key(self, order_uri: str) -> str:
+        return f"acme-orders:{order_uri}"
+
+    def order(self, acme_user_id: int, order_uri: str, max_age: float) -> dict:
+        """the order's status, fetched no more than `max_age` seconds ago"""
+        if not self.enabled:
+            return self.fetch(acme_user_id, order_uri)
+
+        self.redis.zadd(WATCH_KEY, {order_uri: time.time()})
+        self.redis.hset(ACCOUNTS_KEY, order_uri, acme_user_id)
+        fetched_at, status = self.redis.hmget(
+            self.status_key(order_uri), "fetched_at", "status"
+        )
+        if fetched_at is not None and float(fetched_at) >= time.time() - max_age:
+            return json.loads(status)
+
+        fetched_at = time.time()
+        status = self._fetch(acme_user_id, order_uri)
+        self.save(order_uri, status, fetched_at)
+        return status
+
+    def save(self, order_uri: str, status: dict, fetched_at: float):
+        """
+        share a status the caller got from the CA itself, e.g. in the response
+        to finalizing the order, so nobody acts on the older one
+        """
+        if not self.enabled:
+            return
+        if self._save_if_newer is None:
+            self._save_if_newer = self.redis.register_script(SAVE_IF_NEWER)
+        self._save_if_newer(
+            keys=[self.status_key(order_uri)],
+            args=[fetched_at, json.dumps(status), STATUS_EXPIRES_IN_SECONDS],
+        )
+
+    def refresh(self):
+        """poll the orders that are due, unless another worker already is"""
+        if not self.enabled:
+            return
+        if not self.redis.set(LOCK_KEY, "locked", nx=True, px=60_000):
+            return
+        try:
+            self._refresh_due()
+        finally:
+            self.redis.delete(LOCK_KEY)
+
+    def _refresh_due(self):
+        for order_uri in self._watched():
+            fetched_at, status = self.redis.hmget(
+                self.status_key(order_uri), "fetched_at", "status"
+            )
+            due = time.time()
+            if status is not None:
+                status = json.loads(status)
+                if status["status"] in SETTLED_STATUSES:
+                    continue
+                due = max(float(fetched_at) + self.interval, status["retry_after"])
+            if due > time.time():
+                continue
+            acme_user_id = self.redis.hget(ACCOUNTS_KEY, order_uri)
+            if acme_user_id is None:
+                continue
+            fetched_at = time.time()
+            try:
+                status = self._fetch(int(acme_user_id), order_uri)
+            except Exception:
+                logger.exception(f"Couldn't check on ACME order {order_uri}")
+                continue
+            self.save(order_uri, status, fetched_at)
+
+    def _watched(self) -> list[str]:
+        expired = self.redis.zrangebyscore(
+            WATCH_KEY, "-inf", time.time() - WATCH_EXPIRES_IN_SECONDS
+        )
+        if expired:
+            self.redis.zrem(WATCH_KEY, *expired)
+            self.redis.hdel(ACCOUNTS_KEY, *expired)
+        return [order_uri.decode() for order_uri in self.redis.zrange(WATCH_KEY, 0, -1)]
+
+    def _fetch(self, acme_user_id, order_uri):
+        if self.rate:
+            if self._take_token is None:
+                self._take_token = self.redis.register_script(TAKE_TOKEN)
+            waited = float(
+                self._take_token(
+                    keys=["acme-rate-limit:orders"],
+                    args=[self.rate, max(self.rate, 1)],
+                )
+            )
+            if waited > 0:
+                time.sleep(waited)
+        return self.fetch(acme_user_id, order_uri)
@@ -0,0 +1,62 @@
+import logging
+import time
+
+from redis import Redis
+
+from broker.lib.redis_scripts import TAKE_TOKEN
+
+logger = logging.getLogger(__name__)
+
+
+class AWSRateLimiter:
+    """
+    Token buckets in redis, shared by every worker, that AWS API calls take a
+    token from before they're made.
+
+    Rates are requests per second, keyed by service (e.g. "route53") or by
+    service and API (e.g. "cloudfront.UpdateDistribution"). An API's own rate
+    wins over its service's, and APIs with neither aren't limited. Buckets are
+    per partition, so commercial and GovCloud calls don't share a bucket.
+    """
+
+    def __init__(self, rates: dict[str, float], redis: Redis):
+        self.rates = rates
+        self.redis = redis
+        self._take_token = None
+
+    def bucket_for(self, service: str, api: str) -> str | None:
+        for bucket in (f"{service}.{api}", service):
+            if self.rates.get(bucket):
+                return bucket
+        return None
+
+    def attach(self, client):
+        """make every call on this boto3 client wait for a token"""
+        partition = client.meta.partition
+
+        def wait_for_token(model, **kwargs):
+            self.wait(partition, model.service_model.service_name, model.name)
+
+        client.meta.events.register("before-call", wait_for_token)
+        return client
+
+    def wait(self, partition: str, service: str, api: str) -> float:
+        bucket = self.bucket_for(service, api)
+        if bucket is None:
+            return 0
+        rate = self.rates[bucket]
+        if self._take_token is None:
+            self._take_token = self.redis.register_script(TAKE_TOKEN)
+        waited = float(
+            self._take_token(
+                keys=[f"aws-rate-limit:{partition}:{bucket}"],
+                args=[rate, max(rate, 1)],
+            )
+        )
+        if waited > 0:
+            # log this in Prometheus format so it can be scraped into a metric
+            logger.info(
+                f'aws_rate_limit_wait_seconds{{partition="{partition}",service="{service}",api="{api}"}} {waited:.3f}'
+            )
+            time.sleep(waited)
+        return waited
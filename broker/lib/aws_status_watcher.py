@@ -0,0 +1,136 @@
+import json
+import logging
+import time
+
+from botocore.exceptions import ClientError
+from redis import Redis
+
+from broker.lib.redis_scripts import SAVE_IF_NEWER
+
+logger = logging.getLogger(__name__)
+
+# statuses aren't trusted for long anyway, this just cleans them up
+STATUS_EXPIRES_IN_SECONDS = 60 * 60
+
+# steps re-register what they're waiting on every time they check, so anything
+# that hasn't been asked about for this long isn't being waited on anymore
+WATCH_EXPIRES_IN_SECONDS = 15 * 60
+
+
+class AWSStatusWatcher:
+    """
+    Keeps the status of CloudFront distributions and Route53 changes that
+    pipelines are waiting on in redis, so every pipeline doesn't have to ask
+    AWS for itself.
+
+    Steps ask for a status no older than they can use (usually how long they
+    waited since their last check). A status that's too old, or missing, is
+    fetched from AWS and shared with everyone else. `refresh`, run by cron,
+    checks everything being waited on in bulk: one paginated list of
+    distributions, and one get_change per change ID no matter how many
+    pipelines share it.
+    """
+
+    def __init__(self, cloudfront, route53, enabled: bool, redis: Redis):
+        self.cloudfront = cloudfront
+        self.route53 = route53
+        self.enabled = enabled
+        self.redis = redis
+        self._save_if_newer = None
+
+    def watch_key(self, kind: str) -> str:
+        return f"aws-status:{kind}:watching"
+
+    def status_key(self, kind: str, resource_id: str) -> str:
+        return f"aws-status:{kind}:{resource_id}"
+
+    def distribution(self, distribution_id: str, max_age: float) -> dict:
+        """the distribution's `Status` and whether it's `Enabled`"""
+        return self._status(
+            "distribution", distribution_id, max_age, self._get_distribution
+        )
+
+    def change(self, change_id: str, max_age: float) -> str:
+        """the Route53 change's status"""
+        return self._status("change", change_id, max_age, self._get_change)
+
+    def refresh(self):
+        if not self.enabled:
+            return
+        self._refresh_distributions()
+        self._refresh_changes()
+
+    def _status(self, kind, resource_id, max_age, fetch):
+        if not self.enabled:
+            return fetch(resource_id)
+
+        self.redis.zadd(self.watch_key(kind), {resource_id: time.time()})
+        fetched_at, status = self.redis.hmget(
+            self.status_key(kind, resource_id), "fetched_at", "status"
+        )
+        if fetched_at is not None and float(fetched_at) >= time.time() - max_age:
+            return json.loads(status)
+
+        fetched_at = time.time()
+        status = fetch(resource_id)
+        self._save(kind, resource_id, status, fetched_at)
+        return status
+
+    def _save(self, kind, resource_id, status, fetched_at):
+        if self._save_if_newer is None:
+            self._save_if_newer = self.redis.register_script(SAVE_IF_NEWER)
+        self._save_if_newer(
+            keys=[self.status_key(kind, resource_id)],
+            args=[fetched_at, json.dumps(status), STATUS_EXPIRES_IN_SECONDS],
+        )
+
+    def _watched(self, kind) -> set[str]:
+        key = self.watch_key(kind)
+        self.redis.zremrangebyscore(key, "-inf", time.time() - WATCH_EXPIRES_IN_SECONDS)
+        return {resource_id.decode() for resource_id in self.redis.zrange(key, 0, -1)}
+
+    def _get_distribution(self, distribution_id):
+        distribution = self.cloudfront.get_distribution(Id=distribution_id)[
+            "Distribution"
+        ]
+        return {
+            "Status": distribution["Status"],
+            "Enabled": distribution["DistributionConfig"]["Enabled"],
+        }
+
+    def _get_change(self, change_id):
+        return self.route53.get_change(Id=change_id)["ChangeInfo"]["Status"]
+
+    def _refresh_distributions(self):
+        waiting = self._watched("distribution")
+        if not waiting:
+            return
+        fetched_at = time.time()
+        pages = 0
+        for page in self.cloudfront.get_paginator("list_distributions").paginate():
+            pages += 1
+            for summary in page["DistributionList"].get("Items", []):
+                if summary["Id"] in waiting:
+                    status = {
+                        "Status": summary["Status"],
+                        "Enabled": summary["Enabled"],
+                    }
+                    self._save("distribution", summary["Id"], status, fetched_at)
+                    waiting.discard(summary["Id"])
+            if not waiting:
+                break
+        logger.info(f"Refreshed CloudFront distribution statuses in {pages} requests")
+
+    def _refresh_changes(self):
+        for change_id in self._watched("change"):
+            status = self.redis.hget(self.status_key("change", change_id), "status")
+            if status is not None and json.loads(status) == "INSYNC":
+                # changes don't go back out of sync
+                continue
+            fetched_at = time.time()
+            try:
+                status = self._get_change(change_id)
+            except ClientError:
+                logger.exception(f"Couldn't check on Route53 change {change_id}")
+                continue
+            self._save("change", change_id, status, fetched_at)
@@ -0,0 +1,81 @@
+import logging
+import time
+
+from redis import Redis
+
+logger = logging.getLogger(__name__)
+
+# requests are counted in buckets of this many seconds...
+BUCKET_SECONDS = 60
+# ...and health is judged on this many of the most recent ones
+BUCKETS = 10
+
+# a CA needs at least this many recent requests before it's judged, so one
+# failed request doesn't take it out of rotation
+MIN_REQUESTS = 5
+
+
+class CAHealth:
+    """
+    Tracks how each ACME CA has been doing lately, in redis shared by every
+    worker: how many requests failed on the CA's end (errors from its server,
+    its rate limits, or not getting an answer) and how long requests took.
+
+    A CA is unhealthy when more than `max_error_rate` of its recent requests
+    failed, or they took `max_latency` seconds on average.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        max_error_rate: float,
+        max_latency: float,
+        redis: Redis,
+    ):
+        self.enabled = enabled
+        self.max_error_rate = max_error_rate
+        self.max_latency = max_latency
+        self.redis = redis
+
+    def bucket_key(self, directory: str, bucket: int) -> str:
+        return f"acme-ca-health:{directory}:{bucket}"
+
+    def record(self, directory: str, seconds: float, ok: bool):
+        if not self.enabled:
+            return
+        key = self.bucket_key(directory, int(time.time() // BUCKET_SECONDS))
+        pipeline = self.redis.pipeline()
+        pipeline.hincrby(key, "requests", 1)
+        pipeline.hincrby(key, "errors", 0 if ok else 1)
+        pipeline.hincrbyfloat(key, "seconds", seconds)
+        pipeline.expire(key, BUCKET_SECONDS * (BUCKETS + 1))
+        pipeline.execute()
+
+    def stats(self, directory: str) -> dict:
+        """the CA's recent `requests`, `error_rate`, and average `latency`"""
+        requests = errors = seconds = 0
+        if self.enabled:
+            current = int(time.time() // BUCKET_SECONDS)
+            pipeline = self.redis.pipeline()
+            for bucket in range(current - BUCKETS + 1, current + 1):
+                pipeline.hmget(
+                    self.bucket_key(directory, bucket), "requests", "errors", "seconds"
+                )
+            for bucket_requests, bucket_errors, bucket_seconds in pipeline.execute():
+                requests += int(bucket_requests or 0)
+                errors += int(bucket_errors or 0)
+                seconds += float(bucket_seconds or 0)
+        return {
+            "requests": requests,
+            "error_rate": errors / requests if requests else 0,
+            "latency": seconds / requests if requests else 0,
+        }
+
+    def is_healthy(self, directory: str) -> bool:
+        stats = self.stats(directory)
+        if stats["requests"] < MIN_REQUESTS:
+            return True
+        return (
+            stats["error_rate"] <= self.max_error_rate
+            and stats["latency"] < self.max_latency
+        )
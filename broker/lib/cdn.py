@@ -72,6 +72,37 @@ def parse_origin_request_policy(
     return origin_request_policy_manager.get_managed_policy_id(origin_request_policy)
 
 
+def parse_origin_shield_region(params) -> str | None:
+    origin_shield_region = params.get("origin_shield_region", None)
+    if not origin_shield_region:
+        return None
+    if origin_shield_region not in config.ALLOWED_ORIGIN_SHIELD_REGIONS:
+        raise errors.ErrBadRequest(
+            f"'{origin_shield_region}' is not an allowed value for origin_shield_region."
+        )
+    return origin_shield_region
+
+
+def parse_http_version(params) -> str:
+    http_version = params.get("http_version", None)
+    if not http_version:
+        return config.DEFAULT_HTTP_VERSION
+    if http_version not in config.ALLOWED_HTTP_VERSIONS:
+        raise errors.ErrBadRequest(
+            f"'{http_version}' is not an allowed value for http_version."
+        )
+    return http_version
+
+
+def parse_compress(params) -> bool:
+    compress = params.get("compress", None)
+    if compress is None:
+        return True
+    if not isinstance(compress, bool):
+        raise errors.ErrBadRequest("'compress' must be true or false.")
+    return compress
+
+
 def provision_cdn_instance(
     instance_id: str,
     domain_names: list,
@@ -125,6 +156,10 @@ def provision_cdn_instance(
     if origin_request_policy_id:
         instance.origin_request_policy_id = origin_request_policy_id
 
+    instance.origin_shield_region = parse_origin_shield_region(params)
+    instance.http_version = parse_http_version(params)
+    instance.compress = parse_compress(params)
+
     return instance
 
 
@@ -195,6 +230,16 @@ def update_cdn_instance(params, instance):
     if origin_request_policy_id:
         instance.origin_request_policy_id = origin_request_policy_id
 
+    if "origin_shield_region" in params:
+        # unsetting it turns Origin Shield off
+        instance.origin_shield_region = parse_origin_shield_region(params)
+
+    # unsetting these goes back to the defaults
+    if "http_version" in params:
+        instance.http_version = parse_http_version(params)
+    if "compress" in params:
+        instance.compress = parse_compress(params)
+
     return instance
 
 
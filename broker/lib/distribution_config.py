@@ -0,0 +1,69 @@
+def diff(old, new, path: str = "") -> list[str]:
+    """
+    the paths where `new` differs from `old`, two CloudFront distribution
+    configs (or any JSON-like values), e.g. `Origins.Items[0].DomainName`
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key in sorted(old.keys() | new.keys()):
+            key_path = f"{path}.{key}" if path else key
+            if key not in old or key not in new:
+                changes.append(key_path)
+            else:
+                changes += diff(old[key], new[key], key_path)
+        return changes
+    if isinstance(old, list) and isinstance(new, list):
+        if len(old) != len(new):
+            return [path]
+        changes = []
+        for i, (old_item, new_item) in enumerate(zip(old, new)):
+            changes += diff(old_item, new_item, f"{path}[{i}]")
+        return changes
+    if old != new:
+        return [path]
+    return []
+
+
+# functions that edit a distribution config, by name, so an edit can be saved
+# with the operation and made by a later step
+EDITS = {}
+
+
+def distribution_edit(name: str):
+    """
+    register `fn(config, service_instance, **kwargs)`, which edits `config` in
+    place, as an edit steps can contribute to a DistributionConfigBuilder
+    """
+
+    def register(fn):
+        EDITS[name] = fn
+        return fn
+
+    return register
+
+
+class DistributionConfigBuilder:
+    """
+    Collects edits to a CloudFront distribution config from the steps of a
+    pipeline, so they're made in one update_distribution with one ETag, and
+    the pipeline waits for one deployment instead of one per edit.
+
+    Edits are kept as [name, kwargs] pairs naming registered functions, so
+    they can be saved between steps. Contributing an edit again replaces it,
+    so retried steps don't make it twice.
+    """
+
+    def __init__(self, edits: list | None = None):
+        self.edits = [list(edit) for edit in edits or []]
+
+    def add(self, name: str, **kwargs):
+        if name not in EDITS:
+            raise ValueError(f"unknown distribution config edit {name}")
+        self.edits = [edit for edit in self.edits if edit[0] != name]
+        self.edits.append([name, kwargs])
+
+    def build(self, config: dict, service_instance) -> dict:
+        """make every edit to `config`, in the order they were contributed"""
+        for name, kwargs in self.edits:
+            EDITS[name](config, service_instance, **kwargs)
+        return config
@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import math
+import time
+import uuid
+
+from redis import Redis
+
+logger = logging.getLogger(__name__)
+
+# Checks the sliding windows at KEYS against ARGV[2 + 3i] requests per
+# ARGV[3 + 3i] seconds. If they all have room, ARGV[1] is added to the ones
+# where ARGV[4 + 3i] is "1" and the script returns "0". Otherwise nothing is
+# added, and it returns how many seconds until they all would have room.
+ADMIT = """
+redis.replicate_commands()
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[3 * i - 1])
+    local window = tonumber(ARGV[3 * i])
+    redis.call("ZREMRANGEBYSCORE", key, "-inf", now - window)
+    local used = redis.call("ZCARD", key)
+    if redis.call("ZSCORE", key, ARGV[1]) then
+        -- already admitted, e.g. by an earlier try of the same step
+        used = used - 1
+    end
+    if used >= limit then
+        local oldest = redis.call("ZRANGE", key, used - limit, used - limit, "WITHSCORES")
+        wait = math.max(wait, tonumber(oldest[2]) + window - now)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    if ARGV[3 * i + 1] == "1" then
+        redis.call("ZADD", key, now, ARGV[1])
+        redis.call("EXPIRE", key, math.ceil(tonumber(ARGV[3 * i])))
+    end
+end
+return "0"
+"""
+
+# second-level labels that are part of the public suffix under country code
+# TLDs, e.g. co.uk and gov.au
+PUBLIC_SECOND_LEVEL_LABELS = {"ac", "co", "com", "edu", "gov", "net", "org"}
+
+
+def registered_domain(hostname: str) -> str:
+    """
+    the domain Let's Encrypt counts `hostname`'s certificates against: the
+    name just below its public suffix. We don't carry the public suffix list,
+    so this only knows about the common two-label suffixes under country codes.
+    """
+    labels = hostname.lower().rstrip(".").split(".")
+    size = 2
+    if (
+        len(labels) > 2
+        and len(labels[-1]) == 2
+        and labels[-2] in PUBLIC_SECOND_LEVEL_LABELS
+    ):
+        size = 3
+    return ".".join(labels[-size:])
+
+
+class IssuanceQuota:
+    """
+    Tracks how much of a CA's rate limits the broker has used, in sliding
+    windows in redis shared by every worker, so issuance waits for room
+    instead of running into the limits and failing. Each CA has its own
+    quota, named after it.
+
+    The limits are modeled on Let's Encrypt's.
+
+    `limits` maps each limit to `[requests, window in seconds]`:
+    - new_orders_per_account
+    - certificates_per_registered_domain (renewals don't count)
+    - certificates_per_exact_set of hostnames
+    - failed_validations_per_hostname, per account
+
+    Certificates are counted when their order is admitted, not when they're
+    issued, so orders that fail still count until their window passes. That
+    keeps a wave of orders in flight from overshooting a limit.
+    """
+
+    def __init__(self, name: str, limits: dict[str, list], enabled: bool, redis: Redis):
+        self.name = name
+        self.limits = limits
+        self.enabled = enabled
+        self.redis = redis
+        self._admit = None
+
+    def key(self, limit: str, key) -> str:
+        return f"acme-quota:{self.name}:{limit}:{key}"
+
+    def windows_for(
+        self, acme_user_id: int | None, domain_names: list[str], renewal: bool
+    ) -> list[tuple[str, float, float, bool]]:
+        """
+        the windows an order has to fit in, as (key, limit, window, whether the
+        order counts against it). Orders without an account yet skip the
+        per-account windows.
+        """
+        windows = []
+
+        def add(limit, key, counts=True):
+            if limit in self.limits:
+                requests, seconds = self.limits[limit]
+                windows.append((self.key(limit, key), requests, seconds, counts))
+
+        if acme_user_id is not None:
+            add("new_orders_per_account", acme_user_id)
+        if not renewal:
+            for domain in sorted({registered_domain(name) for name in domain_names}):
+                add("certificates_per_registered_domain", domain)
+        exact_set = ",".join(sorted(name.lower() for name in domain_names))
+        add(
+            "certificates_per_exact_set",
+            hashlib.sha256(exact_set.encode()).hexdigest(),
+        )
+        if acme_user_id is not None:
+            for name in sorted(domain_names):
+                add(
+                    "failed_validations_per_hostname",
+                    f"{acme_user_id}:{name.lower()}",
+                    counts=False,
+                )
+        return windows
+
+    def admit(
+        self,
+        order_id: str,
+        acme_user_id: int | None,
+        domain_names: list[str],
+        renewal: bool,
+        check_only: bool = False,
+    ) -> float:
+        """
+        count the order identified by `order_id` against the limits, and return
+        0, if there's room for it. Otherwise, return how many seconds until
+        there is. Admitting the same order again doesn't count it twice, and
+        `check_only` doesn't count it at all.
+        """
+        if not self.enabled:
+            return 0
+        windows = self.windows_for(acme_user_id, domain_names, renewal)
+        if self._admit is None:
+            self._admit = self.redis.register_script(ADMIT)
+        args = [order_id]
+        for _, limit, window, counts in windows:
+            args += [limit, window, "1" if counts and not check_only else "0"]
+        return float(self._admit(keys=[key for key, *_ in windows], args=args))
+
+    def record_failure(self, acme_user_id: int, hostname: str):
+        """count a failed validation of `hostname` by the account"""
+        if not self.enabled or "failed_validations_per_hostname" not in self.limits:
+            return
+        _, window = self.limits["failed_validations_per_hostname"]
+        key = self.key(
+            "failed_validations_per_hostname", f"{acme_user_id}:{hostname.lower()}"
+        )
+        self.redis.zadd(key, {str(uuid.uuid4()): time.time()})
+        self.redis.expire(key, math.ceil(window))
+
+    def projected_start(self, orders: list[tuple[int, list[str], bool]]) -> float:
+        """
+        about when the last of `orders`, given as (acme_user_id, domain_names,
+        renewal), will be admitted, if they're all waiting now. Windows slide,
+        so this is an upper bound.
+        """
+        now = time.time()
+        if not self.enabled:
+            return now
+        demand = {}
+        for order in orders:
+            for key, limit, window, counts in self.windows_for(*order):
+                if counts:
+                    requests, _, _ = demand.get(key, (0, limit, window))
+                    demand[key] = (requests + 1, limit, window)
+        projected = now
+        for key, (requests, limit, window) in demand.items():
+            used = self.redis.zcount(key, now - window, "+inf")
+            waiting = requests - max(0, limit - used)
+            if waiting > 0:
+                projected = max(projected, now + math.ceil(waiting / limit) * window)
+        return projected
@@ -0,0 +1,46 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import OpenSSL
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+# key generation is background work, so the processes doing it yield to the
+# workers running pipelines
+NICENESS = 10
+
+
+def generate_ecdsa_private_key_pem() -> str:
+    # quick enough to generate inline, so these aren't pooled
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    return private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode("utf-8")
+
+
+def generate_private_key_pem() -> str:
+    private_key = OpenSSL.crypto.PKey()
+    private_key.generate_key(OpenSSL.crypto.TYPE_RSA, 2048)
+    return OpenSSL.crypto.dump_privatekey(
+        OpenSSL.crypto.FILETYPE_PEM, private_key
+    ).decode("utf-8")
+
+
+def generate_private_key_pems(count: int, processes: int) -> list[str]:
+    """generate `count` private keys in a pool of low-priority processes"""
+    # workers are threaded, and forking a threaded process can copy a held
+    # lock, so the processes start fresh instead
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=os.nice,
+        initargs=(NICENESS,),
+    ) as pool:
+        return list(pool.map(_generate, range(count)))
+
+
+def _generate(_) -> str:
+    return generate_private_key_pem()
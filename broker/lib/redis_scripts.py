@@ -0,0 +1,36 @@
+# Lua scripts shared by the helpers that keep state in redis
+
+# Takes a token from the bucket at KEYS[1], refilling it at ARGV[1] tokens per
+# second up to ARGV[2] tokens. If the bucket is empty, the token is reserved
+# anyway (the bucket goes negative), and the script returns how many seconds the
+# caller has to wait before using it. Reserving keeps callers in the order they
+# asked, instead of having every worker poll for the next free token.
+TAKE_TOKEN = """
+redis.replicate_commands()
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - updated_at) * rate) - 1
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+if tokens >= 0 then
+    return "0"
+end
+return tostring(-tokens / rate)
+"""
+
+# Saves ARGV[2] as the status at KEYS[1] unless what's there was fetched after
+# ARGV[1], so a slow bulk check can't overwrite a newer status.
+SAVE_IF_NEWER = """
+local fetched_at = redis.call("HGET", KEYS[1], "fetched_at")
+if fetched_at and tonumber(fetched_at) > tonumber(ARGV[1]) then
+    return 0
+end
+redis.call("HSET", KEYS[1], "fetched_at", ARGV[1], "status", ARGV[2])
+redis.call("EXPIRE", KEYS[1], ARGV[3])
+return 1
+"""
@@ -0,0 +1,128 @@
+import random
+from enum import Enum
+
+import requests
+from acme import errors as acme_errors
+from acme import messages as acme_messages
+from botocore.exceptions import ClientError as BotoClientError
+from botocore.exceptions import ConnectionError as BotoConnectionError
+from botocore.exceptions import HTTPClientError
+from sqlalchemy import exc as sqlalchemy_errors
+
+
+class Retry(Enum):
+    # transient: retry in seconds, backing off
+    FAST = "fast"
+    # unknown or slow to clear up: retry on the task's normal schedule
+    SLOW = "slow"
+    # will never work: fail the operation now
+    NEVER = "never"
+
+
+# AWS error codes for throttling and blips on AWS's side
+FAST_RETRY_AWS_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestLimitExceeded",
+    "TooManyRequestsException",
+    "PriorRequestNotComplete",
+    "ServiceUnavailable",
+    "ServiceUnavailableException",
+    "InternalError",
+    "InternalFailure",
+    "InternalServiceError",
+    "RequestTimeout",
+    "RequestTimeoutException",
+}
+
+# AWS error codes that mean the request itself is wrong
+NEVER_RETRY_AWS_CODES = {
+    "AccessDenied",
+    "AccessDeniedException",
+    "InvalidChangeBatch",
+    "InvalidInput",
+    "MalformedCertificate",
+    "NoSuchEntity",
+    "UnauthorizedOperation",
+    "ValidationError",
+}
+
+FAST_RETRY_ACME_CODES = {"badNonce"}
+
+NEVER_RETRY_ACME_CODES = {
+    "caa",
+    "malformed",
+    "rejectedIdentifier",
+    "unauthorized",
+    "unsupportedIdentifier",
+}
+
+
+class RetryPolicy:
+    """
+    Decides how a failed pipeline step is retried based on what it raised.
+
+    Fast retries start at `fast_delay` seconds and double each attempt up to
+    `max_fast_delay`, with jitter so steps that failed together don't retry
+    together. Slow retries wait `slow_delay` seconds.
+    """
+
+    def __init__(
+        self,
+        fast_delay: int = 2,
+        max_fast_delay: int = 5 * 60,
+        slow_delay: int = 10 * 60,
+        fast_retry_aws_codes: set[str] = FAST_RETRY_AWS_CODES,
+        never_retry_aws_codes: set[str] = NEVER_RETRY_AWS_CODES,
+    ):
+        self.fast_delay = fast_delay
+        self.max_fast_delay = max_fast_delay
+        self.slow_delay = slow_delay
+        self.fast_retry_aws_codes = fast_retry_aws_codes
+        self.never_retry_aws_codes = never_retry_aws_codes
+
+    def classify(self, e: Exception) -> Retry:
+        if isinstance(e, BotoClientError):
+            code = e.response.get("Error", {}).get("Code")
+            if code in self.fast_retry_aws_codes:
+                return Retry.FAST
+            if code in self.never_retry_aws_codes:
+                return Retry.NEVER
+            return Retry.SLOW
+        if isinstance(
+            e,
+            (
+                BotoConnectionError,
+                HTTPClientError,
+                requests.ConnectionError,
+                requests.Timeout,
+            ),
+        ):
+            return Retry.FAST
+        if isinstance(e, acme_errors.ValidationError):
+            # the authorizations are invalid now, so only a new order can work
+            return Retry.NEVER
+        if isinstance(e, acme_errors.BadNonce):
+            return Retry.FAST
+        if isinstance(e, acme_messages.Error):
+            if e.code in FAST_RETRY_ACME_CODES:
+                return Retry.FAST
+            if e.code in NEVER_RETRY_ACME_CODES:
+                return Retry.NEVER
+            return Retry.SLOW
+        if isinstance(
+            e, (sqlalchemy_errors.OperationalError, sqlalchemy_errors.InterfaceError)
+        ):
+            return Retry.FAST
+        return Retry.SLOW
+
+    def delay(self, retry: Retry, attempt: int) -> int:
+        """how long to wait before retry number `attempt` (starting at 0)"""
+        if retry != Retry.FAST:
+            return self.slow_delay
+        delay = min(self.max_fast_delay, self.fast_delay * 2**attempt)
+        return round(delay / 2 + random.uniform(0, delay / 2))
+
+
+default_retry_policy = RetryPolicy()
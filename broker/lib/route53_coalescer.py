@@ -0,0 +1,220 @@
+import json
+import logging
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+from redis import Redis
+
+from broker.lib.retry_policy import default_retry_policy, Retry
+
+logger = logging.getLogger(__name__)
+
+# Route53 rejects batches with more records or more characters of record
+# values than this, and counts each UPSERT twice toward both
+MAX_RECORDS_PER_BATCH = 1000
+MAX_CHARACTERS_PER_BATCH = 32_000
+
+TICKET_PREFIX = "ticket:"
+
+
+def _batch_size(changes: list[dict]) -> tuple[int, int]:
+    records = characters = 0
+    for change in changes:
+        values = [
+            record["Value"]
+            for record in change["ResourceRecordSet"].get("ResourceRecords", [])
+        ]
+        weight = 2 if change["Action"] == "UPSERT" else 1
+        # alias records don't have values, but still count as a record
+        records += weight * max(len(values), 1)
+        characters += weight * sum(len(value) for value in values)
+    return records, characters
+
+
+def _fits_in_batch(size: tuple[int, int]) -> bool:
+    records, characters = size
+    return records <= MAX_RECORDS_PER_BATCH and characters <= MAX_CHARACTERS_PER_BATCH
+
+
+def chunk_changes(changes: list[dict]) -> list[list[dict]]:
+    """split `changes` into as few batches as Route53 will accept"""
+    chunks = []
+    for change in changes:
+        if chunks and _fits_in_batch(_batch_size(chunks[-1] + [change])):
+            chunks[-1].append(change)
+        else:
+            chunks.append([change])
+    return chunks
+
+
+class Route53ChangeCoalescer:
+    """
+    Gathers record changes from every worker into shared ChangeBatches, so a
+    wave of pipelines changing DNS at once makes a handful of
+    change_resource_record_sets calls instead of one each.
+
+    `submit` queues changes in redis and returns a ticket. Once the oldest
+    queued changes have waited `window` seconds, the next `resolve` (or the
+    cron flush) submits everything queued and tickets resolve to the shared
+    change ID. A window of 0 turns coalescing off: changes are submitted
+    right away and `submit` returns the change ID itself.
+    """
+
+    def __init__(self, route53, zone_id: str, window: float, redis: Redis):
+        self.route53 = route53
+        self.zone_id = zone_id
+        self.window = window
+        self.redis = redis
+
+    @property
+    def pending_key(self):
+        return f"route53-changes:{self.zone_id}:pending"
+
+    @property
+    def lock_key(self):
+        return f"route53-changes:{self.zone_id}:lock"
+
+    def result_key(self, ticket: str):
+        return f"route53-changes:{self.zone_id}:result:{ticket}"
+
+    def submit(self, changes: list[dict], ignore_errors: bool = False) -> str | None:
+        """
+        queue `changes`, which must fit in one batch (see `chunk_changes`),
+        returning a ticket to pass to `resolve`.
+
+        Errors for `ignore_errors` changes are logged instead of raised, and
+        don't stop the other changes from going through. They aren't tracked,
+        so there's no ticket.
+        """
+        if self.window <= 0:
+            return self._submit_now(changes, ignore_errors)
+        if ignore_errors:
+            # queued separately, so a missing record only fails its own ticket
+            for change in changes:
+                self._queue([change], ignore_errors)
+            return None
+        return self._queue(changes, ignore_errors)
+
+    def _queue(self, changes: list[dict], ignore_errors: bool) -> str:
+        ticket = str(uuid.uuid4())
+        self.redis.rpush(
+            self.pending_key,
+            json.dumps(
+                {
+                    "ticket": ticket,
+                    "changes": changes,
+                    "ignore_errors": ignore_errors,
+                    "queued_at": time.time(),
+                }
+            ),
+        )
+        return f"{TICKET_PREFIX}{ticket}"
+
+    def resolve(self, change_id: str) -> str | None:
+        """
+        get the Route53 change ID for a ticket from `submit`, or None if its
+        changes haven't been submitted yet. Change IDs are returned as-is.
+        """
+        if not change_id.startswith(TICKET_PREFIX):
+            return change_id
+        ticket = change_id.removeprefix(TICKET_PREFIX)
+
+        result = self.redis.get(self.result_key(ticket))
+        if result is None and self.is_due():
+            self.flush()
+            result = self.redis.get(self.result_key(ticket))
+        if result is None:
+            return None
+
+        result = json.loads(result)
+        if "error" in result:
+            raise ClientError({"Error": result["error"]}, "ChangeResourceRecordSets")
+        return result["change_id"]
+
+    def is_due(self) -> bool:
+        oldest = self.redis.lindex(self.pending_key, 0)
+        if oldest is None:
+            return False
+        return json.loads(oldest)["queued_at"] + self.window <= time.time()
+
+    def flush(self):
+        """submit everything queued, if another worker isn't already"""
+        if not self.redis.set(self.lock_key, "locked", nx=True, px=60_000):
+            return
+        try:
+            while True:
+                queued = self._next_batch()
+                if not queued:
+                    return
+                self._submit_batch(queued)
+                self.redis.ltrim(self.pending_key, len(queued), -1)
+        finally:
+            self.redis.delete(self.lock_key)
+
+    def _next_batch(self) -> list[dict]:
+        batch = []
+        changes = []
+        for entry in self.redis.lrange(self.pending_key, 0, MAX_RECORDS_PER_BATCH - 1):
+            entry = json.loads(entry)
+            changes += entry["changes"]
+            if batch and not _fits_in_batch(_batch_size(changes)):
+                break
+            batch.append(entry)
+        return batch
+
+    def _submit_batch(self, queued: list[dict]):
+        changes = [change for entry in queued for change in entry["changes"]]
+        logger.info(
+            f"Submitting {len(changes)} Route53 changes for {len(queued)} tickets"
+        )
+        try:
+            change_id = self._change_resource_record_sets(changes)
+        except ClientError as e:
+            # anything that might work next time stays queued
+            if default_retry_policy.classify(e) != Retry.NEVER:
+                raise
+            if len(queued) == 1:
+                self._save_error(queued[0], e)
+                return
+            # one bad change fails the whole batch, so find out whose it is
+            # by submitting each ticket's changes on their own
+            logger.info("Route53 rejected the batch, submitting tickets separately")
+            for entry in queued:
+                self._submit_batch([entry])
+            return
+        for entry in queued:
+            self._save_result(entry, {"change_id": change_id})
+
+    def _save_error(self, entry: dict, e: ClientError):
+        if entry["ignore_errors"]:
+            logger.info("Ignoring error because we don't care")
+            return
+        self._save_result(entry, {"error": e.response["Error"]})
+
+    def _save_result(self, entry: dict, result: dict):
+        # long enough for a waiting pipeline to pick it up, even after
+        # being stalled and restarted
+        self.redis.set(
+            self.result_key(entry["ticket"]), json.dumps(result), ex=24 * 60 * 60
+        )
+
+    def _submit_now(self, changes: list[dict], ignore_errors: bool) -> str | None:
+        try:
+            return self._change_resource_record_sets(changes)
+        except:  # noqa E722
+            if not ignore_errors:
+                raise
+            logger.info("Ignoring error because we don't care")
+        if len(changes) > 1:
+            # one missing record fails the whole batch, so try the rest again
+            # a change at a time
+            for change in changes:
+                self._submit_now([change], ignore_errors)
+        return None
+
+    def _change_resource_record_sets(self, changes: list[dict]) -> str:
+        response = self.route53.change_resource_record_sets(
+            ChangeBatch={"Changes": changes}, HostedZoneId=self.zone_id
+        )
+        return response["ChangeInfo"]["Id"]
@@ -1,8 +1,11 @@
 import logging
 
+from openbrokerapi import errors
+
 from broker import validators
 from broker.models import (
     CDNServiceInstance,
+    KeyTypes,
 )
 
 logger = logging.getLogger(__name__)
@@ -54,6 +57,18 @@ def parse_domain_options(params) -> list[str]:
         return [d.strip().lower() for d in domains]
 
 
+def parse_key_type(params) -> str | None:
+    key_type = params.get("key_type")
+    if key_type is None:
+        return None
+    key_types = [key_type.value for key_type in KeyTypes]
+    if not isinstance(key_type, str) or key_type.upper() not in key_types:
+        raise errors.ErrBadRequest(
+            f"'key_type' must be one of {', '.join(key_types)}, case-insensitive."
+        )
+    return key_type.upper()
+
+
 def validate_domain_name_changes(requested_domain_names, instance) -> list[str]:
     if len(requested_domain_names) > 0:
         logger.info("validating CNAMEs")
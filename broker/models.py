@@ -28,6 +28,11 @@ class ServiceInstanceTypes(Enum):
     MIGRATION = "migration_service_instance"
 
 
+class KeyTypes(Enum):
+    RSA = "RSA"
+    ECDSA = "ECDSA"
+
+
 def db_encryption_key():
     return config.DATABASE_ENCRYPTION_KEY
 
@@ -53,10 +58,35 @@ class ACMEUser(Base):
     )
 
     registration_json = mapped_column(db.Text)
+    # pooled accounts are shared by many service instances, see create_user
+    pooled = mapped_column(db.Boolean, nullable=False, server_default="false")
+    acme_directory = mapped_column(db.String)
     service_instances = db.relation(
         "ServiceInstance", backref="acme_user", lazy="dynamic"
     )
 
+    @classmethod
+    def pool(cls, acme_directory) -> List[tuple["ACMEUser", int]]:
+        """
+        pooled accounts registered with `acme_directory`, with how many active
+        service instances use each, least used first
+        """
+        load = sa.func.count(ServiceInstance.id)
+        return (
+            db.session.query(cls, load)
+            .outerjoin(
+                ServiceInstance,
+                sa.and_(
+                    ServiceInstance.acme_user_id == cls.id,
+                    ServiceInstance.deactivated_at.is_(None),
+                ),
+            )
+            .filter(cls.pooled.is_(True), cls.acme_directory == acme_directory)
+            .group_by(cls.id)
+            .order_by(load, cls.id)
+            .all()
+        )
+
 
 class Certificate(Base):
     __tablename__ = "certificate"
@@ -79,6 +109,43 @@ class Certificate(Base):
         "Challenge", backref="certificate", lazy="dynamic", cascade="all, delete-orphan"
     )
     order_json = mapped_column(db.Text)
+    key_type = mapped_column(
+        db.String, nullable=False, server_default=KeyTypes.RSA.value
+    )
+    # the CA the certificate was ordered from, or None for certificates from
+    # before we recorded it, which came from ACME_DIRECTORY
+    acme_directory = mapped_column(db.String)
+    # when answer_challenges started waiting for the TXT records to propagate
+    dns_propagation_started_at = mapped_column(db.TIMESTAMP(timezone=True))
+
+
+class PooledPrivateKey(Base):
+    """a certificate private key generated ahead of time, see refill_key_pool"""
+
+    __tablename__ = "pooled_private_key"
+    id = mapped_column(db.Integer, primary_key=True)
+    private_key_pem = mapped_column(
+        StringEncryptedType(db.Text, db_encryption_key, AesGcmEngine, "pkcs5"),
+        nullable=False,
+    )
+
+    @classmethod
+    def take(cls) -> str | None:
+        """
+        remove a key from the pool and return it, or None if the pool is empty.
+        The key only leaves the pool when the caller commits.
+        """
+        pooled_key = (
+            db.session.query(cls)
+            .order_by(cls.id)
+            .with_for_update(skip_locked=True)
+            .limit(1)
+            .one_or_none()
+        )
+        if pooled_key is None:
+            return None
+        db.session.delete(pooled_key)
+        return pooled_key.private_key_pem
 
 
 class ServiceInstance(Base):
@@ -129,6 +196,11 @@ class ServiceInstance(Base):
 
     tags = mapped_column(postgresql.JSONB)
 
+    # the key type for this instance's certificates. None follows the
+    # broker's DEFAULT_CERTIFICATE_KEY_TYPE, so changing it moves existing
+    # instances over as they renew
+    key_type = mapped_column(db.String)
+
     __mapper_args__ = {
         "polymorphic_identity": "service_instance",
         "polymorphic_on": instance_type,
@@ -177,6 +249,12 @@ class CDNServiceInstance(ServiceInstance):
     origin_protocol_policy = mapped_column(db.String)
     cache_policy_id = mapped_column(db.String)
     origin_request_policy_id = mapped_column(db.String)
+    origin_shield_region = mapped_column(db.String)
+    http_version = mapped_column(db.String)
+    compress = mapped_column(db.Boolean)
+    # the DistributionConfig and Tags the broker last applied, so updates that
+    # wouldn't change anything can skip CloudFront
+    cloudfront_distribution_config = mapped_column(postgresql.JSONB)
 
     __mapper_args__ = {"polymorphic_identity": ServiceInstanceTypes.CDN.value}
 
@@ -300,6 +378,17 @@ class Operation(Base):
     action = mapped_column(db.String, nullable=False)
     canceled_at = mapped_column(db.TIMESTAMP(timezone=True))
     step_description = mapped_column(db.String)
+    # the last step of which pipeline this operation completed, so it can be
+    # resumed from the next step if it stalls
+    pipeline_name = mapped_column(db.String)
+    pipeline_step = mapped_column(db.Integer)
+    # the name of that step, to check the pipeline hasn't changed since
+    pipeline_step_name = mapped_column(db.String)
+    # which branches of the Parallel step after pipeline_step have completed
+    pipeline_branches = mapped_column(postgresql.JSONB, default=[])
+    # edits to the CloudFront distribution config that earlier steps
+    # contributed, for a later step to make in one update
+    distribution_config_edits = mapped_column(postgresql.JSONB, default=[])
 
     def __repr__(self):
         return f"<Operation {self.id} {self.state}>"
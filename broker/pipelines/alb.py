@@ -5,7 +5,26 @@ from broker.tasks import (
     letsencrypt,
     route53,
 )
-from broker.tasks.huey import huey
+from broker.tasks.huey import Pipeline
+
+alb_provision_pipeline = Pipeline(
+    "alb_provision",
+    [
+        letsencrypt.create_user,
+        letsencrypt.generate_private_key,
+        letsencrypt.initiate_challenges,
+        route53.create_TXT_records,
+        route53.wait_for_changes,
+        letsencrypt.answer_challenges,
+        letsencrypt.retrieve_certificate,
+        iam.upload_server_certificate,
+        alb.select_alb,
+        alb.add_certificate_to_alb,
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        update_operations.provision,
+    ],
+)
 
 
 def queue_all_alb_provision_tasks_for_operation(operation_id: int, correlation_id: str):
@@ -13,23 +32,20 @@ def queue_all_alb_provision_tasks_for_operation(operation_id: int, correlation_i
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        letsencrypt.create_user.s(operation_id, **correlation)
-        .then(letsencrypt.generate_private_key, operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(alb.select_alb, operation_id, **correlation)
-        .then(alb.add_certificate_to_alb, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(update_operations.provision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    alb_provision_pipeline.queue(operation_id, correlation_id)
+
+
+alb_deprovision_pipeline = Pipeline(
+    "alb_deprovision",
+    [
+        update_operations.cancel_pending_provisioning,
+        route53.remove_ALIAS_records,
+        route53.remove_TXT_records,
+        alb.remove_certificate_from_alb,
+        iam.delete_server_certificate,
+        update_operations.deprovision,
+    ],
+)
 
 
 def queue_all_alb_deprovision_tasks_for_operation(
@@ -39,56 +55,55 @@ def queue_all_alb_deprovision_tasks_for_operation(
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        update_operations.cancel_pending_provisioning.s(operation_id, **correlation)
-        .then(route53.remove_ALIAS_records, operation_id, **correlation)
-        .then(route53.remove_TXT_records, operation_id, **correlation)
-        .then(alb.remove_certificate_from_alb, operation_id, **correlation)
-        .then(iam.delete_server_certificate, operation_id, **correlation)
-        .then(update_operations.deprovision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    alb_deprovision_pipeline.queue(operation_id, correlation_id)
+
+
+alb_update_pipeline = Pipeline(
+    "alb_update",
+    [
+        letsencrypt.generate_private_key,
+        letsencrypt.initiate_challenges,
+        route53.create_TXT_records,
+        route53.wait_for_changes,
+        route53.remove_old_DNS_records,
+        letsencrypt.answer_challenges,
+        letsencrypt.retrieve_certificate,
+        iam.upload_server_certificate,
+        alb.select_alb,
+        alb.add_certificate_to_alb,
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        alb.remove_certificate_from_previous_alb,
+        iam.delete_previous_server_certificate,
+        update_operations.provision,
+    ],
+)
 
 
 def queue_all_alb_update_tasks_for_operation(operation_id, correlation_id):
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        letsencrypt.generate_private_key.s(operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(route53.remove_old_DNS_records, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(alb.select_alb, operation_id, **correlation)
-        .then(alb.add_certificate_to_alb, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(alb.remove_certificate_from_previous_alb, operation_id, **correlation)
-        .then(iam.delete_previous_server_certificate, operation_id, **correlation)
-        .then(update_operations.provision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    alb_update_pipeline.queue(operation_id, correlation_id)
+
+
+alb_renewal_pipeline = Pipeline(
+    "alb_renewal",
+    [
+        letsencrypt.generate_private_key,
+        letsencrypt.initiate_challenges,
+        route53.create_TXT_records,
+        route53.wait_for_changes,
+        letsencrypt.answer_challenges,
+        letsencrypt.retrieve_certificate,
+        iam.upload_server_certificate,
+        alb.select_alb,
+        alb.add_certificate_to_alb,
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        alb.remove_certificate_from_previous_alb,
+        iam.delete_previous_server_certificate,
+        update_operations.provision,
+    ],
+)
 
 
 def queue_all_alb_renewal_tasks_for_operation(operation_id, **kwargs):
-    correlation = {"correlation_id": "Renewal"}
-    task_pipeline = (
-        letsencrypt.generate_private_key.s(operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(alb.select_alb, operation_id, **correlation)
-        .then(alb.add_certificate_to_alb, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(alb.remove_certificate_from_previous_alb, operation_id, **correlation)
-        .then(iam.delete_previous_server_certificate, operation_id, **correlation)
-        .then(update_operations.provision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    alb_renewal_pipeline.queue(operation_id, "Renewal")
@@ -1,3 +1,4 @@
+from broker.extensions import config
 from broker.tasks import (
     update_operations,
     iam,
@@ -5,7 +6,54 @@ from broker.tasks import (
     route53,
     cloudfront,
 )
-from broker.tasks.huey import huey
+from broker.tasks.huey import Parallel, Pipeline
+
+cdn_provision_pipeline = Pipeline(
+    "cdn_provision",
+    [
+        letsencrypt.create_user,
+        letsencrypt.generate_private_key,
+        letsencrypt.initiate_challenges,
+        route53.create_TXT_records,
+        route53.wait_for_changes,
+        letsencrypt.answer_challenges,
+        letsencrypt.retrieve_certificate,
+        iam.upload_server_certificate,
+        cloudfront.create_distribution,
+        cloudfront.wait_for_distribution,
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        update_operations.provision,
+    ],
+)
+
+
+# The distribution takes longest to deploy, so this creates it while the
+# certificate is being issued, without the instance's domains, and adds them
+# along with the certificate once it's issued
+cdn_early_distribution_provision_pipeline = Pipeline(
+    "cdn_early_distribution_provision",
+    [
+        Parallel(
+            [
+                letsencrypt.create_user,
+                letsencrypt.generate_private_key,
+                letsencrypt.initiate_challenges,
+                route53.create_TXT_records,
+                route53.wait_for_changes,
+                letsencrypt.answer_challenges,
+                letsencrypt.retrieve_certificate,
+                iam.upload_server_certificate,
+            ],
+            [cloudfront.create_distribution_early],
+        ),
+        cloudfront.update_distribution,
+        cloudfront.wait_for_distribution,
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        update_operations.provision,
+    ],
+)
 
 
 def queue_all_cdn_provision_tasks_for_operation(operation_id: int, correlation_id: str):
@@ -13,23 +61,25 @@ def queue_all_cdn_provision_tasks_for_operation(operation_id: int, correlation_i
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        letsencrypt.create_user.s(operation_id, **correlation)
-        .then(letsencrypt.generate_private_key, operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(cloudfront.create_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(update_operations.provision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    if config.CDN_CREATE_DISTRIBUTION_EARLY:
+        cdn_early_distribution_provision_pipeline.queue(operation_id, correlation_id)
+    else:
+        cdn_provision_pipeline.queue(operation_id, correlation_id)
+
+
+cdn_deprovision_pipeline = Pipeline(
+    "cdn_deprovision",
+    [
+        update_operations.cancel_pending_provisioning,
+        route53.remove_ALIAS_records,
+        route53.remove_TXT_records,
+        cloudfront.disable_distribution,
+        cloudfront.wait_for_distribution_disabled,
+        cloudfront.delete_distribution,
+        iam.delete_server_certificate,
+        update_operations.deprovision,
+    ],
+)
 
 
 def queue_all_cdn_deprovision_tasks_for_operation(
@@ -39,53 +89,50 @@ def queue_all_cdn_deprovision_tasks_for_operation(
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        update_operations.cancel_pending_provisioning.s(operation_id, **correlation)
-        .then(route53.remove_ALIAS_records, operation_id, **correlation)
-        .then(route53.remove_TXT_records, operation_id, **correlation)
-        .then(cloudfront.disable_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution_disabled, operation_id, **correlation)
-        .then(cloudfront.delete_distribution, operation_id=operation_id, **correlation)
-        .then(iam.delete_server_certificate, operation_id, **correlation)
-        .then(update_operations.deprovision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    cdn_deprovision_pipeline.queue(operation_id, correlation_id)
+
+
+cdn_update_pipeline = Pipeline(
+    "cdn_update",
+    [
+        letsencrypt.generate_private_key,
+        letsencrypt.initiate_challenges,
+        route53.create_TXT_records,
+        route53.wait_for_changes,
+        route53.remove_old_DNS_records,
+        letsencrypt.answer_challenges,
+        letsencrypt.retrieve_certificate,
+        iam.upload_server_certificate,
+        cloudfront.update_distribution,
+        cloudfront.wait_for_distribution,
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        iam.delete_previous_server_certificate,
+        update_operations.update_complete,
+    ],
+)
 
 
 def queue_all_cdn_update_tasks_for_operation(operation_id, correlation_id):
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        letsencrypt.generate_private_key.s(operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(route53.remove_old_DNS_records, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(cloudfront.update_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(iam.delete_previous_server_certificate, operation_id, **correlation)
-        .then(update_operations.update_complete, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    cdn_update_pipeline.queue(operation_id, correlation_id)
+
+
+cdn_renewal_pipeline = Pipeline(
+    "cdn_renewal",
+    [
+        letsencrypt.generate_private_key,
+        letsencrypt.initiate_challenges,
+        route53.create_TXT_records,
+        route53.wait_for_changes,
+        letsencrypt.answer_challenges,
+        letsencrypt.retrieve_certificate,
+        iam.upload_server_certificate,
+        cloudfront.update_certificate,
+        iam.delete_previous_server_certificate,
+        update_operations.provision,
+    ],
+)
 
 
 def queue_all_cdn_renewal_tasks_for_operation(operation_id, **kwargs):
-    correlation = {"correlation_id": "Renewal"}
-    task_pipeline = (
-        letsencrypt.generate_private_key.s(operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(cloudfront.update_certificate, operation_id, **correlation)
-        .then(iam.delete_previous_server_certificate, operation_id, **correlation)
-        .then(update_operations.provision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    cdn_renewal_pipeline.queue(operation_id, "Renewal")
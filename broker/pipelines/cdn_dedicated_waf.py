@@ -1,5 +1,6 @@
 import logging
 
+from broker.extensions import config
 from broker.tasks import (
     cloudfront,
     update_operations,
@@ -11,11 +12,82 @@ from broker.tasks import (
     cloudwatch,
     sns,
 )
-from broker.tasks.huey import huey
+from broker.tasks.huey import Parallel, Pipeline
 
 logger = logging.getLogger(__name__)
 
 
+# The WAF web ACL, SNS topic and health checks don't depend on the certificate,
+# so they're created while it's being issued. The ALIAS records and alarms only
+# depend on the distribution, so they're created alongside each other.
+cdn_dedicated_waf_provision_pipeline = Pipeline(
+    "cdn_dedicated_waf_provision",
+    [
+        Parallel(
+            [
+                letsencrypt.create_user,
+                letsencrypt.generate_private_key,
+                letsencrypt.initiate_challenges,
+                route53.create_TXT_records,
+                route53.wait_for_changes,
+                letsencrypt.answer_challenges,
+                letsencrypt.retrieve_certificate,
+                iam.upload_server_certificate,
+            ],
+            [waf.create_web_acl, waf.put_logging_configuration],
+            [sns.create_notification_topic, sns.subscribe_notification_topic],
+            [route53.create_new_health_checks],
+        ),
+        cloudfront.create_distribution,
+        cloudfront.wait_for_distribution,
+        Parallel(
+            [route53.create_ALIAS_records, route53.wait_for_changes],
+            [shield.associate_health_check],
+            [cloudwatch.create_health_check_alarms],
+            [cloudwatch.create_ddos_detected_alarm],
+        ),
+        update_operations.provision,
+    ],
+)
+
+
+# Like cdn_early_distribution_provision, the distribution is created while the
+# certificate is being issued, as soon as its web ACL exists
+cdn_dedicated_waf_early_distribution_provision_pipeline = Pipeline(
+    "cdn_dedicated_waf_early_distribution_provision",
+    [
+        Parallel(
+            [
+                letsencrypt.create_user,
+                letsencrypt.generate_private_key,
+                letsencrypt.initiate_challenges,
+                route53.create_TXT_records,
+                route53.wait_for_changes,
+                letsencrypt.answer_challenges,
+                letsencrypt.retrieve_certificate,
+                iam.upload_server_certificate,
+            ],
+            [
+                waf.create_web_acl,
+                waf.put_logging_configuration,
+                cloudfront.create_distribution_early,
+            ],
+            [sns.create_notification_topic, sns.subscribe_notification_topic],
+            [route53.create_new_health_checks],
+        ),
+        cloudfront.update_distribution,
+        cloudfront.wait_for_distribution,
+        Parallel(
+            [route53.create_ALIAS_records, route53.wait_for_changes],
+            [shield.associate_health_check],
+            [cloudwatch.create_health_check_alarms],
+            [cloudwatch.create_ddos_detected_alarm],
+        ),
+        update_operations.provision,
+    ],
+)
+
+
 def queue_all_cdn_dedicated_waf_provision_tasks_for_operation(
     operation_id: int, correlation_id: str
 ):
@@ -23,31 +95,34 @@ def queue_all_cdn_dedicated_waf_provision_tasks_for_operation(
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        letsencrypt.create_user.s(operation_id, **correlation)
-        .then(letsencrypt.generate_private_key, operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(waf.create_web_acl, operation_id, **correlation)
-        .then(waf.put_logging_configuration, operation_id, **correlation)
-        .then(cloudfront.create_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(sns.create_notification_topic, operation_id, **correlation)
-        .then(sns.subscribe_notification_topic, operation_id, **correlation)
-        .then(route53.create_new_health_checks, operation_id, **correlation)
-        .then(shield.associate_health_check, operation_id, **correlation)
-        .then(cloudwatch.create_health_check_alarms, operation_id, **correlation)
-        .then(cloudwatch.create_ddos_detected_alarm, operation_id, **correlation)
-        .then(update_operations.provision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    if config.CDN_CREATE_DISTRIBUTION_EARLY:
+        cdn_dedicated_waf_early_distribution_provision_pipeline.queue(
+            operation_id, correlation_id
+        )
+    else:
+        cdn_dedicated_waf_provision_pipeline.queue(operation_id, correlation_id)
+
+
+cdn_dedicated_waf_deprovision_pipeline = Pipeline(
+    "cdn_dedicated_waf_deprovision",
+    [
+        update_operations.cancel_pending_provisioning,
+        route53.remove_ALIAS_records,
+        route53.remove_TXT_records,
+        cloudwatch.delete_ddos_detected_alarm,
+        cloudwatch.delete_health_check_alarms,
+        shield.disassociate_health_check,
+        route53.delete_health_checks,
+        sns.unsubscribe_notification_topic,
+        sns.delete_notification_topic,
+        cloudfront.disable_distribution,
+        cloudfront.wait_for_distribution_disabled,
+        cloudfront.delete_distribution,
+        waf.delete_web_acl,
+        iam.delete_server_certificate,
+        update_operations.deprovision,
+    ],
+)
 
 
 def queue_all_cdn_dedicated_waf_deprovision_tasks_for_operation(
@@ -57,56 +132,42 @@ def queue_all_cdn_dedicated_waf_deprovision_tasks_for_operation(
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        update_operations.cancel_pending_provisioning.s(operation_id, **correlation)
-        .then(route53.remove_ALIAS_records, operation_id, **correlation)
-        .then(route53.remove_TXT_records, operation_id, **correlation)
-        .then(cloudwatch.delete_ddos_detected_alarm, operation_id, **correlation)
-        .then(cloudwatch.delete_health_check_alarms, operation_id, **correlation)
-        .then(shield.disassociate_health_check, operation_id, **correlation)
-        .then(route53.delete_health_checks, operation_id, **correlation)
-        .then(sns.unsubscribe_notification_topic, operation_id, **correlation)
-        .then(sns.delete_notification_topic, operation_id, **correlation)
-        .then(cloudfront.disable_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution_disabled, operation_id, **correlation)
-        .then(cloudfront.delete_distribution, operation_id=operation_id, **correlation)
-        .then(waf.delete_web_acl, operation_id=operation_id, **correlation)
-        .then(iam.delete_server_certificate, operation_id, **correlation)
-        .then(update_operations.deprovision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    cdn_dedicated_waf_deprovision_pipeline.queue(operation_id, correlation_id)
+
+
+cdn_dedicated_waf_update_pipeline = Pipeline(
+    "cdn_dedicated_waf_update",
+    [
+        letsencrypt.generate_private_key,
+        letsencrypt.initiate_challenges,
+        route53.create_TXT_records,
+        route53.wait_for_changes,
+        route53.remove_old_DNS_records,
+        letsencrypt.answer_challenges,
+        letsencrypt.retrieve_certificate,
+        iam.upload_server_certificate,
+        waf.create_web_acl,
+        waf.put_logging_configuration,
+        cloudfront.update_distribution,
+        cloudfront.wait_for_distribution,
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        iam.delete_previous_server_certificate,
+        sns.create_notification_topic,
+        sns.unsubscribe_notification_topic,
+        sns.subscribe_notification_topic,
+        route53.create_new_health_checks,
+        shield.update_associated_health_check,
+        route53.delete_unused_health_checks,
+        cloudwatch.delete_health_check_alarms,
+        cloudwatch.create_health_check_alarms,
+        cloudwatch.create_ddos_detected_alarm,
+        update_operations.update_complete,
+    ],
+)
 
 
 def queue_all_cdn_dedicated_waf_update_tasks_for_operation(
     operation_id, correlation_id
 ):
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        letsencrypt.generate_private_key.s(operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(route53.remove_old_DNS_records, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(waf.create_web_acl, operation_id, **correlation)
-        .then(waf.put_logging_configuration, operation_id, **correlation)
-        .then(cloudfront.update_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(iam.delete_previous_server_certificate, operation_id, **correlation)
-        .then(sns.create_notification_topic, operation_id, **correlation)
-        .then(sns.unsubscribe_notification_topic, operation_id, **correlation)
-        .then(sns.subscribe_notification_topic, operation_id, **correlation)
-        .then(route53.create_new_health_checks, operation_id, **correlation)
-        .then(shield.update_associated_health_check, operation_id, **correlation)
-        .then(route53.delete_unused_health_checks, operation_id, **correlation)
-        .then(cloudwatch.delete_health_check_alarms, operation_id, **correlation)
-        .then(cloudwatch.create_health_check_alarms, operation_id, **correlation)
-        .then(cloudwatch.create_ddos_detected_alarm, operation_id, **correlation)
-        .then(update_operations.update_complete, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    cdn_dedicated_waf_update_pipeline.queue(operation_id, correlation_id)
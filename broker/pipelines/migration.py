@@ -8,11 +8,19 @@ from broker.tasks import (
     letsencrypt,
     route53,
 )
-from broker.tasks.huey import huey
+from broker.tasks.huey import Pipeline
 
 logger = logging.getLogger(__name__)
 
 
+migration_deprovision_pipeline = Pipeline(
+    "migration_deprovision",
+    [
+        update_operations.deprovision,
+    ],
+)
+
+
 def queue_all_migration_deprovision_tasks_for_operation(
     operation_id: int, correlation_id: str
 ):
@@ -20,55 +28,59 @@ def queue_all_migration_deprovision_tasks_for_operation(
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = update_operations.deprovision.s(operation_id, **correlation)
-    huey.enqueue(task_pipeline)
+    migration_deprovision_pipeline.queue(operation_id, correlation_id)
+
+
+cdn_broker_migration_pipeline = Pipeline(
+    "cdn_broker_migration",
+    [
+        cloudfront.remove_s3_bucket_from_cdn_broker_instance,
+        cloudfront.add_logging_to_bucket,
+        letsencrypt.create_user,
+        letsencrypt.generate_private_key,
+        letsencrypt.initiate_challenges,
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        route53.create_TXT_records,
+        route53.wait_for_changes,
+        letsencrypt.answer_challenges,
+        letsencrypt.retrieve_certificate,
+        iam.upload_server_certificate,
+        cloudfront.update_certificate,
+        iam.delete_previous_server_certificate,
+        update_operations.provision,
+    ],
+)
 
 
 def queue_all_cdn_broker_migration_tasks_for_operation(operation_id, correlation_id):
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        cloudfront.remove_s3_bucket_from_cdn_broker_instance.s(
-            operation_id, **correlation
-        )
-        .then(cloudfront.add_logging_to_bucket, operation_id, **correlation)
-        .then(letsencrypt.create_user, operation_id, **correlation)
-        .then(letsencrypt.generate_private_key, operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(cloudfront.update_certificate, operation_id, **correlation)
-        .then(iam.delete_previous_server_certificate, operation_id, **correlation)
-        .then(update_operations.provision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    cdn_broker_migration_pipeline.queue(operation_id, correlation_id)
 
 
-def queue_all_domain_broker_migration_tasks_for_operation(operation_id, correlation_id):
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        letsencrypt.create_user.s(operation_id, **correlation)
-        .then(letsencrypt.generate_private_key, operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
+domain_broker_migration_pipeline = Pipeline(
+    "domain_broker_migration",
+    [
+        letsencrypt.create_user,
+        letsencrypt.generate_private_key,
+        letsencrypt.initiate_challenges,
         # create alias records here is probably not necessary, but belt + suspenders
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(alb.select_alb, operation_id, **correlation)
-        .then(alb.add_certificate_to_alb, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(alb.remove_certificate_from_previous_alb, operation_id, **correlation)
-        .then(iam.delete_previous_server_certificate, operation_id, **correlation)
-        .then(update_operations.provision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        route53.create_TXT_records,
+        route53.wait_for_changes,
+        letsencrypt.answer_challenges,
+        letsencrypt.retrieve_certificate,
+        iam.upload_server_certificate,
+        alb.select_alb,
+        alb.add_certificate_to_alb,
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        alb.remove_certificate_from_previous_alb,
+        iam.delete_previous_server_certificate,
+        update_operations.provision,
+    ],
+)
+
+
+def queue_all_domain_broker_migration_tasks_for_operation(operation_id, correlation_id):
+    domain_broker_migration_pipeline.queue(operation_id, correlation_id)
@@ -10,7 +10,19 @@ from broker.tasks import (
     cloudwatch,
     sns,
 )
-from broker.tasks.huey import huey
+from broker.tasks.huey import Pipeline
+
+alb_to_dedicated_alb_update_pipeline = Pipeline(
+    "alb_to_dedicated_alb_update",
+    [
+        alb.select_dedicated_alb,
+        alb.add_certificate_to_alb,
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        alb.remove_certificate_from_previous_alb_during_update_to_dedicated,
+        update_operations.provision,
+    ],
+)
 
 
 def queue_all_alb_to_dedicated_alb_update_tasks_for_operation(
@@ -20,20 +32,34 @@ def queue_all_alb_to_dedicated_alb_update_tasks_for_operation(
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        alb.select_dedicated_alb.s(operation_id, **correlation)
-        .then(alb.add_certificate_to_alb, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(
-            alb.remove_certificate_from_previous_alb_during_update_to_dedicated,
-            operation_id,
-            **correlation,
-        )
-        .then(update_operations.provision, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    alb_to_dedicated_alb_update_pipeline.queue(operation_id, correlation_id)
+
+
+cdn_to_cdn_dedicated_waf_update_pipeline = Pipeline(
+    "cdn_to_cdn_dedicated_waf_update",
+    [
+        letsencrypt.generate_private_key,
+        letsencrypt.initiate_challenges,
+        route53.create_TXT_records,
+        route53.wait_for_changes,
+        letsencrypt.answer_challenges,
+        letsencrypt.retrieve_certificate,
+        iam.upload_server_certificate,
+        waf.create_web_acl,
+        cloudfront.update_distribution,
+        cloudfront.wait_for_distribution,
+        route53.create_ALIAS_records,
+        route53.wait_for_changes,
+        iam.delete_previous_server_certificate,
+        sns.create_notification_topic,
+        sns.subscribe_notification_topic,
+        route53.create_new_health_checks,
+        shield.associate_health_check,
+        cloudwatch.create_health_check_alarms,
+        cloudwatch.create_ddos_detected_alarm,
+        update_operations.update_complete,
+    ],
+)
 
 
 def queue_all_cdn_to_cdn_dedicated_waf_update_tasks_for_operation(
@@ -43,27 +69,4 @@ def queue_all_cdn_to_cdn_dedicated_waf_update_tasks_for_operation(
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        letsencrypt.generate_private_key.s(operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(waf.create_web_acl, operation_id, **correlation)
-        .then(cloudfront.update_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(iam.delete_previous_server_certificate, operation_id, **correlation)
-        .then(sns.create_notification_topic, operation_id, **correlation)
-        .then(sns.subscribe_notification_topic, operation_id, **correlation)
-        .then(route53.create_new_health_checks, operation_id, **correlation)
-        .then(shield.associate_health_check, operation_id, **correlation)
-        .then(cloudwatch.create_health_check_alarms, operation_id, **correlation)
-        .then(cloudwatch.create_ddos_detected_alarm, operation_id, **correlation)
-        .then(update_operations.update_complete, operation_id, **correlation)
-    )
-    huey.enqueue(task_pipeline)
+    cdn_to_cdn_dedicated_waf_update_pipeline.queue(operation_id, correlation_id)
@@ -1,5 +1,4 @@
 import logging
-import time
 
 from sqlalchemy import and_, select, func, null
 from sqlalchemy.orm import aliased
@@ -12,7 +11,7 @@ from broker.models import (
     Certificate,
     Operation,
 )
-from broker.tasks.huey import pipeline_operation
+from broker.tasks.huey import pipeline_operation, StepNotReady
 
 logger = logging.getLogger(__name__)
 
@@ -159,9 +158,13 @@ def add_certificate_to_alb(operation_id, *, operation, db, **kwargs):
 
 
 @pipeline_operation("Removing SSL certificate from load balancer")
-def remove_certificate_from_alb(operation_id, *, operation, db, **kwargs):
+def remove_certificate_from_alb(operation_id, *, operation, db, checks=0, **kwargs):
     service_instance = operation.service_instance
 
+    if checks > 0:
+        # we already removed the certificate and were only waiting for it to propagate
+        return
+
     if service_instance.alb_listener_arn is not None:
         alb.remove_listener_certificates(
             ListenerArn=service_instance.alb_listener_arn,
@@ -173,11 +176,17 @@ def remove_certificate_from_alb(operation_id, *, operation, db, **kwargs):
         )
     db.session.add(service_instance)
     db.session.commit()
-    time.sleep(config.IAM_CERTIFICATE_PROPAGATION_TIME)
+    if config.IAM_CERTIFICATE_PROPAGATION_TIME:
+        raise StepNotReady(
+            "Waiting for load balancer certificate removal to propagate",
+            delay=config.IAM_CERTIFICATE_PROPAGATION_TIME,
+        )
 
 
 @pipeline_operation("Removing SSL certificate from load balancer")
-def remove_certificate_from_previous_alb(operation_id, *, operation, db, **kwargs):
+def remove_certificate_from_previous_alb(
+    operation_id, *, operation, db, checks=0, **kwargs
+):
     service_instance = operation.service_instance
     remove_certificate = Certificate.query.filter(
         and_(
@@ -186,37 +195,39 @@ def remove_certificate_from_previous_alb(operation_id, *, operation, db, **kwarg
         )
     ).first()
 
+    # first give DNS time to move over to the new load balancer,
+    # then remove the certificate and check until it's gone
+    overlap_checks = 0
     if service_instance.previous_alb_listener_arn is not None:
-        time.sleep(config.ALB_OVERLAP_SLEEP_TIME)
-        alb.remove_listener_certificates(
-            ListenerArn=service_instance.previous_alb_listener_arn,
-            Certificates=[
-                {"CertificateArn": remove_certificate.iam_server_certificate_arn}
-            ],
-        )
-
-    removed_from_alb = False
-    attempts = 0
-    while not removed_from_alb and attempts < config.AWS_POLL_MAX_ATTEMPTS:
-        paginator = alb.get_paginator("describe_listener_certificates")
-        response_iterator = paginator.paginate(
-            ListenerArn=service_instance.previous_alb_listener_arn,
-        )
-        certificate_arns = []
-        for response in response_iterator:
-            certificate_arns += [
-                certificate["CertificateArn"]
-                for certificate in response["Certificates"]
-            ]
-        removed_from_alb = (
-            remove_certificate.iam_server_certificate_arn not in certificate_arns
-        )
-        attempts += 1
-        time.sleep(config.AWS_POLL_WAIT_TIME_IN_SECONDS)
-
-    if not removed_from_alb:
-        raise RuntimeError(
-            f"Could not verify removal of certificate {remove_certificate.iam_server_certificate_arn} from listener {service_instance.previous_alb_listener_arn}"
+        if config.ALB_OVERLAP_SLEEP_TIME:
+            overlap_checks = 1
+        if checks < overlap_checks:
+            raise StepNotReady(
+                "Waiting for DNS to move to the new load balancer",
+                delay=config.ALB_OVERLAP_SLEEP_TIME,
+            )
+        if checks == overlap_checks:
+            alb.remove_listener_certificates(
+                ListenerArn=service_instance.previous_alb_listener_arn,
+                Certificates=[
+                    {"CertificateArn": remove_certificate.iam_server_certificate_arn}
+                ],
+            )
+
+    paginator = alb.get_paginator("describe_listener_certificates")
+    response_iterator = paginator.paginate(
+        ListenerArn=service_instance.previous_alb_listener_arn,
+    )
+    certificate_arns = []
+    for response in response_iterator:
+        certificate_arns += [
+            certificate["CertificateArn"] for certificate in response["Certificates"]
+        ]
+    if remove_certificate.iam_server_certificate_arn in certificate_arns:
+        raise StepNotReady(
+            f"Certificate {remove_certificate.iam_server_certificate_arn} is still on listener {service_instance.previous_alb_listener_arn}",
+            delay=config.AWS_POLL_WAIT_TIME_IN_SECONDS,
+            max_checks=overlap_checks + config.AWS_POLL_MAX_ATTEMPTS,
         )
 
     service_instance.previous_alb_arn = None
@@ -227,13 +238,17 @@ def remove_certificate_from_previous_alb(operation_id, *, operation, db, **kwarg
 
 @pipeline_operation("Removing certificate from previous load balancer")
 def remove_certificate_from_previous_alb_during_update_to_dedicated(
-    operation_id, *, operation, db, **kwargs
+    operation_id, *, operation, db, checks=0, **kwargs
 ):
     service_instance = operation.service_instance
     remove_certificate = service_instance.current_certificate
 
     if service_instance.previous_alb_listener_arn is not None:
-        time.sleep(config.ALB_OVERLAP_SLEEP_TIME)
+        if checks == 0 and config.ALB_OVERLAP_SLEEP_TIME:
+            raise StepNotReady(
+                "Waiting for DNS to move to the new load balancer",
+                delay=config.ALB_OVERLAP_SLEEP_TIME,
+            )
         alb.remove_listener_certificates(
             ListenerArn=service_instance.previous_alb_listener_arn,
             Certificates=[
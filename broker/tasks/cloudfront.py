@@ -1,10 +1,15 @@
+import copy
 import logging
-import time
 
-from broker.aws import cloudfront
+from broker.aws import cloudfront, status_watcher
 from broker.extensions import config
+from broker.lib.distribution_config import (
+    diff,
+    distribution_edit,
+    DistributionConfigBuilder,
+)
 from broker.models import CDNServiceInstance, CDNDedicatedWAFServiceInstance
-from broker.tasks.huey import pipeline_operation
+from broker.tasks.huey import pipeline_operation, StepNotReady
 
 logger = logging.getLogger(__name__)
 
@@ -59,6 +64,15 @@ def get_custom_error_responses(service_instance):
         return {"Quantity": 0}
 
 
+def get_origin_shield(service_instance):
+    if not service_instance.origin_shield_region:
+        return None
+    return {
+        "Enabled": True,
+        "OriginShieldRegion": service_instance.origin_shield_region,
+    }
+
+
 def is_cdn_with_dedicated_waf_instance(service_instance) -> bool:
     return (
         isinstance(service_instance, CDNDedicatedWAFServiceInstance)
@@ -121,25 +135,40 @@ def update_default_cache_behavior(service_instance, default_cache_behavior):
             {"OriginRequestPolicyId": service_instance.origin_request_policy_id}
         )
 
+    # instances from before compress was a parameter keep whatever they had
+    if service_instance.compress is not None:
+        updated_default_cache_behavior["Compress"] = service_instance.compress
+
     return updated_default_cache_behavior
 
 
-@pipeline_operation("Creating CloudFront distribution")
-def create_distribution(operation_id: int, *, operation, db, **kwargs):
-    service_instance = operation.service_instance
-    certificate = service_instance.new_certificate
+def viewer_certificate(iam_server_certificate_id: str | None) -> dict:
+    if iam_server_certificate_id is None:
+        # until the instance's certificate is issued, see create_distribution_early
+        return {"CloudFrontDefaultCertificate": True}
+    return {
+        "CloudFrontDefaultCertificate": False,
+        "IAMCertificateId": iam_server_certificate_id,
+        "SSLSupportMethod": "sni-only",
+        "MinimumProtocolVersion": "TLSv1.2_2018",
+    }
 
-    if service_instance.cloudfront_distribution_id:
-        try:
-            cloudfront.get_distribution(Id=service_instance.cloudfront_distribution_id)
-        except cloudfront.exceptions.NoSuchDistribution:
-            pass
-        else:
-            return
+
+def new_distribution_config(service_instance, certificate) -> dict:
+    """
+    the config for a new distribution. Without a certificate, it doesn't
+    answer for the instance's domains yet
+    """
+    if certificate is None:
+        aliases = {"Quantity": 0}
+        iam_server_certificate_id = None
+    else:
+        aliases = get_aliases(service_instance)
+        iam_server_certificate_id = certificate.iam_server_certificate_id
 
     distribution_config = {
         "CallerReference": service_instance.id,
-        "Aliases": get_aliases(service_instance),
+        "Aliases": aliases,
         "DefaultRootObject": "",
         "Origins": {
             "Quantity": 1,
@@ -172,12 +201,7 @@ def create_distribution(operation_id: int, *, operation, db, **kwargs):
         },
         "PriceClass": "PriceClass_100",
         "Enabled": True,
-        "ViewerCertificate": {
-            "CloudFrontDefaultCertificate": False,
-            "IAMCertificateId": certificate.iam_server_certificate_id,
-            "SSLSupportMethod": "sni-only",
-            "MinimumProtocolVersion": "TLSv1.2_2018",
-        },
+        "ViewerCertificate": viewer_certificate(iam_server_certificate_id),
         "IsIPV6Enabled": True,
     }
 
@@ -185,8 +209,35 @@ def create_distribution(operation_id: int, *, operation, db, **kwargs):
         service_instance, distribution_config["DefaultCacheBehavior"]
     )
 
+    origin_shield = get_origin_shield(service_instance)
+    if origin_shield:
+        distribution_config["Origins"]["Items"][0]["OriginShield"] = origin_shield
+
+    if service_instance.http_version:
+        distribution_config["HttpVersion"] = service_instance.http_version
+
     if is_cdn_with_dedicated_waf_instance(service_instance):
         distribution_config["WebACLId"] = service_instance.dedicated_waf_web_acl_arn
+
+    return distribution_config
+
+
+def _create_distribution(service_instance, certificate) -> bool:
+    """
+    create the instance's distribution, unless it already has one. Returns
+    whether it did
+    """
+    if service_instance.cloudfront_distribution_id:
+        try:
+            cloudfront.get_distribution(Id=service_instance.cloudfront_distribution_id)
+        except cloudfront.exceptions.NoSuchDistribution:
+            pass
+        else:
+            return False
+
+    distribution_config = new_distribution_config(service_instance, certificate)
+
+    if is_cdn_with_dedicated_waf_instance(service_instance):
         service_instance.add_dedicated_web_acl_tag()
 
     tags = service_instance.tags if service_instance.tags else []
@@ -205,12 +256,40 @@ def create_distribution(operation_id: int, *, operation, db, **kwargs):
     service_instance.cloudfront_distribution_arn = response["Distribution"]["ARN"]
     service_instance.cloudfront_distribution_id = response["Distribution"]["Id"]
     service_instance.domain_internal = response["Distribution"]["DomainName"]
+    save_distribution_config(service_instance, distribution_config, tags)
+    return True
+
+
+@pipeline_operation("Creating CloudFront distribution")
+def create_distribution(operation_id: int, *, operation, db, **kwargs):
+    service_instance = operation.service_instance
+    certificate = service_instance.new_certificate
+
+    if not _create_distribution(service_instance, certificate):
+        return
+
     service_instance.current_certificate = certificate
     service_instance.new_certificate = None
     db.session.add(service_instance)
     db.session.commit()
 
 
+@pipeline_operation("Creating CloudFront distribution")
+def create_distribution_early(operation_id: int, *, operation, db, **kwargs):
+    """
+    create the distribution before the instance's certificate is issued, so
+    it deploys while the certificate is. update_distribution adds the
+    certificate and the instance's domains once it is
+    """
+    service_instance = operation.service_instance
+
+    if not _create_distribution(service_instance, None):
+        return
+
+    db.session.add(service_instance)
+    db.session.commit()
+
+
 @pipeline_operation("Disabling CloudFront distribution")
 def disable_distribution(operation_id: int, *, operation, db, **kwargs):
     service_instance = operation.service_instance
@@ -233,35 +312,26 @@ def disable_distribution(operation_id: int, *, operation, db, **kwargs):
 
 
 @pipeline_operation("Waiting for CloudFront distribution to disable")
-def wait_for_distribution_disabled(operation_id: int, *, operation, db, **kwargs):
+def wait_for_distribution_disabled(
+    operation_id: int, *, operation, db, checks=0, **kwargs
+):
     service_instance = operation.service_instance
 
     if service_instance.cloudfront_distribution_id is None:
         return
 
-    distribution_disabled = False
-    num_times = 0
-    while not distribution_disabled:
-        num_times += 1
-        if num_times > config.AWS_POLL_MAX_ATTEMPTS:
-            logger.info(
-                "Failed to disable distribution",
-                extra={
-                    "operation_id": operation_id,
-                    "cloudfront_distribution_id": service_instance.cloudfront_distribution_id,
-                },
-            )
-            raise RuntimeError("Failed to disable distribution")
-        time.sleep(config.AWS_POLL_WAIT_TIME_IN_SECONDS)
-        try:
-            status = cloudfront.get_distribution(
-                Id=service_instance.cloudfront_distribution_id
-            )
-        except cloudfront.exceptions.NoSuchDistribution:
-            return
-        distribution_disabled = (
-            not status["Distribution"]["DistributionConfig"]["Enabled"]
-            and status["Distribution"]["Status"] == "Deployed"
+    try:
+        status = status_watcher.distribution(
+            service_instance.cloudfront_distribution_id, _status_max_age(checks)
+        )
+    except cloudfront.exceptions.NoSuchDistribution:
+        return
+    distribution_disabled = not status["Enabled"] and status["Status"] == "Deployed"
+    if not distribution_disabled:
+        raise StepNotReady(
+            f"CloudFront distribution {service_instance.cloudfront_distribution_id} is not disabled yet",
+            delay=config.AWS_POLL_WAIT_TIME_IN_SECONDS,
+            max_checks=config.AWS_POLL_MAX_ATTEMPTS,
         )
 
 
@@ -284,53 +354,31 @@ def delete_distribution(operation_id: int, *, operation, db, **kwargs):
 
 
 @pipeline_operation("Waiting for CloudFront distribution")
-def wait_for_distribution(operation_id: str, *, operation, db, **kwargs):
+def wait_for_distribution(operation_id: str, *, operation, db, checks=0, **kwargs):
     service_instance = operation.service_instance
 
-    waiter = cloudfront.get_waiter("distribution_deployed")
-    waiter.wait(
-        Id=service_instance.cloudfront_distribution_id,
-        WaiterConfig={
-            "Delay": config.AWS_POLL_WAIT_TIME_IN_SECONDS,
-            "MaxAttempts": config.AWS_POLL_MAX_ATTEMPTS,
-        },
+    status = status_watcher.distribution(
+        service_instance.cloudfront_distribution_id, _status_max_age(checks)
     )
+    if status["Status"] != "Deployed":
+        raise StepNotReady(
+            f"CloudFront distribution {service_instance.cloudfront_distribution_id} is not deployed yet",
+            delay=config.AWS_POLL_WAIT_TIME_IN_SECONDS,
+            max_checks=config.AWS_POLL_MAX_ATTEMPTS,
+        )
 
 
-@pipeline_operation("Updating CloudFront distribution certificate")
-def update_certificate(operation_id: str, *, operation, db, **kwargs):
-    service_instance = operation.service_instance
-
-    config = cloudfront.get_distribution_config(
-        Id=service_instance.cloudfront_distribution_id
-    )
-    config["DistributionConfig"]["ViewerCertificate"][
-        "IAMCertificateId"
-    ] = service_instance.new_certificate.iam_server_certificate_id
-    cloudfront.update_distribution(
-        DistributionConfig=config["DistributionConfig"],
-        Id=service_instance.cloudfront_distribution_id,
-        IfMatch=config["ETag"],
-    )
-    service_instance.current_certificate = service_instance.new_certificate
-    service_instance.new_certificate = None
-    db.session.add(service_instance)
-    db.session.commit()
-
+@distribution_edit("certificate")
+def set_certificate(config, service_instance, iam_server_certificate_id):
+    if config["ViewerCertificate"].get("CloudFrontDefaultCertificate"):
+        # created before the certificate was issued, see create_distribution_early
+        config["ViewerCertificate"] = viewer_certificate(iam_server_certificate_id)
+    config["ViewerCertificate"]["IAMCertificateId"] = iam_server_certificate_id
 
-@pipeline_operation("Updating CloudFront distribution")
-def update_distribution(operation_id: str, *, operation, db, **kwargs):
-    service_instance = operation.service_instance
-    certificate = service_instance.new_certificate
 
-    config_response = cloudfront.get_distribution_config(
-        Id=service_instance.cloudfront_distribution_id
-    )
-    etag = config_response["ETag"]
-    config = config_response["DistributionConfig"]
-    config["ViewerCertificate"][
-        "IAMCertificateId"
-    ] = certificate.iam_server_certificate_id
+@distribution_edit("instance_settings")
+def apply_instance_settings(config, service_instance):
+    """set everything else the broker manages from the instance's parameters"""
     config["Origins"]["Items"][0][
         "DomainName"
     ] = service_instance.cloudfront_origin_hostname
@@ -340,6 +388,14 @@ def update_distribution(operation_id: str, *, operation, db, **kwargs):
     config["Origins"]["Items"][0]["CustomOriginConfig"][
         "OriginProtocolPolicy"
     ] = service_instance.origin_protocol_policy
+    origin_shield = get_origin_shield(service_instance)
+    if origin_shield:
+        config["Origins"]["Items"][0]["OriginShield"] = origin_shield
+    else:
+        # leaving it out turns it off
+        config["Origins"]["Items"][0].pop("OriginShield", None)
+    if service_instance.http_version:
+        config["HttpVersion"] = service_instance.http_version
 
     config["DefaultCacheBehavior"] = update_default_cache_behavior(
         service_instance, config["DefaultCacheBehavior"]
@@ -348,44 +404,13 @@ def update_distribution(operation_id: str, *, operation, db, **kwargs):
     config["Aliases"] = get_aliases(service_instance)
     config["CustomErrorResponses"] = get_custom_error_responses(service_instance)
 
-    if (
-        isinstance(service_instance, CDNDedicatedWAFServiceInstance)
-        and service_instance.dedicated_waf_web_acl_arn
-    ):
+    if is_cdn_with_dedicated_waf_instance(service_instance):
         config["WebACLId"] = service_instance.dedicated_waf_web_acl_arn
-        service_instance.add_dedicated_web_acl_tag()
 
-    tags = service_instance.tags if service_instance.tags else []
-
-    cloudfront.update_distribution(
-        DistributionConfig=config,
-        Id=service_instance.cloudfront_distribution_id,
-        IfMatch=etag,
-    )
-
-    cloudfront.tag_resource(
-        Resource=service_instance.cloudfront_distribution_arn,
-        Tags={
-            "Items": tags,
-        },
-    )
-
-    service_instance.current_certificate = certificate
-    service_instance.new_certificate = None
-    db.session.add(service_instance)
-    db.session.commit()
 
-
-@pipeline_operation("Removing s3 bucket binding")
-def remove_s3_bucket_from_cdn_broker_instance(
-    operation_id: str, *, operation, db, **kwargs
-):
-    service_instance = operation.service_instance
-    config_response = cloudfront.get_distribution_config(
-        Id=service_instance.cloudfront_distribution_id
-    )
-    etag = config_response["ETag"]
-    config = config_response["DistributionConfig"]
+@distribution_edit("remove_acme_challenge_origin")
+def remove_acme_challenge_origin(config, service_instance):
+    """drop the s3 bucket the cdn-broker answered HTTP challenges from"""
     acme_challenge_origin_id = None
 
     for item in config["CacheBehaviors"].get("Items", []):
@@ -415,21 +440,10 @@ def remove_s3_bucket_from_cdn_broker_instance(
         config["Comment"] = (
             "external domain service https://cloud-gov/external-domain-broker"
         )
-        cloudfront.update_distribution(
-            DistributionConfig=config,
-            Id=service_instance.cloudfront_distribution_id,
-            IfMatch=etag,
-        )
 
 
-@pipeline_operation("Adding logging to Cloudfront distribution")
-def add_logging_to_bucket(operation_id: str, *, operation, db, **kwargs):
-    service_instance = operation.service_instance
-    config_response = cloudfront.get_distribution_config(
-        Id=service_instance.cloudfront_distribution_id
-    )
-    dist_config = config_response["DistributionConfig"]
-    etag = config_response["ETag"]
+@distribution_edit("logging")
+def enable_logging(dist_config, service_instance):
     if not dist_config["Logging"]["Enabled"]:
         dist_config["Logging"] = {
             "Enabled": True,
@@ -437,8 +451,148 @@ def add_logging_to_bucket(operation_id: str, *, operation, db, **kwargs):
             "Bucket": config.CDN_LOG_BUCKET,
             "Prefix": f"{service_instance.id}/",
         }
-        cloudfront.update_distribution(
-            DistributionConfig=dist_config,
-            Id=service_instance.cloudfront_distribution_id,
-            IfMatch=etag,
+
+
+def add_distribution_edit(operation, name, **kwargs):
+    """contribute an edit for the operation's next distribution update"""
+    builder = DistributionConfigBuilder(operation.distribution_config_edits)
+    builder.add(name, **kwargs)
+    operation.distribution_config_edits = builder.edits
+
+
+def apply_distribution_edits(operation, service_instance):
+    """
+    make every edit contributed to the operation in one update_distribution,
+    unless they wouldn't change what was last applied. Instances provisioned
+    before we kept snapshots always get updated, which takes a snapshot for
+    next time
+    """
+    builder = DistributionConfigBuilder(operation.distribution_config_edits)
+    operation.distribution_config_edits = []
+
+    snapshot = service_instance.cloudfront_distribution_config
+    if snapshot is not None:
+        last_applied = snapshot["DistributionConfig"]
+        changes = diff(
+            last_applied,
+            builder.build(copy.deepcopy(last_applied), service_instance),
+        )
+        if not changes:
+            logger.info(
+                f"CloudFront distribution {service_instance.cloudfront_distribution_id} is up to date, not updating it"
+            )
+            return
+        logger.info(
+            f"Updating CloudFront distribution {service_instance.cloudfront_distribution_id}: {', '.join(changes)} changed"
+        )
+
+    config_response = cloudfront.get_distribution_config(
+        Id=service_instance.cloudfront_distribution_id
+    )
+    config = builder.build(config_response["DistributionConfig"], service_instance)
+    cloudfront.update_distribution(
+        DistributionConfig=config,
+        Id=service_instance.cloudfront_distribution_id,
+        IfMatch=config_response["ETag"],
+    )
+    save_distribution_config(service_instance, config)
+
+
+def save_distribution_config(service_instance, config, tags=None):
+    """
+    remember what was last applied to the distribution. Without `tags`, the
+    tags from the last snapshot are kept
+    """
+    if tags is None and service_instance.cloudfront_distribution_config:
+        tags = service_instance.cloudfront_distribution_config.get("Tags")
+    service_instance.cloudfront_distribution_config = {
+        "DistributionConfig": copy.deepcopy(config),
+        "Tags": tags,
+    }
+
+
+@pipeline_operation("Updating CloudFront distribution certificate")
+def update_certificate(operation_id: str, *, operation, db, **kwargs):
+    service_instance = operation.service_instance
+
+    add_distribution_edit(
+        operation,
+        "certificate",
+        iam_server_certificate_id=service_instance.new_certificate.iam_server_certificate_id,
+    )
+    apply_distribution_edits(operation, service_instance)
+
+    service_instance.current_certificate = service_instance.new_certificate
+    service_instance.new_certificate = None
+    db.session.add(operation)
+    db.session.add(service_instance)
+    db.session.commit()
+
+
+@pipeline_operation("Updating CloudFront distribution")
+def update_distribution(operation_id: str, *, operation, db, **kwargs):
+    service_instance = operation.service_instance
+    certificate = service_instance.new_certificate
+
+    if is_cdn_with_dedicated_waf_instance(service_instance):
+        service_instance.add_dedicated_web_acl_tag()
+
+    tags = service_instance.tags if service_instance.tags else []
+    last_applied_tags = None
+    if service_instance.cloudfront_distribution_config is not None:
+        last_applied_tags = service_instance.cloudfront_distribution_config["Tags"]
+
+    add_distribution_edit(
+        operation,
+        "certificate",
+        iam_server_certificate_id=certificate.iam_server_certificate_id,
+    )
+    add_distribution_edit(operation, "instance_settings")
+    apply_distribution_edits(operation, service_instance)
+
+    # tags aren't part of the config, and changing them doesn't deploy anything
+    if last_applied_tags != tags:
+        cloudfront.tag_resource(
+            Resource=service_instance.cloudfront_distribution_arn,
+            Tags={
+                "Items": tags,
+            },
         )
+        if service_instance.cloudfront_distribution_config is not None:
+            save_distribution_config(
+                service_instance,
+                service_instance.cloudfront_distribution_config["DistributionConfig"],
+                tags,
+            )
+
+    service_instance.current_certificate = certificate
+    service_instance.new_certificate = None
+    db.session.add(operation)
+    db.session.add(service_instance)
+    db.session.commit()
+
+
+@pipeline_operation("Removing s3 bucket binding")
+def remove_s3_bucket_from_cdn_broker_instance(
+    operation_id: str, *, operation, db, **kwargs
+):
+    # made along with the certificate update at the end of the migration
+    add_distribution_edit(operation, "remove_acme_challenge_origin")
+    db.session.add(operation)
+    db.session.commit()
+
+
+@pipeline_operation("Adding logging to Cloudfront distribution")
+def add_logging_to_bucket(operation_id: str, *, operation, db, **kwargs):
+    # made along with the certificate update at the end of the migration
+    add_distribution_edit(operation, "logging")
+    db.session.add(operation)
+    db.session.commit()
+
+
+def _status_max_age(checks):
+    # the first check asks CloudFront, since the distribution may have just
+    # changed. After that, any status from since the last check will do
+    if checks == 0:
+        return 0
+    return config.AWS_POLL_WAIT_TIME_IN_SECONDS
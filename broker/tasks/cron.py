@@ -1,18 +1,29 @@
 import datetime
 import logging
+import time
 
 from huey import crontab
 
+from broker.acme_client import (
+    account_directory,
+    certificate_authority_for,
+    order_watcher,
+    quota_for,
+)
+from broker.aws import route53_changes, status_watcher
 from broker.extensions import db, config
 from broker.lib.cdn import is_cdn_instance
+from broker.lib.key_pool import generate_private_key_pems
 from broker.models import (
     Certificate,
     Operation,
     DedicatedALBListener,
+    PooledPrivateKey,
     ServiceInstance,
     ServiceInstanceTypes,
 )
 from broker.tasks import huey
+from broker.tasks.huey import Pipeline, RENEWAL_PRIORITY
 from broker.pipelines.alb import (
     queue_all_alb_deprovision_tasks_for_operation,
     queue_all_alb_provision_tasks_for_operation,
@@ -39,6 +50,9 @@ from broker.pipelines.migration import (
     queue_all_cdn_broker_migration_tasks_for_operation,
 )
 
+# imported so their pipelines are registered and can be resumed
+import broker.pipelines.plan_updates  # noqa F401
+
 logger = logging.getLogger(__name__)
 
 
@@ -94,10 +108,31 @@ def scan_for_expiring_certs():
             queue_all_dedicated_alb_renewal_tasks_for_operation(renewal.id)
 
         renew_instances = cdn_renewals + alb_renewals + dedicated_alb_renewals
+        if renew_instances:
+            log_projected_start(renew_instances)
         # n.b. this return is only for testing - huey ignores it.
         return [instance.service_instance_id for instance in renew_instances]
 
 
+def log_projected_start(renewals):
+    # renewals usually stay with the CA their account is with
+    orders_by_directory = {}
+    for renewal in renewals:
+        instance = renewal.service_instance
+        orders_by_directory.setdefault(
+            account_directory(instance.acme_user), []
+        ).append((instance.acme_user_id, instance.domain_names, True))
+    projected = time.time()
+    for directory, orders in orders_by_directory.items():
+        ca = certificate_authority_for(directory)
+        if ca is not None:
+            projected = max(projected, quota_for(ca).projected_start(orders))
+    logger.info(
+        f"Queued {len(renewals)} renewals, rate limits should let them all start by "
+        f"{datetime.datetime.fromtimestamp(projected, datetime.timezone.utc):%Y-%m-%d %H:%M} UTC"
+    )
+
+
 @huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="*/5"))
 def restart_stalled_pipelines():
     with huey.huey.flask_app.app_context():
@@ -111,6 +146,55 @@ def load_albs():
         DedicatedALBListener.load_albs(config.DEDICATED_ALB_LISTENER_ARN_MAP)
 
 
+@huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="*"))
+def flush_route53_changes():
+    # pipelines waiting on their changes flush them, but nothing waits on
+    # deletes, so make sure they go out even when nothing else is happening
+    if route53_changes.is_due():
+        route53_changes.flush()
+
+
+@huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="*"))
+def drain_legacy_queue():
+    huey.drain_legacy_queue()
+
+
+@huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="*"))
+def refresh_aws_statuses():
+    # check everything pipelines are waiting on at once, so they can use the
+    # shared status instead of asking AWS themselves
+    status_watcher.refresh()
+
+
+@huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="*"))
+def refresh_acme_orders():
+    # poll the orders pipelines are waiting on that are due, all at once
+    with huey.huey.flask_app.app_context():
+        order_watcher.refresh()
+
+
+# after everything else, including renewals, since steps can make their own
+# keys if the pool runs out
+@huey.huey.periodic_task(
+    crontab(month="*", hour="*", day="*", minute="*"), priority=RENEWAL_PRIORITY - 1
+)
+def refill_key_pool():
+    with huey.huey.flask_app.app_context():
+        refill_private_keys()
+
+
+def refill_private_keys():
+    missing = config.PRIVATE_KEY_POOL_SIZE - PooledPrivateKey.query.count()
+    if missing <= 0:
+        return
+    logger.info(f"Generating {missing} private keys for the pool")
+    for private_key_pem in generate_private_key_pems(
+        missing, config.PRIVATE_KEY_POOL_PROCESSES
+    ):
+        db.session.add(PooledPrivateKey(private_key_pem=private_key_pem))
+    db.session.commit()
+
+
 def scan_for_stalled_pipelines():
     logger.info("Scanning for stalled pipelines")
     fifteen_minutes_ago = datetime.datetime.now() - datetime.timedelta(minutes=15)
@@ -125,10 +209,27 @@ def scan_for_stalled_pipelines():
 def reschedule_operation(operation_id):
     operation = db.session.get(Operation, operation_id)
     service_instance = operation.service_instance
+    actions = Operation.Actions
+    if operation.action == actions.RENEW.value:
+        correlation_id = "Renewal"
+    else:
+        correlation_id = "Recovered operation"
+
+    pipeline = resumable_pipeline(operation)
+    if pipeline is not None:
+        logger.info(
+            f"Resuming {operation.action} operation {operation.id} for service instance {service_instance.id} "
+            f"after step {operation.pipeline_step} of {pipeline.name}"
+        )
+        pipeline.queue(
+            operation.id, correlation_id, start_at=operation.pipeline_step + 1
+        )
+        # this line is only used for testing
+        return pipeline
+
     logger.info(
         f"Restarting {operation.action} operation {operation.id} for service instance {service_instance.id}"
     )
-    actions = Operation.Actions
     alb_queues = {
         actions.DEPROVISION.value: queue_all_alb_deprovision_tasks_for_operation,
         actions.PROVISION.value: queue_all_alb_provision_tasks_for_operation,
@@ -169,6 +270,33 @@ def reschedule_operation(operation_id):
     if operation.action == actions.RENEW.value:
         queue(operation.id)
     else:
-        queue(operation.id, "Recovered operation")
+        queue(operation.id, correlation_id)
     # this line is only used for testing
     return queue
+
+
+def resumable_pipeline(operation):
+    """
+    The pipeline an operation can be resumed in, if any. Operations that haven't
+    completed a step yet, or whose pipeline no longer exists or has changed
+    since, start over instead.
+    """
+    if operation.pipeline_name is None or operation.pipeline_step is None:
+        return None
+    pipeline = Pipeline.get(operation.pipeline_name)
+    if pipeline is None:
+        logger.warning(
+            f"Operation {operation.id} was running unknown pipeline {operation.pipeline_name}, restarting it"
+        )
+        return None
+    if (
+        operation.pipeline_step >= len(pipeline.steps)
+        or pipeline.step_name(operation.pipeline_step) != operation.pipeline_step_name
+    ):
+        logger.warning(
+            f"Operation {operation.id} completed step {operation.pipeline_step} {operation.pipeline_step_name} of {pipeline.name}, which has changed since, restarting it"
+        )
+        return None
+    if operation.pipeline_step + 1 >= len(pipeline.steps):
+        return None
+    return pipeline
@@ -1,32 +1,32 @@
 import logging
 import functools
+import time
+from datetime import datetime, timedelta, timezone
 
 from flask import Flask
-from redis import ConnectionPool, SSLConnection
-from huey import RedisHuey, signals
+from huey import PriorityRedisHuey, signals
+from huey.utils import normalize_time
 from sqlalchemy.orm.attributes import flag_modified
 
 from sap import cf_logging
 
-from broker.extensions import config, db
+from broker.extensions import config, db, redis_pool
+from broker.lib.retry_policy import default_retry_policy, Retry, RetryPolicy
 from broker.models import Operation
 from broker.smtp import send_failed_operation_alert
 
 logger = logging.getLogger(__name__)
 
 
-if config.REDIS_SSL:
-    redis_kwargs = dict(connection_class=SSLConnection, ssl_cert_reqs=None)
-else:
-    redis_kwargs = dict()
+# Queued tasks are pulled highest priority first (see operation_priority). The
+# priority queue is a different redis type than the plain one, so it needs its
+# own name.
+huey = PriorityRedisHuey("external-domain-broker", connection_pool=redis_pool)
 
-connection_pool = ConnectionPool(
-    host=config.REDIS_HOST,
-    port=config.REDIS_PORT,
-    password=config.REDIS_PASSWORD,
-    **redis_kwargs,
-)
-huey = RedisHuey(connection_pool=connection_pool)
+# where tasks were queued and scheduled before there were priorities, see
+# drain_legacy_queue
+LEGACY_QUEUE_KEY = "huey.redis.huey"
+LEGACY_SCHEDULE_KEY = "huey.schedule.huey"
 
 # these two lines need to be here so we can define [non]retriable_task
 huey.flask_app = Flask(__name__)
@@ -43,6 +43,217 @@ retriable_task = huey.context_task(
     huey.flask_app.app_context(), retries=6 * 4, retry_delay=10 * 60
 )
 
+# Pipeline steps get their own huey task passed in as `task`, so a step that
+# isn't ready yet can schedule itself to be checked again (see StepNotReady)
+nonretriable_step = huey.context_task(huey.flask_app.app_context(), context=True)
+retriable_step = huey.context_task(
+    huey.flask_app.app_context(), retries=6 * 4, retry_delay=10 * 60, context=True
+)
+
+
+class StepNotReady(Exception):
+    """
+    Raised by a pipeline step that is waiting on something outside of the broker,
+    like a CloudFront distribution deploying or a Route53 change syncing.
+
+    Instead of holding the worker while it waits, the step is scheduled to run
+    again after `delay` seconds, and the rest of the pipeline runs once it
+    completes. Checks don't count against the step's retries. If `max_checks` is
+    set and the step still isn't ready after that many checks, StepTimedOut is
+    raised and the step fails or retries like any other error. A retry starts
+    over with `max_checks` checks of its own.
+    """
+
+    def __init__(self, reason: str, delay: int, max_checks: int | None = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.delay = delay
+        self.max_checks = max_checks
+
+
+class StepTimedOut(RuntimeError):
+    def __init__(self, reason, checks):
+        super().__init__(f"Gave up after {checks} checks: {reason}")
+
+
+# Operations a user is waiting on always go first, then renewals for certificates
+# that are close to expiring, then routine renewals.
+USER_PRIORITY = 100
+URGENT_RENEWAL_PRIORITY = 50
+RENEWAL_PRIORITY = 0
+
+
+def operation_priority(operation) -> int:
+    if operation.action != Operation.Actions.RENEW.value:
+        return USER_PRIORITY
+    certificate = operation.service_instance.current_certificate
+    if certificate is None or certificate.expires_at is None:
+        return URGENT_RENEWAL_PRIORITY
+    urgent_after = datetime.now(timezone.utc) + timedelta(
+        days=config.URGENT_RENEWAL_DAYS
+    )
+    if certificate.expires_at <= urgent_after:
+        return URGENT_RENEWAL_PRIORITY
+    return RENEWAL_PRIORITY
+
+
+class Parallel:
+    """
+    A pipeline step made of branches that run at the same time. Each branch is
+    a task or a list of tasks run in order, and the pipeline moves on to its
+    next step once every branch has completed.
+
+    Branches share the operation and its service instance, so they should only
+    touch columns the other branches don't.
+    """
+
+    def __init__(self, *branches):
+        self.branches = [
+            list(branch) if isinstance(branch, (list, tuple)) else [branch]
+            for branch in branches
+        ]
+
+
+class Pipeline:
+    """
+    A named list of tasks (or Parallel groups of tasks) that run in order for an
+    operation.
+
+    Every step is queued with the pipeline's name and its own index, and steps
+    defined with pipeline_operation record those on the operation once they
+    complete. That lets a stalled operation be resumed from the step after the
+    last one it finished, rather than from the beginning. A Parallel step counts
+    as completed once all of its branches are done. The step's name is recorded
+    too, so an operation isn't resumed at the wrong step after a deploy adds,
+    removes, or reorders the pipeline's steps.
+    """
+
+    registry = {}
+
+    def __init__(self, name: str, steps: list):
+        if name in Pipeline.registry:
+            raise RuntimeError(f"Pipeline {name} is already defined")
+        self.name = name
+        self.steps = steps
+        Pipeline.registry[name] = self
+
+    @classmethod
+    def get(cls, name: str):
+        return cls.registry.get(name)
+
+    def step_name(self, index: int) -> str:
+        step = self.steps[index]
+        if isinstance(step, Parallel):
+            branches = [
+                "[" + ", ".join(task.task_class.__name__ for task in branch) + "]"
+                for branch in step.branches
+            ]
+            return f"Parallel({', '.join(branches)})"
+        return step.task_class.__name__
+
+    def queue(self, operation_id: int, correlation_id: str, start_at: int = 0):
+        if start_at >= len(self.steps):
+            raise RuntimeError(
+                f"Pipeline {self.name} has no step {start_at} to start from"
+            )
+        if isinstance(self.steps[start_at], Parallel):
+            self.queue_branches(operation_id, correlation_id, start_at)
+            return
+
+        operation = db.session.get(Operation, operation_id)
+        priority = operation_priority(operation)
+
+        task_pipeline = None
+        for index in range(start_at, len(self.steps)):
+            step = self.steps[index]
+            if isinstance(step, Parallel):
+                # the branches get queued once everything before them is done,
+                # and they queue the rest of the pipeline themselves
+                step = start_branches
+            kwargs = dict(
+                pipeline=self.name,
+                pipeline_step=index,
+                pipeline_step_name=self.step_name(index),
+                correlation_id=correlation_id,
+                priority=priority,
+            )
+            if task_pipeline is None:
+                task_pipeline = step.s(operation_id, **kwargs)
+            else:
+                task_pipeline = task_pipeline.then(step, operation_id, **kwargs)
+            if step is start_branches:
+                break
+        huey.enqueue(task_pipeline)
+
+    def queue_branches(self, operation_id: int, correlation_id: str, index: int):
+        operation = db.session.get(Operation, operation_id)
+        operation.pipeline_branches = []
+        db.session.add(operation)
+        db.session.commit()
+
+        kwargs = dict(
+            correlation_id=correlation_id, priority=operation_priority(operation)
+        )
+        for branch_index, branch in enumerate(self.steps[index].branches):
+            task_pipeline = branch[0].s(operation_id, **kwargs)
+            for task in branch[1:]:
+                task_pipeline = task_pipeline.then(task, operation_id, **kwargs)
+            task_pipeline = task_pipeline.then(
+                join_branches,
+                operation_id,
+                pipeline=self.name,
+                pipeline_step=index,
+                pipeline_step_name=self.step_name(index),
+                branch=branch_index,
+                **kwargs,
+            )
+            huey.enqueue(task_pipeline)
+
+
+@retriable_task
+def start_branches(operation_id: int, pipeline: str, pipeline_step: int, **kwargs):
+    correlation_id = cf_logging.FRAMEWORK.context.get_correlation_id()
+    Pipeline.get(pipeline).queue_branches(operation_id, correlation_id, pipeline_step)
+
+
+@retriable_task
+def join_branches(
+    operation_id: int,
+    pipeline: str,
+    pipeline_step: int,
+    branch: int,
+    pipeline_step_name: str | None = None,
+    **kwargs,
+):
+    pipeline = Pipeline.get(pipeline)
+    # lock the operation so branches finishing at the same time can't both
+    # think they're the last one
+    operation = (
+        db.session.query(Operation)
+        .filter(Operation.id == operation_id)
+        .with_for_update()
+        .populate_existing()
+        .one()
+    )
+    joined = set(operation.pipeline_branches or [])
+    if branch in joined:
+        db.session.commit()
+        return
+    joined.add(branch)
+    operation.pipeline_branches = sorted(joined)
+    flag_modified(operation, "pipeline_branches")
+    done = len(joined) == len(pipeline.steps[pipeline_step].branches)
+    if done:
+        operation.pipeline_name = pipeline.name
+        operation.pipeline_step = pipeline_step
+        operation.pipeline_step_name = pipeline_step_name
+    db.session.add(operation)
+    db.session.commit()
+
+    if done and pipeline_step + 1 < len(pipeline.steps):
+        correlation_id = cf_logging.FRAMEWORK.context.get_correlation_id()
+        pipeline.queue(operation_id, correlation_id, start_at=pipeline_step + 1)
+
 
 @huey.on_startup(name="get_flask")
 def create_app():
@@ -80,16 +291,90 @@ def mark_operation_failed(signal, task, exc=None):
         send_failed_operation_alert(operation)
 
 
-def pipeline_operation(description, is_retriable=True):
+def drain_legacy_queue() -> int:
+    """
+    Move tasks left on the queue and schedule from before there were priorities
+    onto ours, so tasks queued or scheduled by workers running the old code
+    (including retries and rechecks) aren't lost when this is deployed. Returns
+    how many tasks were moved.
+    """
+    conn = huey.storage.conn
+    moved = 0
+    # the old queue was a list that tasks were pushed on the left of
+    while (message := conn.rpop(LEGACY_QUEUE_KEY)) is not None:
+        huey.storage.enqueue(message)
+        moved += 1
+    for message, eta in conn.zrange(LEGACY_SCHEDULE_KEY, 0, -1, withscores=True):
+        # whoever removes it moves it, so it's only moved once
+        if conn.zrem(LEGACY_SCHEDULE_KEY, message):
+            conn.zadd(huey.storage.schedule_key, {message: eta})
+            moved += 1
+    if moved:
+        logger.info(f"Moved {moved} tasks from the legacy huey queue")
+    return moved
+
+
+def schedule_recheck(task, delay, checks):
+    """
+    Schedule `task` to run again after `delay` seconds, moving the rest of its
+    pipeline over to the new task so nothing downstream runs in the meantime.
+    """
+    kwargs = dict(task.kwargs)
+    kwargs["step_checks"] = checks
+    # the correlation ID was popped off of the task before it ran
+    kwargs["correlation_id"] = cf_logging.FRAMEWORK.context.get_correlation_id()
+    recheck = type(task)(
+        task.args,
+        kwargs,
+        eta=normalize_time(delay=delay, utc=huey.utc),
+        retries=task.retries,
+        retry_delay=task.retry_delay,
+        priority=task.priority,
+        on_complete=task.on_complete,
+        on_error=task.on_error,
+    )
+    task.on_complete = None
+    task.on_error = None
+    huey.add_schedule(recheck)
+    return recheck
+
+
+def apply_retry_policy(task, e: Exception, retry_policy: RetryPolicy):
+    """set up how huey retries `task` after it raised `e`"""
+    if not task.retries:
+        return
+    retry = retry_policy.classify(e)
+    if retry == Retry.NEVER:
+        logger.info(
+            f"{task.name} raised {type(e).__name__}, which won't go away by retrying. Not retrying."
+        )
+        task.retries = 0
+        return
+    attempt = task.default_retries - task.retries
+    task.retry_delay = retry_policy.delay(retry, attempt)
+
+
+def pipeline_operation(
+    description, is_retriable=True, retry_policy: RetryPolicy = default_retry_policy
+):
     """
     define a function as a task with an operation intended to be used in a pipeline.
     :param description: the end-user friendly step description
     :param is_retriable: if true, this task may be retried up to 24 times on failure
+    :param retry_policy: decides how soon to retry, or whether to retry at all,
+        based on the exception the task raised
 
     The wrapped function must:
     - have operation_id as a positional argument
     - accept operation and db as keyword arguments
 
+    The wrapped function may raise StepNotReady to be checked again later. It
+    gets the number of times it has already been checked as the `checks` keyword
+    argument.
+
+    When queued as part of a Pipeline, the step records itself as the operation's
+    last completed step once it returns.
+
     Usage:
 
     @pipeline_operation("Get cookies from jar", is_retriable=False):
@@ -98,23 +383,91 @@ def pipeline_operation(description, is_retriable=True):
         db.session.query("select cookie from jar")
     """
     if is_retriable:
-        huey_task = retriable_task
+        huey_task = retriable_step
     else:
-        huey_task = nonretriable_task
+        huey_task = nonretriable_step
 
     def decorate(func):
-        @huey_task
-        @functools.wraps(func)
-        def task(operation_id, **kwargs):
-            operation = db.session.get(Operation, operation_id)
+        def run_step(
+            operation_id,
+            task,
+            step_checks,
+            pipeline,
+            pipeline_step,
+            pipeline_step_name,
+            **kwargs,
+        ):
+            while True:
+                operation = db.session.get(Operation, operation_id)
 
-            operation.step_description = description
-            flag_modified(operation, "step_description")
-            db.session.add(operation)
-            db.session.commit()
+                operation.step_description = description
+                flag_modified(operation, "step_description")
+                db.session.add(operation)
+                db.session.commit()
 
-            return func(operation_id, operation=operation, db=db, **kwargs)
+                try:
+                    result = func(
+                        operation_id,
+                        operation=operation,
+                        db=db,
+                        checks=step_checks,
+                        **kwargs,
+                    )
+                except StepNotReady as e:
+                    step_checks += 1
+                    if e.max_checks is not None and step_checks >= e.max_checks:
+                        raise StepTimedOut(e.reason, step_checks) from e
+                    logger.info(
+                        f"{func.__name__} not ready, checking again in {e.delay}s: {e.reason}",
+                        extra={"operation_id": operation_id, "checks": step_checks},
+                    )
+                    if task is None:
+                        # we're not running in a consumer (e.g. call_local),
+                        # so there's nothing to reschedule. Wait here instead.
+                        time.sleep(e.delay)
+                        continue
+                    schedule_recheck(task, e.delay, step_checks)
+                    return
+
+                if pipeline is not None:
+                    operation = db.session.get(Operation, operation_id)
+                    operation.pipeline_name = pipeline
+                    operation.pipeline_step = pipeline_step
+                    operation.pipeline_step_name = pipeline_step_name
+                    db.session.add(operation)
+                    db.session.commit()
+                return result
+
+        @huey_task
+        @functools.wraps(func)
+        def step(
+            operation_id,
+            task=None,
+            step_checks=0,
+            pipeline=None,
+            pipeline_step=None,
+            pipeline_step_name=None,
+            **kwargs,
+        ):
+            try:
+                return run_step(
+                    operation_id,
+                    task,
+                    step_checks,
+                    pipeline,
+                    pipeline_step,
+                    pipeline_step_name,
+                    **kwargs,
+                )
+            except Exception as e:
+                if task is not None:
+                    if isinstance(e, StepTimedOut):
+                        # huey retries this same task, so without this the
+                        # retry would time out after its first check
+                        task.kwargs["step_checks"] = 0
+                    apply_retry_policy(task, e, retry_policy)
+                raise
 
-        return task
+        return step
 
     return decorate
@@ -1,6 +1,5 @@
 import logging
 from datetime import date
-import time
 
 from botocore.exceptions import ClientError
 from sqlalchemy import and_
@@ -9,7 +8,7 @@ from broker.aws import iam_commercial, iam_govcloud
 from broker.extensions import config
 from broker.lib.cdn import is_cdn_instance
 from broker.models import Certificate
-from broker.tasks.huey import pipeline_operation
+from broker.tasks.huey import pipeline_operation, StepNotReady
 
 logger = logging.getLogger(__name__)
 
@@ -72,7 +71,11 @@ def upload_server_certificate(operation_id: int, *, operation, db, **kwargs):
     db.session.add(certificate)
     db.session.commit()
 
-    time.sleep(propagation_time)
+    if propagation_time:
+        # when we're checked again, we'll see the ARN and move on
+        raise StepNotReady(
+            "Waiting for IAM certificate to propagate", delay=propagation_time
+        )
 
 
 @pipeline_operation("Removing SSL certificate from AWS")
@@ -1,5 +1,6 @@
 import json
 import logging
+import math
 import re
 import time
 from datetime import datetime, timedelta, timezone
@@ -11,13 +12,43 @@ from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 
+from broker.dns import servers_missing_challenges
 from broker.extensions import config
-from broker.models import ACMEUser, Certificate, Challenge, Operation
-from broker.tasks.huey import pipeline_operation
-from broker.acme_client import AcmeClient
+from broker.lib.key_pool import (
+    generate_ecdsa_private_key_pem,
+    generate_private_key_pem,
+)
+from broker.models import (
+    ACMEUser,
+    Certificate,
+    Challenge,
+    KeyTypes,
+    Operation,
+    PooledPrivateKey,
+)
+from broker.tasks.huey import pipeline_operation, StepNotReady
+from broker.acme_client import (
+    account_directory,
+    AcmeClient,
+    certificate_authority_for,
+    CertificateAuthority,
+    client_for,
+    completed_concurrently,
+    get_directory,
+    map_concurrently,
+    order_status,
+    order_watcher,
+    quota_for,
+    ranked_certificate_authorities,
+    USER_AGENT,
+)
 
 logger = logging.getLogger(__name__)
 
+# orders waiting on Let's Encrypt's rate limits are checked at least this
+# often, so cron doesn't take them for stalled pipelines and restart them
+MAX_QUOTA_RECHECK_DELAY_IN_SECONDS = 5 * 60
+
 
 class DNSChallengeNotFound(RuntimeError):
     def __init__(self, domain, obj):
@@ -29,6 +60,18 @@ class ChallengeNotFound(RuntimeError):
         super().__init__(f"Cannot find any challenges for {domain} in {obj}")
 
 
+def valid_authorization_domains(order) -> set[str]:
+    """
+    Domains on the order the CA already has a valid authorization for, usually
+    from the account's last order for them. Their challenges don't need answering.
+    """
+    return {
+        authorization.body.identifier.value
+        for authorization in order.authorizations
+        if authorization.body.status == messages.STATUS_VALID
+    }
+
+
 def dns_challenge(order, domain):
     """Extract authorization resource from within order resource."""
 
@@ -57,8 +100,34 @@ def create_user(operation_id: int, *, operation, db, **kwargs):
     if service_instance.acme_user_id is not None:
         return
 
-    acme_user = ACMEUser()
+    # initiate_challenges switches accounts if this CA can't take the order
+    acme_user = account_for(ranked_certificate_authorities()[0])
+
     service_instance.acme_user = acme_user
+    db.session.add(operation)
+    db.session.add(service_instance)
+    db.session.add(acme_user)
+    db.session.commit()
+
+
+def account_for(ca: CertificateAuthority) -> ACMEUser:
+    """an account with `ca` for a service instance to use"""
+    # Instances share a pool of accounts, so most provisions skip generating
+    # a key and registering. The pool fills up as instances are provisioned.
+    pool = []
+    if config.ACME_ACCOUNT_POOL_SIZE:
+        pool = ACMEUser.pool(ca.directory)
+    if pool and len(pool) >= config.ACME_ACCOUNT_POOL_SIZE:
+        acme_user, load = pool[0]
+        logger.info(
+            f"Using pooled ACME account {acme_user.id}, already used by {load} instances"
+        )
+        return acme_user
+    return register_acme_user(ca, pooled=config.ACME_ACCOUNT_POOL_SIZE > 0)
+
+
+def register_acme_user(ca: CertificateAuthority, pooled: bool) -> ACMEUser:
+    acme_user = ACMEUser(pooled=pooled, acme_directory=ca.directory)
     key = josepy.JWKRSA(
         key=rsa.generate_private_key(
             public_exponent=65537, key_size=2048, backend=default_backend()
@@ -71,22 +140,31 @@ def create_user(operation_id: int, *, operation, db, **kwargs):
     )
     acme_user.private_key_pem = private_key_pem_in_binary.decode("utf-8")
 
-    net = client.ClientNetwork(key, user_agent="cloud.gov external domain broker")
-    directory = messages.Directory.from_json(net.get(config.ACME_DIRECTORY).json())
-    client_acme = AcmeClient(directory, net=net)
+    net = client.ClientNetwork(key, user_agent=USER_AGENT)
+    directory = get_directory(net, ca.directory)
+    client_acme = AcmeClient(directory, net=net, directory_url=ca.directory)
+
+    # some CAs only take accounts bound to an account we have with them
+    external_account_binding = None
+    if ca.eab_kid:
+        external_account_binding = messages.ExternalAccountBinding.from_data(
+            account_public_key=key.public_key(),
+            kid=ca.eab_kid,
+            hmac_key=ca.eab_hmac_key,
+            directory=directory,
+        )
 
     acme_user.email = "cloud-gov-operations@gsa.gov"
     registration = client_acme.new_account(
         messages.NewRegistration.from_data(
-            email=acme_user.email, terms_of_service_agreed=True
+            email=acme_user.email,
+            terms_of_service_agreed=True,
+            external_account_binding=external_account_binding,
         )
     )
     acme_user.registration_json = registration.json_dumps()
     acme_user.uri = registration.uri
-    db.session.add(operation)
-    db.session.add(service_instance)
-    db.session.add(acme_user)
-    db.session.commit()
+    return acme_user
 
 
 @pipeline_operation("Creating credentials for Lets Encrypt", is_retriable=False)
@@ -100,16 +178,20 @@ def generate_private_key(operation_id: int, *, operation, db, **kwargs):
     certificate.service_instance = service_instance
     service_instance.new_certificate = certificate
     certificate.subject_alternative_names = service_instance.domain_names
-
-    # Create private key.
-    private_key = OpenSSL.crypto.PKey()
-    private_key.generate_key(OpenSSL.crypto.TYPE_RSA, 2048)
-
-    # Get the PEM
-    private_key_pem_in_binary = OpenSSL.crypto.dump_privatekey(
-        OpenSSL.crypto.FILETYPE_PEM, private_key
+    certificate.key_type = (
+        service_instance.key_type or config.DEFAULT_CERTIFICATE_KEY_TYPE
     )
 
+    if certificate.key_type == KeyTypes.ECDSA.value:
+        private_key_pem = generate_ecdsa_private_key_pem()
+    else:
+        # Take a private key generated ahead of time, or make one if there aren't any
+        private_key_pem = PooledPrivateKey.take()
+        if private_key_pem is None:
+            logger.info("Private key pool is empty, generating a key")
+            private_key_pem = generate_private_key_pem()
+    private_key_pem_in_binary = private_key_pem.encode("utf-8")
+
     # Get the CSR for the domains
     csr_pem_in_binary = crypto_util.make_csr(
         private_key_pem_in_binary, service_instance.domain_names
@@ -134,23 +216,67 @@ def initiate_challenges(operation_id: int, *, operation, db, **kwargs):
     if certificate.order_json is not None:
         return
 
-    account_key = serialization.load_pem_private_key(
-        acme_user.private_key_pem.encode(), password=None, backend=default_backend()
-    )
-    wrapped_account_key = josepy.JWKRSA(key=account_key)
+    order_id = f"certificate:{certificate.id}"
+    renewal = operation.action == Operation.Actions.RENEW.value
+    # renewals stick with the CA that issued the current certificate, unless
+    # it's unhealthy or out of quota
+    current = service_instance.current_certificate
+    if current is not None and current.acme_directory is not None:
+        preferred = current.acme_directory
+    else:
+        preferred = account_directory(acme_user)
+
+    waits = []
+    for ca in ranked_certificate_authorities(preferred):
+        ca_user = None
+        if account_directory(acme_user) == ca.directory:
+            ca_user = acme_user
+        wait = quota_for(ca).admit(
+            order_id,
+            ca_user and ca_user.id,
+            service_instance.domain_names,
+            renewal,
+            check_only=True,
+        )
+        if wait <= 0:
+            break
+        waits.append(wait)
+    else:
+        # check again when the first CA has room
+        _wait_for_quota(operation, db, min(waits))
+
+    if ca_user is None:
+        logger.info(
+            f"Ordering certificate for instance {service_instance.id} from {ca.name}"
+        )
+        ca_user = account_for(ca)
+        service_instance.acme_user = ca_user
+        db.session.add(service_instance)
+        db.session.add(ca_user)
+        db.session.commit()
+        acme_user = ca_user
 
-    registration = json.loads(acme_user.registration_json)
-    net = client.ClientNetwork(
-        wrapped_account_key,
-        user_agent="cloud.gov external domain broker",
-        account=registration,
+    wait = quota_for(ca).admit(
+        order_id, acme_user.id, service_instance.domain_names, renewal
     )
-    directory = messages.Directory.from_json(net.get(config.ACME_DIRECTORY).json())
-    client_acme = AcmeClient(directory, net=net)
+    if wait > 0:
+        _wait_for_quota(operation, db, wait)
+
+    client_acme = client_for(acme_user)
+    wrapped_account_key = client_acme.net.key
 
     order = client_acme.new_order(certificate.csr_pem.encode())
     order_json = json.dumps(order.to_json())
     certificate.order_json = order_json
+    certificate.acme_directory = ca.directory
+
+    # Challenges for these are marked answered, so we skip creating TXT
+    # records, waiting on them, and answering.
+    already_valid = valid_authorization_domains(order)
+    if already_valid:
+        logger.info(
+            f"Reusing valid authorizations for {sorted(already_valid)} on instance {service_instance.id}"
+        )
 
     for domain in service_instance.domain_names:
         challenge_body = dns_challenge(order, domain)
@@ -166,55 +292,101 @@ def initiate_challenges(operation_id: int, *, operation, db, **kwargs):
         challenge.certificate = certificate
         challenge.validation_domain = challenge_body.validation_domain_name(domain)
         challenge.validation_contents = challenge_validation_contents
+        challenge.answered = domain in already_valid
         db.session.add(challenge)
 
     db.session.commit()
 
 
+def _wait_for_quota(operation, db, wait):
+    resume_at = datetime.now(timezone.utc) + timedelta(seconds=wait)
+    # shown to users as the operation's description until it's admitted
+    operation.step_description = f"Waiting for room under certificate authority rate limits, expected by {resume_at:%Y-%m-%d %H:%M} UTC"
+    db.session.add(operation)
+    db.session.commit()
+    raise StepNotReady(
+        operation.step_description,
+        delay=min(wait, MAX_QUOTA_RECHECK_DELAY_IN_SECONDS),
+    )
+
+
 @pipeline_operation("Answering Lets Encrypt challenges")
 def answer_challenges(operation_id: int, *, operation, db, **kwargs):
     operation = db.session.get(Operation, operation_id)
     service_instance = operation.service_instance
     acme_user = service_instance.acme_user
+    certificate = service_instance.new_certificate
 
-    challenges = service_instance.new_certificate.challenges.all()
+    challenges = certificate.challenges.all()
     unanswered = [challenge for challenge in challenges if not challenge.answered]
     if not unanswered:
         return
 
-    time.sleep(config.DNS_PROPAGATION_SLEEP_TIME)
-
-    account_key = serialization.load_pem_private_key(
-        acme_user.private_key_pem.encode(), password=None, backend=default_backend()
-    )
-    wrapped_account_key = josepy.JWKRSA(key=account_key)
+    # rechecks can run on any worker, so the wait is timed from when it started
+    # rather than by counting checks, which would leave out the time spent on
+    # lookups and waiting in the queue
+    if certificate.dns_propagation_started_at is None:
+        certificate.dns_propagation_started_at = datetime.now(timezone.utc)
+        db.session.add(certificate)
+        db.session.commit()
 
-    registration = json.loads(acme_user.registration_json)
-    net = client.ClientNetwork(
-        wrapped_account_key,
-        user_agent="cloud.gov external domain broker",
-        account=registration,
-    )
-    directory = messages.Directory.from_json(net.get(config.ACME_DIRECTORY).json())
-    client_acme = AcmeClient(directory, net=net)
+    if config.DNS_PROPAGATION_CHECK_ENABLED:
+        missing = servers_missing_challenges(unanswered)
+        waited = (
+            datetime.now(timezone.utc) - certificate.dns_propagation_started_at
+        ).total_seconds()
+        if missing and waited < config.DNS_PROPAGATION_SLEEP_TIME:
+            raise StepNotReady(
+                "Waiting for DNS changes to propagate",
+                delay=min(
+                    config.DNS_PROPAGATION_CHECK_INTERVAL,
+                    math.ceil(config.DNS_PROPAGATION_SLEEP_TIME - waited),
+                ),
+            )
+        if missing:
+            logger.warning(
+                f"TXT records for instance {service_instance.id} still missing from {missing} after {waited:.0f} seconds, answering anyway"
+            )
+    else:
+        # without the check, all we can do is give the records the whole time
+        waited = (
+            datetime.now(timezone.utc) - certificate.dns_propagation_started_at
+        ).total_seconds()
+        if waited < config.DNS_PROPAGATION_SLEEP_TIME:
+            raise StepNotReady(
+                "Waiting for DNS changes to propagate",
+                delay=math.ceil(config.DNS_PROPAGATION_SLEEP_TIME - waited),
+            )
 
+    # this covers an edge case where we run an update shortly after initial
+    # provisioning or renewal, for challenges saved before initiate_challenges
+    # checked for valid authorizations
+    to_answer = []
     for challenge in unanswered:
-        if json.loads(challenge.body_json)["status"] == "valid":
-            # this covers an edge case where we run an update
-            # shortly after initial provisioning or renewal
-            # it arguably makes more sense to do when we get the challenges
-            # but doing so makes testing worlds harder
+        body = json.loads(challenge.body_json)
+        if body["status"] == "valid":
             challenge.answered = True
             db.session.add(challenge)
-            db.session.commit()
-            continue
-        challenge_body = messages.ChallengeBody.from_json(
-            json.loads(challenge.body_json)
-        )
-        challenge_response = challenge_body.response(wrapped_account_key)
+        else:
+            to_answer.append((challenge, messages.ChallengeBody.from_json(body)))
+    db.session.commit()
+
+    def answer(client_acme, item):
+        _, challenge_body = item
+        challenge_response = challenge_body.response(client_acme.net.key)
         # Let the CA server know that we are ready for the challenge.
-        response = client_acme.answer_challenge(challenge_body, challenge_response)
-        print(response)
+        return client_acme.answer_challenge(challenge_body, challenge_response)
+
+    # the CA validates each domain on its own, so tell it about all of them at
+    # once. Each challenge is saved as answered as soon as the CA has it, so if
+    # another one fails, the retry doesn't answer it again
+    error = None
+    for (challenge, _), future in completed_concurrently(acme_user, answer, to_answer):
+        try:
+            response = future.result()
+        except Exception as e:
+            error = error or e
+            continue
         if response.body.error is not None:
             # log the error for now. We haven't reproduced this locally, so we can't act on it yet
             # but it would be interesting in the real world
@@ -224,10 +396,12 @@ def answer_challenges(operation_id: int, *, operation, db, **kwargs):
         challenge.answered = True
         db.session.add(challenge)
         db.session.commit()
+    if error is not None:
+        raise error
 
 
 @pipeline_operation("Retrieving SSL certificate from Lets Encrypt")
-def retrieve_certificate(operation_id: int, *, operation, db, **kwargs):
+def retrieve_certificate(operation_id: int, *, operation, db, checks=0, **kwargs):
     def cert_from_fullchain(fullchain_pem: str) -> str:
         """extract cert_pem from fullchain_pem
 
@@ -261,63 +435,86 @@ def retrieve_certificate(operation_id: int, *, operation, db, **kwargs):
     if certificate.leaf_pem is not None:
         return
 
-    account_key = serialization.load_pem_private_key(
-        acme_user.private_key_pem.encode(), password=None, backend=default_backend()
-    )
-    wrapped_account_key = josepy.JWKRSA(key=account_key)
-
-    registration = json.loads(acme_user.registration_json)
-    net = client.ClientNetwork(
-        wrapped_account_key,
-        user_agent="cloud.gov external domain broker",
-        account=registration,
-    )
-    directory = messages.Directory.from_json(net.get(config.ACME_DIRECTORY).json())
-    client_acme = AcmeClient(directory, net=net)
-
     order_json = json.loads(certificate.order_json)
-    # The csr_pem in the JSON is a binary string, but finalize_order() expects
-    # utf-8?  So we set it here from our saved copy.
+    # The csr_pem in the JSON is a binary string, but begin_finalization()
+    # expects utf-8?  So we set it here from our saved copy.
     order_json["csr_pem"] = certificate.csr_pem
     order = messages.OrderResource.from_json(order_json)
 
-    deadline = datetime.now() + timedelta(seconds=config.ACME_POLL_TIMEOUT_IN_SECONDS)
-    try:
-        finalized_order = client_acme.poll_and_finalize(orderr=order, deadline=deadline)
-    except messages.Error as e:
-        # this means we're trying to fulfill an order that's already fulfilled
-        if """Order's status ("valid")""" in e.detail:
-            # Check if we got a certificate already. Do we have a cert, and does its expiration look good?
-            next_month = datetime.now() + timedelta(days=31)
-            next_month = next_month.replace(tzinfo=timezone.utc)
-            if (
-                certificate.expires_at is not None
-                and certificate.expires_at > next_month
-            ):
-                return
-            else:
-                finalized_order = client_acme.get_cert_for_finalized_order(
-                    order, deadline
+    # the first check comes right after the challenges were answered, so it
+    # can't use a status from before then
+    max_age = 0 if checks == 0 else _order_poll_delay(checks - 1)
+    status = order_watcher.order(acme_user.id, order.uri, max_age)
+
+    if status["status"] == "ready":
+        client_acme = client_for(acme_user)
+        fetched_at = time.time()
+        try:
+            finalizing_order = client_acme.begin_finalization(order)
+            status = order_status(finalizing_order.body, datetime.now())
+        except messages.Error as e:
+            # this means someone else finalized the order since its status was
+            # fetched, so find out what it is now
+            if "Order's status" not in (e.detail or ""):
+                logger.error(
+                    f"failed to retrieve certificate for {service_instance.domain_names} with code {e.code}, {e.description}, {e.detail}"
                 )
-        else:
-            logger.error(
-                f"failed to retrieve certificate for {service_instance.domain_names} with code {e.code}, {e.description}, {e.detail}"
-            )
-            raise e
-    except errors.ValidationError as e:
+                raise e
+            status = order_status(*client_acme.get_order(order.uri))
+        order_watcher.save(order.uri, status, fetched_at)
+
+    if status["status"] == "invalid":
+        authorizations = map_concurrently(
+            acme_user,
+            lambda client_acme, url: client_acme.get_authorization(url),
+            order.body.authorizations,
+        )
+        failed = [
+            authzr
+            for authzr in authorizations
+            if authzr.body.status == messages.STATUS_INVALID
+        ]
+        ca = certificate_authority_for(account_directory(acme_user))
+        for authzr in failed:
+            if ca is not None:
+                quota_for(ca).record_failure(acme_user.id, authzr.body.identifier.value)
         logger.error(
-            f"failed to retrieve certificate for {service_instance.domain_names} with errors {e.failed_authzrs}"
+            f"failed to retrieve certificate for {service_instance.domain_names} with errors {failed or status['error']}"
         )
-        # if we fail validation, nuke the cert record and its challenges.
-        # this way, when we retry from the beginning, we won't try to reuse them
-        # the bad new is that we'll still retry this task a bunch of times before the pipeline fails
-        new_cert = service_instance.new_certificate
+        # an invalid order can't be used again, so nuke the cert record and its
+        # challenges. This way, when we retry from the beginning, we won't try
+        # to reuse them. Failed validation fails the pipeline right away (see
+        # RetryPolicy), other errors are retried
         service_instance.new_certificate = None
-        db.session.delete(new_cert)
+        db.session.delete(certificate)
         db.session.add(service_instance)
         db.session.commit()
-        raise e
+        if failed:
+            raise errors.ValidationError(failed)
+        if status["error"] is not None:
+            raise errors.IssuanceError(messages.Error.from_json(status["error"]))
+        raise errors.Error(
+            "The certificate order failed. No further information was provided by the server."
+        )
+
+    if status["status"] != "valid" or status["certificate"] is None:
+        if status["status"] == "pending":
+            reason = "Waiting for Lets Encrypt to validate the challenges"
+        else:
+            reason = "Waiting for Lets Encrypt to issue the certificate"
+        raise StepNotReady(
+            reason,
+            delay=max(_order_poll_delay(checks), status["retry_after"] - time.time()),
+            max_checks=_order_poll_max_checks(),
+        )
 
+    fullchain_pem = client_for(acme_user).get_certificate(status["certificate"])
+    finalized_order = order.update(
+        body=order.body.update(
+            status=messages.STATUS_VALID, certificate=status["certificate"]
+        ),
+        fullchain_pem=fullchain_pem,
+    )
     certificate.leaf_pem, certificate.fullchain_pem = cert_from_fullchain(
         finalized_order.fullchain_pem
     )
@@ -331,3 +528,21 @@ def retrieve_certificate(operation_id: int, *, operation, db, **kwargs):
     db.session.add(service_instance)
     db.session.add(certificate)
     db.session.commit()
+
+
+def _order_poll_delay(checks):
+    # challenges are often validated, and certificates issued, within seconds,
+    # so check quickly at first and back off to the usual poll interval
+    return min(
+        config.ACME_POLL_WAIT_TIME_IN_SECONDS,
+        config.ACME_INITIAL_POLL_WAIT_TIME_IN_SECONDS * 2**checks,
+    )
+
+
+def _order_poll_max_checks():
+    # enough checks to keep waiting for ACME_POLL_TIMEOUT_IN_SECONDS
+    checks = waited = 0
+    while waited < config.ACME_POLL_TIMEOUT_IN_SECONDS:
+        waited += _order_poll_delay(checks)
+        checks += 1
+    return checks
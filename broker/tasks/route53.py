@@ -2,9 +2,10 @@ import logging
 
 from sqlalchemy.orm.attributes import flag_modified
 
-from broker.aws import route53
+from broker.aws import route53, route53_changes, status_watcher
 from broker.extensions import config
-from broker.tasks.huey import pipeline_operation
+from broker.lib.route53_coalescer import chunk_changes
+from broker.tasks.huey import pipeline_operation, StepNotReady
 
 logger = logging.getLogger(__name__)
 
@@ -13,44 +14,30 @@ logger = logging.getLogger(__name__)
 def create_TXT_records(operation_id: int, *, operation, db, **kwargs):
     service_instance = operation.service_instance
 
+    changes = []
     for challenge in [
         c for c in service_instance.new_certificate.challenges if not c.answered
     ]:
-        domain = challenge.validation_domain
-        txt_record = f"{domain}.{config.DNS_ROOT_DOMAIN}"
-        contents = challenge.validation_contents
-        logger.info(f'Creating TXT record {txt_record} with contents "{contents}"')
-        route53_response = route53.change_resource_record_sets(
-            ChangeBatch={
-                "Changes": [
-                    {
-                        "Action": "UPSERT",
-                        "ResourceRecordSet": {
-                            "Type": "TXT",
-                            "Name": txt_record,
-                            "ResourceRecords": [{"Value": f'"{contents}"'}],
-                            "TTL": 60,
-                        },
-                    }
-                ]
-            },
-            HostedZoneId=config.ROUTE53_ZONE_ID,
-        )
-        change_id = route53_response["ChangeInfo"]["Id"]
+        changes.append(_TXT_change("UPSERT", challenge))
+
+    for batch in chunk_changes(changes):
+        change_id = route53_changes.submit(batch)
         logger.info(f"Saving Route53 TXT change ID: {change_id}")
         service_instance.route53_change_ids.append(change_id)
-        flag_modified(service_instance, "route53_change_ids")
-        db.session.add(service_instance)
-        db.session.commit()
+    flag_modified(service_instance, "route53_change_ids")
+    db.session.add(service_instance)
+    db.session.commit()
 
 
 @pipeline_operation("Removing DNS TXT records")
 def remove_TXT_records(operation_id: int, *, operation, db, **kwargs):
     service_instance = operation.service_instance
 
+    changes = []
     for certificate in service_instance.certificates:
         for challenge in certificate.challenges:
-            _delete_TXT_record(challenge)
+            changes.append(_TXT_change("DELETE", challenge))
+    _delete_records(changes)
 
 
 @pipeline_operation("Removing old DNS records")
@@ -66,32 +53,69 @@ def remove_old_DNS_records(operation_id: int, *, operation, db, **kwargs):
         for challenge in challenges
         if challenge.domain not in service_instance.domain_names
     ]
+    changes = []
     for challenge in challenges_to_remove:
-        _delete_TXT_record(challenge)
-        _delete_ALIAS_record(challenge.domain, service_instance)
+        changes.append(_TXT_change("DELETE", challenge))
+        changes += _ALIAS_changes("DELETE", challenge.domain, service_instance)
+    _delete_records(changes)
 
 
 @pipeline_operation("Waiting for DNS changes")
-def wait_for_changes(operation_id: int, *, operation, db, **kwargs):
+def wait_for_changes(operation_id: int, *, operation, db, checks=0, **kwargs):
     service_instance = operation.service_instance
 
     change_ids = service_instance.route53_change_ids.copy()
     logger.info(f"Waiting for {len(change_ids)} Route53 change IDs: {change_ids}")
-    for change_id in change_ids:
-        logger.info(f"Waiting for: {change_id}")
-        waiter = route53.get_waiter("resource_record_sets_changed")
-        waiter.wait(
-            Id=change_id,
-            WaiterConfig={
-                "Delay": config.AWS_POLL_WAIT_TIME_IN_SECONDS,
-                "MaxAttempts": config.AWS_POLL_MAX_ATTEMPTS,
-            },
-        )
-        service_instance.route53_change_ids.remove(change_id)
+    # pipelines share change IDs, so only check on each one once
+    statuses = {}
+    for pending_change_id in change_ids:
+        # changes queued to go out with other pipelines' changes don't have
+        # a change ID until they're submitted
+        change_id = route53_changes.resolve(pending_change_id)
+        if change_id is None:
+            continue
+        if change_id not in statuses:
+            logger.info(f"Checking on: {change_id}")
+            # any status from since the last check will do
+            max_age = 0 if checks == 0 else _change_poll_delay(checks - 1)
+            statuses[change_id] = status_watcher.change(change_id, max_age)
+        index = service_instance.route53_change_ids.index(pending_change_id)
+        if statuses[change_id] == "INSYNC":
+            del service_instance.route53_change_ids[index]
+        else:
+            service_instance.route53_change_ids[index] = change_id
+
+    if service_instance.route53_change_ids != change_ids:
         flag_modified(service_instance, "route53_change_ids")
         db.session.add(service_instance)
         db.session.commit()
 
+    if service_instance.route53_change_ids:
+        raise StepNotReady(
+            f"{len(service_instance.route53_change_ids)} Route53 changes are not in sync",
+            delay=_change_poll_delay(checks),
+            max_checks=_change_poll_max_checks(),
+        )
+
+
+def _change_poll_delay(checks):
+    # changes are often in sync within seconds, so check quickly at first and
+    # back off to the usual poll interval
+    return min(
+        config.AWS_POLL_WAIT_TIME_IN_SECONDS,
+        config.ROUTE53_INITIAL_POLL_WAIT_TIME_IN_SECONDS * 2**checks,
+    )
+
+
+def _change_poll_max_checks():
+    # give up after as many full poll intervals as any other AWS wait, not
+    # counting the quick checks at the start
+    quick_checks = 0
+    if config.ROUTE53_INITIAL_POLL_WAIT_TIME_IN_SECONDS > 0:
+        while _change_poll_delay(quick_checks) < config.AWS_POLL_WAIT_TIME_IN_SECONDS:
+            quick_checks += 1
+    return quick_checks + config.AWS_POLL_MAX_ATTEMPTS
+
 
 @pipeline_operation("Creating DNS ALIAS records")
 def create_ALIAS_records(operation_id: str, *, operation, db, **kwargs):
@@ -99,47 +123,17 @@ def create_ALIAS_records(operation_id: str, *, operation, db, **kwargs):
 
     logger.info(f"Creating ALIAS records for {service_instance.domain_names}")
 
+    changes = []
     for domain in service_instance.domain_names:
-        alias_record = f"{domain}.{config.DNS_ROOT_DOMAIN}"
-        target = service_instance.domain_internal
-        logger.info(f'Creating ALIAS record {alias_record} pointing to "{target}"')
-        route53_response = route53.change_resource_record_sets(
-            ChangeBatch={
-                "Changes": [
-                    {
-                        "Action": "UPSERT",
-                        "ResourceRecordSet": {
-                            "Type": "A",
-                            "Name": alias_record,
-                            "AliasTarget": {
-                                "DNSName": target,
-                                "HostedZoneId": service_instance.route53_alias_hosted_zone,
-                                "EvaluateTargetHealth": False,
-                            },
-                        },
-                    },
-                    {
-                        "Action": "UPSERT",
-                        "ResourceRecordSet": {
-                            "Type": "AAAA",
-                            "Name": alias_record,
-                            "AliasTarget": {
-                                "DNSName": target,
-                                "HostedZoneId": service_instance.route53_alias_hosted_zone,
-                                "EvaluateTargetHealth": False,
-                            },
-                        },
-                    },
-                ]
-            },
-            HostedZoneId=config.ROUTE53_ZONE_ID,
-        )
-        change_id = route53_response["ChangeInfo"]["Id"]
+        changes += _ALIAS_changes("UPSERT", domain, service_instance)
+
+    for batch in chunk_changes(changes):
+        change_id = route53_changes.submit(batch)
         logger.info(f"Saving Route53 ALIAS change ID: {change_id}")
         service_instance.route53_change_ids.append(change_id)
-        flag_modified(service_instance, "route53_change_ids")
-        db.session.add(service_instance)
-        db.session.commit()
+    flag_modified(service_instance, "route53_change_ids")
+    db.session.add(service_instance)
+    db.session.commit()
 
 
 @pipeline_operation("Removing DNS ALIAS records")
@@ -148,8 +142,10 @@ def remove_ALIAS_records(operation_id: str, *, operation, db, **kwargs):
 
     logger.info(f"Removing ALIAS records for {service_instance.domain_names}")
 
+    changes = []
     for domain in service_instance.domain_names:
-        _delete_ALIAS_record(domain, service_instance)
+        changes += _ALIAS_changes("DELETE", domain, service_instance)
+    _delete_records(changes)
 
 
 @pipeline_operation("Creating new health checks")
@@ -313,75 +309,55 @@ def _delete_health_check(health_check_id):
         )
 
 
-def _delete_ALIAS_record(domain, service_instance):
+def _delete_records(changes):
+    # Route53 rejects batches that delete the same record twice
+    unique_changes = []
+    for change in changes:
+        if change not in unique_changes:
+            unique_changes.append(change)
+    # deleting records that are already gone is fine, so errors are ignored
+    for batch in chunk_changes(unique_changes):
+        change_id = route53_changes.submit(batch, ignore_errors=True)
+        if change_id is not None:
+            logger.info(f"Not tracking change ID: {change_id}")
+
+
+def _ALIAS_changes(action, domain, service_instance):
     alias_record = f"{domain}.{config.DNS_ROOT_DOMAIN}"
     target = service_instance.domain_internal
-    logger.info(f'Removing ALIAS record {alias_record} pointing to "{target}"')
-
-    try:
-        route53_response = route53.change_resource_record_sets(
-            ChangeBatch={
-                "Changes": [
-                    {
-                        "Action": "DELETE",
-                        "ResourceRecordSet": {
-                            "Type": "A",
-                            "Name": alias_record,
-                            "AliasTarget": {
-                                "DNSName": target,
-                                "HostedZoneId": service_instance.route53_alias_hosted_zone,
-                                "EvaluateTargetHealth": False,
-                            },
-                        },
-                    },
-                    {
-                        "Action": "DELETE",
-                        "ResourceRecordSet": {
-                            "Type": "AAAA",
-                            "Name": alias_record,
-                            "AliasTarget": {
-                                "DNSName": target,
-                                "HostedZoneId": service_instance.route53_alias_hosted_zone,
-                                "EvaluateTargetHealth": False,
-                            },
-                        },
-                    },
-                ]
+    verb = "Creating" if action == "UPSERT" else "Removing"
+    logger.info(f'{verb} ALIAS record {alias_record} pointing to "{target}"')
+
+    return [
+        {
+            "Action": action,
+            "ResourceRecordSet": {
+                "Type": record_type,
+                "Name": alias_record,
+                "AliasTarget": {
+                    "DNSName": target,
+                    "HostedZoneId": service_instance.route53_alias_hosted_zone,
+                    "EvaluateTargetHealth": False,
+                },
             },
-            HostedZoneId=config.ROUTE53_ZONE_ID,
-        )
-    except:  # noqa E722
-        logger.info("Ignoring error because we don't care")
-    else:
-        change_id = route53_response["ChangeInfo"]["Id"]
-        logger.info(f"Not tracking change ID: {change_id}")
+        }
+        for record_type in ["A", "AAAA"]
+    ]
 
 
-def _delete_TXT_record(challenge):
+def _TXT_change(action, challenge):
     domain = challenge.validation_domain
     txt_record = f"{domain}.{config.DNS_ROOT_DOMAIN}"
     contents = challenge.validation_contents
-    logger.info(f'Removing TXT record {txt_record} with contents "{contents}"')
-
-    try:
-        route53_response = route53.change_resource_record_sets(
-            ChangeBatch={
-                "Changes": [
-                    {
-                        "Action": "DELETE",
-                        "ResourceRecordSet": {
-                            "Type": "TXT",
-                            "Name": txt_record,
-                            "ResourceRecords": [{"Value": f'"{contents}"'}],
-                            "TTL": 60,
-                        },
-                    }
-                ]
-            },
-            HostedZoneId=config.ROUTE53_ZONE_ID,
-        )
-    except:  # noqa E722
-        logger.info("Ignoring error because we don't care")
-    else:
-        change_id = route53_response["ChangeInfo"]["Id"]
-        logger.info(f"Ignoring Route53 TXT change ID: {change_id}")
+    verb = "Creating" if action == "UPSERT" else "Removing"
+    logger.info(f'{verb} TXT record {txt_record} with contents "{contents}"')
+
+    return {
+        "Action": action,
+        "ResourceRecordSet": {
+            "Type": "TXT",
+            "Name": txt_record,
+            "ResourceRecords": [{"Value": f'"{contents}"'}],
+            "TTL": 60,
+        },
+    }
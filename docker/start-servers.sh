@@ -17,7 +17,7 @@ if ! pgrep -x pebble > /dev/null; then
   echo "Starting Pebble"
   (
     cd /
-    PEBBLE_WFE_NONCEREJECT=0 pebble \
+    PEBBLE_WFE_NONCEREJECT=0 PEBBLE_AUTHZREUSE=0 PEBBLE_VA_NOSLEEP=1 pebble \
       -config="/test/config/pebble-config.json" \
       -dnsserver="127.0.0.1:8053" \
       -strict \
@@ -0,0 +1,104 @@
+import time
+import uuid
+
+import pytest
+
+from broker.extensions import redis
+from broker.lib.acme_order_watcher import (
+    ACCOUNTS_KEY,
+    ACMEOrderWatcher,
+    WATCH_KEY,
+)
+
+
+class FakeCA:
+    def __init__(self):
+        self.statuses = {}
+        self.fetched = []
+
+    def fetch(self, acme_user_id, order_uri):
+        self.fetched.append(order_uri)
+        status, retry_after = self.statuses[order_uri].pop(0)
+        return {
+            "status": status,
+            "certificate": None,
+            "error": None,
+            "retry_after": time.time() + retry_after,
+        }
+
+
+@pytest.fixture
+def ca():
+    return FakeCA()
+
+
+@pytest.fixture
+def watcher(ca):
+    watcher = ACMEOrderWatcher(ca.fetch, True, 0.1, 0, redis)
+    watcher.redis.delete(WATCH_KEY, ACCOUNTS_KEY)
+    yield watcher
+    watcher.redis.delete(WATCH_KEY, ACCOUNTS_KEY)
+
+
+@pytest.fixture
+def order_uri(watcher):
+    order_uri = f"https://localhost:14000/my-order/{uuid.uuid4()}"
+    yield order_uri
+    watcher.redis.delete(watcher.status_key(order_uri))
+
+
+def test_later_checks_share_the_status(watcher, ca, order_uri):
+    ca.statuses[order_uri] = [("pending", 0)]
+
+    first = watcher.order(1, order_uri, max_age=0)
+    second = watcher.order(1, order_uri, max_age=60)
+
+    assert first == second
+    assert first["status"] == "pending"
+    assert ca.fetched == [order_uri]
+
+
+def test_refresh_polls_due_orders_once(watcher, ca, order_uri):
+    ca.statuses[order_uri] = [("pending", 0), ("processing", 0)]
+    watcher.order(1, order_uri, max_age=0)
+    time.sleep(0.1)
+
+    watcher.refresh()
+    watcher.refresh()
+
+    assert watcher.order(1, order_uri, max_age=60)["status"] == "processing"
+    assert ca.fetched == [order_uri] * 2
+
+
+def test_refresh_skips_settled_orders(watcher, ca, order_uri):
+    ca.statuses[order_uri] = [("valid", 0)]
+    watcher.order(1, order_uri, max_age=0)
+    time.sleep(0.1)
+
+    watcher.refresh()
+
+    assert ca.fetched == [order_uri]
+
+
+def test_refresh_waits_for_retry_after(watcher, ca, order_uri):
+    ca.statuses[order_uri] = [("processing", 60)]
+    watcher.order(1, order_uri, max_age=0)
+    time.sleep(0.1)
+
+    watcher.refresh()
+
+    assert ca.fetched == [order_uri]
+
+
+def test_saved_statuses_replace_older_ones(watcher, ca, order_uri):
+    ca.statuses[order_uri] = [("ready", 0)]
+    fetched_at = time.time()
+    watcher.order(1, order_uri, max_age=0)
+
+    watcher.save(
+        order_uri,
+        {"status": "processing", "certificate": None, "error": None, "retry_after": 0},
+        fetched_at + 1,
+    )
+
+    assert watcher.order(1, order_uri, max_age=60)["status"] == "processing"
@@ -0,0 +1,39 @@
+import uuid
+
+import pytest
+
+from broker.extensions import redis
+from broker.lib.ca_health import CAHealth, MIN_REQUESTS
+
+
+@pytest.fixture
+def health():
+    return CAHealth(True, 0.5, 10, redis)
+
+
+@pytest.fixture
+def directory():
+    return f"https://{uuid.uuid4()}.example/dir"
+
+
+def test_cas_without_enough_requests_are_healthy(health, directory):
+    health.record(directory, 1, ok=False)
+
+    assert health.is_healthy(directory)
+
+
+def test_cas_with_mostly_errors_are_unhealthy(health, directory):
+    for _ in range(MIN_REQUESTS):
+        health.record(directory, 1, ok=False)
+    health.record(directory, 1, ok=True)
+
+    assert health.stats(directory)["requests"] == MIN_REQUESTS + 1
+    assert not health.is_healthy(directory)
+
+
+def test_slow_cas_are_unhealthy(health, directory):
+    for _ in range(MIN_REQUESTS):
+        health.record(directory, 30, ok=True)
+
+    assert health.stats(directory)["latency"] == pytest.approx(30)
+    assert not health.is_healthy(directory)
@@ -0,0 +1,55 @@
+import uuid
+
+import pytest
+
+from broker.extensions import redis
+from broker.lib.issuance_quota import IssuanceQuota
+
+
+@pytest.fixture
+def acme_user_id():
+    # random, so tests don't share windows
+    return uuid.uuid4().int % 1_000_000_000
+
+
+@pytest.fixture
+def quota():
+    return IssuanceQuota(
+        "test",
+        {
+            "new_orders_per_account": [2, 60],
+            "failed_validations_per_hostname": [1, 60],
+        },
+        True,
+        redis,
+    )
+
+
+def test_admits_orders_until_the_window_is_full(quota, acme_user_id):
+    assert quota.admit("certificate:1", acme_user_id, ["example.com"], False) == 0
+    assert quota.admit("certificate:2", acme_user_id, ["example.com"], False) == 0
+
+    wait = quota.admit("certificate:3", acme_user_id, ["example.com"], False)
+
+    assert 0 < wait <= 60
+
+
+def test_admitting_an_order_again_does_not_count_it_twice(quota, acme_user_id):
+    for _ in range(3):
+        assert quota.admit("certificate:1", acme_user_id, ["example.com"], False) == 0
+
+
+def test_failed_validations_hold_back_their_hostname(quota, acme_user_id):
+    quota.record_failure(acme_user_id, "example.com")
+
+    assert quota.admit("certificate:1", acme_user_id, ["example.com"], False) > 0
+    assert quota.admit("certificate:2", acme_user_id, ["example.org"], False) == 0
+
+
+def test_projected_start_counts_the_windows_needed(quota, acme_user_id):
+    orders = [(acme_user_id, [f"{i}.example.com"], True) for i in range(5)]
+
+    projected = quota.projected_start(orders)
+
+    # 2 now, 2 after one window, and 1 after another
+    assert projected - quota.redis.time()[0] == pytest.approx(120, abs=5)
@@ -605,3 +605,152 @@ def test_provision_error_invalid_origin_request_policy(
     assert client.response.status_code == response_status_code
 
     cloudfront.assert_no_pending_responses()
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [CDNServiceInstance, CDNDedicatedWAFServiceInstance],
+)
+def test_provision_sets_origin_shield_region(
+    dns,
+    client,
+    organization_guid,
+    space_guid,
+    instance_model,
+    provision_params,
+    service_instance_id,
+    mocked_cf_api,
+):
+    provision_params.update({"origin_shield_region": "us-east-1"})
+    dns.add_cname("_acme-challenge.example.com")
+
+    client.provision_instance(
+        instance_model,
+        service_instance_id,
+        params=provision_params,
+        organization_guid=organization_guid,
+        space_guid=space_guid,
+    )
+
+    assert client.response.status_code == 202
+    instance = db.session.get(instance_model, service_instance_id)
+    assert instance.origin_shield_region == "us-east-1"
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [CDNServiceInstance, CDNDedicatedWAFServiceInstance],
+)
+def test_provision_error_invalid_origin_shield_region(
+    dns,
+    client,
+    organization_guid,
+    space_guid,
+    instance_model,
+    provision_params,
+    service_instance_id,
+    mocked_cf_api,
+):
+    provision_params.update({"origin_shield_region": "us-gov-west-1"})
+    dns.add_cname("_acme-challenge.example.com")
+
+    client.provision_instance(
+        instance_model,
+        service_instance_id,
+        params=provision_params,
+        organization_guid=organization_guid,
+        space_guid=space_guid,
+    )
+
+    assert client.response.status_code == 400
+    assert "origin_shield_region" in client.response.json.get("description")
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [CDNServiceInstance, CDNDedicatedWAFServiceInstance],
+)
+def test_provision_defaults_http_version_and_compress(
+    dns,
+    client,
+    organization_guid,
+    space_guid,
+    instance_model,
+    provision_params,
+    service_instance_id,
+    mocked_cf_api,
+):
+    dns.add_cname("_acme-challenge.example.com")
+
+    client.provision_instance(
+        instance_model,
+        service_instance_id,
+        params=provision_params,
+        organization_guid=organization_guid,
+        space_guid=space_guid,
+    )
+
+    assert client.response.status_code == 202
+    instance = db.session.get(instance_model, service_instance_id)
+    assert instance.http_version == "http2and3"
+    assert instance.compress is True
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [CDNServiceInstance, CDNDedicatedWAFServiceInstance],
+)
+def test_provision_sets_http_version_and_compress(
+    dns,
+    client,
+    organization_guid,
+    space_guid,
+    instance_model,
+    provision_params,
+    service_instance_id,
+    mocked_cf_api,
+):
+    provision_params.update({"http_version": "http2", "compress": False})
+    dns.add_cname("_acme-challenge.example.com")
+
+    client.provision_instance(
+        instance_model,
+        service_instance_id,
+        params=provision_params,
+        organization_guid=organization_guid,
+        space_guid=space_guid,
+    )
+
+    assert client.response.status_code == 202
+    instance = db.session.get(instance_model, service_instance_id)
+    assert instance.http_version == "http2"
+    assert instance.compress is False
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [CDNServiceInstance, CDNDedicatedWAFServiceInstance],
+)
+def test_provision_error_invalid_http_version(
+    dns,
+    client,
+    organization_guid,
+    space_guid,
+    instance_model,
+    provision_params,
+    service_instance_id,
+    mocked_cf_api,
+):
+    provision_params.update({"http_version": "http1.1"})
+    dns.add_cname("_acme-challenge.example.com")
+
+    client.provision_instance(
+        instance_model,
+        service_instance_id,
+        params=provision_params,
+        organization_guid=organization_guid,
+        space_guid=space_guid,
+    )
+
+    assert client.response.status_code == 400
+    assert "http_version" in client.response.json.get("description")
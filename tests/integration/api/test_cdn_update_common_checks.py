@@ -522,3 +522,126 @@ def test_update_error_invalid_origin_request_policy(
     )
 
     assert client.response.status_code == response_status_code
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [CDNServiceInstance, CDNDedicatedWAFServiceInstance],
+)
+def test_update_sets_origin_shield_region(
+    dns,
+    client,
+    instance_model,
+    service_instance,
+    mocked_cf_api,
+):
+    dns.add_cname("_acme-challenge.example.com")
+
+    client.update_instance(
+        instance_model,
+        service_instance.id,
+        params={
+            "domains": ["example.com"],
+            "origin_shield_region": "eu-west-1",
+            "alarm_notification_email": "foo@bar",
+        },
+    )
+
+    assert client.response.status_code == 202
+    instance = db.session.get(instance_model, service_instance.id)
+    assert instance.origin_shield_region == "eu-west-1"
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [CDNServiceInstance, CDNDedicatedWAFServiceInstance],
+)
+def test_update_unsets_origin_shield_region(
+    dns,
+    client,
+    instance_model,
+    service_instance,
+    mocked_cf_api,
+):
+    service_instance.origin_shield_region = "eu-west-1"
+    db.session.add(service_instance)
+    db.session.commit()
+    dns.add_cname("_acme-challenge.example.com")
+
+    client.update_instance(
+        instance_model,
+        service_instance.id,
+        params={
+            "domains": ["example.com"],
+            "origin_shield_region": None,
+            "alarm_notification_email": "foo@bar",
+        },
+    )
+
+    assert client.response.status_code == 202
+    instance = db.session.get(instance_model, service_instance.id)
+    assert instance.origin_shield_region is None
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [CDNServiceInstance, CDNDedicatedWAFServiceInstance],
+)
+def test_update_sets_http_version_and_compress(
+    dns,
+    client,
+    instance_model,
+    service_instance,
+    mocked_cf_api,
+):
+    dns.add_cname("_acme-challenge.example.com")
+
+    client.update_instance(
+        instance_model,
+        service_instance.id,
+        params={
+            "domains": ["example.com"],
+            "http_version": "http2",
+            "compress": False,
+            "alarm_notification_email": "foo@bar",
+        },
+    )
+
+    assert client.response.status_code == 202
+    instance = db.session.get(instance_model, service_instance.id)
+    assert instance.http_version == "http2"
+    assert instance.compress is False
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [CDNServiceInstance, CDNDedicatedWAFServiceInstance],
+)
+def test_update_unsets_http_version_and_compress(
+    dns,
+    client,
+    instance_model,
+    service_instance,
+    mocked_cf_api,
+):
+    service_instance.http_version = "http2"
+    service_instance.compress = False
+    db.session.add(service_instance)
+    db.session.commit()
+    dns.add_cname("_acme-challenge.example.com")
+
+    client.update_instance(
+        instance_model,
+        service_instance.id,
+        params={
+            "domains": ["example.com"],
+            "http_version": None,
+            "compress": None,
+            "alarm_notification_email": "foo@bar",
+        },
+    )
+
+    assert client.response.status_code == 202
+    instance = db.session.get(instance_model, service_instance.id)
+    assert instance.http_version == "http2and3"
+    assert instance.compress is True
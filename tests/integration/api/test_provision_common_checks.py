@@ -251,3 +251,24 @@ def test_refuses_to_provision_with_incorrect_acme_challenge_CNAME(
 
     assert " _acme-challenge.bar.com" not in desc
     assert client.response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [
+        ALBServiceInstance,
+        DedicatedALBServiceInstance,
+        CDNServiceInstance,
+        CDNDedicatedWAFServiceInstance,
+    ],
+)
+def test_refuses_to_provision_with_unknown_key_type(
+    client, dns, instance_model, mocked_cf_api
+):
+    dns.add_cname("_acme-challenge.example.com")
+    client.provision_instance(
+        instance_model, "4321", params={"domains": "example.com", "key_type": "DSA"}
+    )
+
+    assert "key_type" in client.response.json.get("description")
+    assert client.response.status_code == 400
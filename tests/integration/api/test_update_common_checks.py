@@ -394,3 +394,38 @@ def test_refuses_update_for_instance_with_operation(
 
     assert "in progress" in desc
     assert client.response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [
+        ALBServiceInstance,
+        CDNServiceInstance,
+        CDNDedicatedWAFServiceInstance,
+        DedicatedALBServiceInstance,
+    ],
+)
+def test_update_to_new_key_type_gets_new_certificate(
+    instance_model, client, service_instance
+):
+    client.update_instance(instance_model, "4321", params={"key_type": "ecdsa"})
+
+    assert client.response.status_code == 202, client.response.body
+    instance = db.session.get(instance_model, "4321")
+    assert instance.key_type == "ECDSA"
+    assert instance.new_certificate_id != instance.current_certificate_id
+
+
+@pytest.mark.parametrize(
+    "instance_model",
+    [
+        ALBServiceInstance,
+        DedicatedALBServiceInstance,
+    ],
+)
+def test_update_to_current_key_type_is_a_noop(instance_model, client, service_instance):
+    client.update_instance(instance_model, "4321", params={"key_type": "RSA"})
+
+    assert client.response.status_code == 200, client.response.body
+    instance = db.session.get(instance_model, "4321")
+    assert instance.key_type == "RSA"
@@ -0,0 +1,46 @@
+import uuid
+
+import pytest
+
+from broker.extensions import redis
+from broker.lib.aws_rate_limiter import AWSRateLimiter
+
+
+@pytest.fixture
+def limiter():
+    # use a service name nothing else does, so runs don't share buckets
+    service = f"test-{uuid.uuid4()}"
+    limiter = AWSRateLimiter({service: 10}, redis)
+    limiter.service = service
+    yield limiter
+    limiter.redis.delete(f"aws-rate-limit:aws:{service}")
+
+
+def test_calls_within_burst_do_not_wait(limiter):
+    waits = [limiter.wait("aws", limiter.service, "ListThings") for _ in range(10)]
+
+    assert waits == [0] * 10
+
+
+def test_calls_past_burst_wait_their_turn(limiter, monkeypatch):
+    slept = []
+    monkeypatch.setattr("broker.lib.aws_rate_limiter.time.sleep", slept.append)
+
+    for _ in range(10):
+        limiter.wait("aws", limiter.service, "ListThings")
+    first = limiter.wait("aws", limiter.service, "ListThings")
+    second = limiter.wait("aws", limiter.service, "ListThings")
+
+    assert 0 < first <= 0.1
+    assert first < second <= 0.2
+    assert slept == [first, second]
+
+
+def test_partitions_have_separate_buckets(limiter, monkeypatch):
+    monkeypatch.setattr("broker.lib.aws_rate_limiter.time.sleep", lambda _: None)
+
+    for _ in range(11):
+        limiter.wait("aws", limiter.service, "ListThings")
+
+    assert limiter.wait("aws-us-gov", limiter.service, "ListThings") == 0
+    limiter.redis.delete(f"aws-rate-limit:aws-us-gov:{limiter.service}")
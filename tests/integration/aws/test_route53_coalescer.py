@@ -0,0 +1,110 @@
+import uuid
+
+import pytest
+from botocore.exceptions import ClientError
+
+from broker.aws import route53 as real_route53
+from broker.extensions import redis
+from broker.lib.route53_coalescer import Route53ChangeCoalescer
+
+
+def txt_change(action, name):
+    return {
+        "Action": action,
+        "ResourceRecordSet": {
+            "Type": "TXT",
+            "Name": name,
+            "ResourceRecords": [{"Value": '"abc"'}],
+            "TTL": 60,
+        },
+    }
+
+
+@pytest.fixture
+def coalescer():
+    # use a zone nothing else does, so runs don't share a queue
+    zone_id = f"test-{uuid.uuid4()}"
+    coalescer = Route53ChangeCoalescer(real_route53, zone_id, 60, redis)
+    yield coalescer
+    coalescer.redis.delete(coalescer.pending_key, coalescer.lock_key)
+
+
+def expect_changes(route53, coalescer, changes, change_id):
+    route53.stubber.add_response(
+        "change_resource_record_sets",
+        route53._change_info(change_id),
+        {"ChangeBatch": {"Changes": changes}, "HostedZoneId": coalescer.zone_id},
+    )
+
+
+def expect_invalid_changes(route53, coalescer, changes):
+    route53.stubber.add_client_error(
+        "change_resource_record_sets",
+        "InvalidChangeBatch",
+        "Tried to delete resource record set but it was not found",
+        expected_params={
+            "ChangeBatch": {"Changes": changes},
+            "HostedZoneId": coalescer.zone_id,
+        },
+    )
+
+
+def test_changes_are_held_until_the_window_passes(coalescer, route53):
+    ticket = coalescer.submit([txt_change("UPSERT", "foo.example.com")])
+
+    assert ticket.startswith("ticket:")
+    assert coalescer.resolve(ticket) is None
+
+
+def test_changes_from_many_tickets_share_a_batch(coalescer, route53):
+    foo = [txt_change("UPSERT", "foo.example.com")]
+    bar = [txt_change("UPSERT", "bar.example.com")]
+    foo_ticket = coalescer.submit(foo)
+    bar_ticket = coalescer.submit(bar)
+    expect_changes(route53, coalescer, foo + bar, "shared ID")
+    # let the window pass
+    coalescer.window = -60
+
+    assert coalescer.resolve(foo_ticket) == "shared ID"
+    assert coalescer.resolve(bar_ticket) == "shared ID"
+    assert coalescer.redis.llen(coalescer.pending_key) == 0
+
+
+def test_rejected_batches_are_retried_a_ticket_at_a_time(coalescer, route53):
+    foo = [txt_change("UPSERT", "foo.example.com")]
+    gone = [txt_change("DELETE", "gone.example.com")]
+    bad = [txt_change("DELETE", "bad.example.com")]
+    foo_ticket = coalescer.submit(foo)
+    coalescer.submit(gone, ignore_errors=True)
+    bad_ticket = coalescer.submit(bad)
+    expect_invalid_changes(route53, coalescer, foo + gone + bad)
+    expect_changes(route53, coalescer, foo, "foo ID")
+    expect_invalid_changes(route53, coalescer, gone)
+    expect_invalid_changes(route53, coalescer, bad)
+    coalescer.window = -60
+
+    assert coalescer.resolve(foo_ticket) == "foo ID"
+    with pytest.raises(ClientError):
+        coalescer.resolve(bad_ticket)
+
+
+def test_throttled_batches_stay_queued(coalescer, route53):
+    foo = [txt_change("UPSERT", "foo.example.com")]
+    foo_ticket = coalescer.submit(foo)
+    route53.stubber.add_client_error("change_resource_record_sets", "Throttling")
+    coalescer.window = -60
+
+    with pytest.raises(ClientError):
+        coalescer.resolve(foo_ticket)
+
+    expect_changes(route53, coalescer, foo, "foo ID")
+    assert coalescer.resolve(foo_ticket) == "foo ID"
+
+
+def test_no_window_submits_right_away(coalescer, route53):
+    foo = [txt_change("UPSERT", "foo.example.com")]
+    expect_changes(route53, coalescer, foo, "foo ID")
+    coalescer.window = 0
+
+    assert coalescer.submit(foo) == "foo ID"
+    assert coalescer.resolve("foo ID") == "foo ID"
@@ -0,0 +1,149 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from broker.aws import cloudfront as real_cloudfront
+from broker.aws import route53 as real_route53
+from broker.extensions import redis
+from broker.lib.aws_status_watcher import AWSStatusWatcher
+
+
+@pytest.fixture
+def watcher():
+    watcher = AWSStatusWatcher(real_cloudfront, real_route53, True, redis)
+    watching = [watcher.watch_key("distribution"), watcher.watch_key("change")]
+    watcher.redis.delete(*watching)
+    yield watcher
+    watcher.redis.delete(*watching)
+
+
+@pytest.fixture
+def distribution_id(watcher):
+    distribution_id = f"test-{uuid.uuid4()}"
+    yield distribution_id
+    watcher.redis.delete(watcher.status_key("distribution", distribution_id))
+
+
+ORIGINS = {
+    "Quantity": 1,
+    "Items": [{"Id": "origin", "DomainName": "origin.example.com"}],
+}
+
+
+def expect_get_distribution(cloudfront, distribution_id, status):
+    cloudfront.stubber.add_response(
+        "get_distribution",
+        {
+            "Distribution": {
+                "Id": distribution_id,
+                "ARN": "arn",
+                "Status": status,
+                "LastModifiedTime": datetime.now(timezone.utc),
+                "InProgressInvalidationBatches": 0,
+                "DomainName": "fake1234.cloudfront.net",
+                "DistributionConfig": {
+                    "CallerReference": "ref",
+                    "Origins": ORIGINS,
+                    "DefaultCacheBehavior": {
+                        "TargetOriginId": "origin",
+                        "ViewerProtocolPolicy": "allow-all",
+                    },
+                    "Comment": "",
+                    "Enabled": True,
+                },
+            }
+        },
+        {"Id": distribution_id},
+    )
+
+
+def expect_list_distributions(cloudfront, summaries):
+    cloudfront.stubber.add_response(
+        "list_distributions",
+        {
+            "DistributionList": {
+                "Marker": "",
+                "MaxItems": 100,
+                "IsTruncated": False,
+                "Quantity": len(summaries),
+                "Items": summaries,
+            }
+        },
+        {},
+    )
+
+
+def summary(distribution_id, status):
+    return {
+        "Id": distribution_id,
+        "ARN": "arn",
+        "Status": status,
+        "LastModifiedTime": datetime.now(timezone.utc),
+        "DomainName": "fake1234.cloudfront.net",
+        "Aliases": {"Quantity": 0},
+        "Origins": ORIGINS,
+        "DefaultCacheBehavior": {
+            "TargetOriginId": "origin",
+            "ViewerProtocolPolicy": "allow-all",
+        },
+        "CacheBehaviors": {"Quantity": 0},
+        "CustomErrorResponses": {"Quantity": 0},
+        "Comment": "",
+        "PriceClass": "PriceClass_100",
+        "Enabled": True,
+        "ViewerCertificate": {},
+        "Restrictions": {"GeoRestriction": {"RestrictionType": "none", "Quantity": 0}},
+        "WebACLId": "",
+        "HttpVersion": "http2",
+        "IsIPV6Enabled": True,
+        "Staging": False,
+    }
+
+
+def test_later_checks_share_the_status(watcher, distribution_id, cloudfront):
+    expect_get_distribution(cloudfront, distribution_id, "InProgress")
+
+    first = watcher.distribution(distribution_id, max_age=0)
+    second = watcher.distribution(distribution_id, max_age=60)
+
+    assert first == second == {"Status": "InProgress", "Enabled": True}
+    cloudfront.assert_no_pending_responses()
+
+
+def test_refresh_checks_waiting_distributions_in_bulk(
+    watcher, distribution_id, cloudfront
+):
+    expect_get_distribution(cloudfront, distribution_id, "InProgress")
+    watcher.distribution(distribution_id, max_age=0)
+    expect_list_distributions(
+        cloudfront,
+        [summary("someone-else", "InProgress"), summary(distribution_id, "Deployed")],
+    )
+
+    watcher.refresh()
+
+    assert watcher.distribution(distribution_id, max_age=60) == {
+        "Status": "Deployed",
+        "Enabled": True,
+    }
+    cloudfront.assert_no_pending_responses()
+
+
+def test_refresh_checks_shared_changes_once(watcher, route53):
+    change_id = f"test-{uuid.uuid4()}"
+    route53.stubber.add_response(
+        "get_change", route53._change_info(change_id, "PENDING"), {"Id": change_id}
+    )
+    watcher.change(change_id, max_age=0)
+    route53.stubber.add_response(
+        "get_change", route53._change_info(change_id, "INSYNC"), {"Id": change_id}
+    )
+
+    watcher.refresh()
+    # in sync changes stay in sync, so they aren't checked again
+    watcher.refresh()
+
+    assert watcher.change(change_id, max_age=60) == "INSYNC"
+    route53.assert_no_pending_responses()
+    watcher.redis.delete(watcher.status_key("change", change_id))
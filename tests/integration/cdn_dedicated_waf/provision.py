@@ -5,6 +5,7 @@ from broker.models import (
     CDNDedicatedWAFServiceInstance,
 )
 from broker.tasks.cloudwatch import _get_alarm_name, generate_ddos_alarm_name
+from broker.tasks.huey import huey
 
 
 def subtest_provision_create_web_acl(tasks, wafv2, service_instance_id="4321"):
@@ -238,3 +239,10 @@ def subtest_provision_subscribes_sns_notification_topic(
         service_instance.sns_notification_topic_subscription_arn
         == f"{service_instance.id}-subscription-arn"
     )
+
+
+def subtest_provision_joins_branch(tasks, last=False):
+    tasks.run_queued_tasks_and_enqueue_dependents()
+
+    # only the last branch to finish queues the rest of the pipeline
+    assert bool(huey.pending()) == last
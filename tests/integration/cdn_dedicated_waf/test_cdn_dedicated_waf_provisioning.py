@@ -56,6 +56,7 @@ from tests.integration.cdn_dedicated_waf.provision import (
     subtest_provision_creates_sns_notification_topic,
     subtest_provision_creates_ddos_detected_alarm,
     subtest_provision_subscribes_sns_notification_topic,
+    subtest_provision_joins_branch,
 )
 from tests.integration.cdn_dedicated_waf.update import (
     subtest_update_web_acl_does_not_update,
@@ -71,7 +72,6 @@ from tests.integration.cdn_dedicated_waf.update import (
     subtest_update_unsubscribe_sns_notification_topic,
 )
 
-
 # The subtests below are "interesting".  Before test_provision_happy_path, we
 # had separate tests for each stage in the task pipeline.  But each test would
 # have to duplicate much of the previous test.  This was arduous and slow. Now
@@ -102,48 +102,81 @@ def test_provision_happy_path(
         client, dns, organization_guid, space_guid, instance_model
     )
     check_last_operation_description(client, "4321", operation_id, "Queuing tasks")
-    subtest_provision_creates_LE_user(tasks, instance_model)
-    check_last_operation_description(
-        client, "4321", operation_id, "Registering user for Lets Encrypt"
-    )
-    subtest_provision_creates_private_key_and_csr(tasks, instance_model)
-    check_last_operation_description(
-        client, "4321", operation_id, "Creating credentials for Lets Encrypt"
-    )
-    subtest_provision_initiates_LE_challenge(tasks, instance_model)
-    check_last_operation_description(
-        client, "4321", operation_id, "Initiating Lets Encrypt challenges"
-    )
-    subtest_provision_updates_TXT_records(tasks, route53, instance_model)
-    check_last_operation_description(
-        client, "4321", operation_id, "Updating DNS TXT records"
-    )
-    subtest_provision_waits_for_route53_changes(tasks, route53, instance_model)
-    check_last_operation_description(
-        client, "4321", operation_id, "Waiting for DNS changes"
-    )
-    subtest_provision_answers_challenges(tasks, dns, instance_model)
-    check_last_operation_description(
-        client, "4321", operation_id, "Answering Lets Encrypt challenges"
-    )
-    subtest_provision_retrieves_certificate(tasks, instance_model)
-    check_last_operation_description(
-        client, "4321", operation_id, "Retrieving SSL certificate from Lets Encrypt"
-    )
-    subtest_provision_uploads_certificate_to_iam(
-        tasks, iam_commercial, simple_regex, instance_model
-    )
-    check_last_operation_description(
-        client, "4321", operation_id, "Uploading SSL certificate to AWS"
-    )
-    subtest_provision_create_web_acl(tasks, wafv2)
-    check_last_operation_description(
-        client, "4321", operation_id, "Creating custom WAFv2 web ACL"
-    )
-    subtest_provision_put_web_acl_logging_configuration(tasks, wafv2)
+    # the certificate, WAF web ACL, SNS topic and health checks are created in
+    # parallel branches, so step through them one branch at a time
+    with tasks.hold_back(
+        "create_web_acl", "create_notification_topic", "create_new_health_checks"
+    ):
+        subtest_provision_creates_LE_user(tasks, instance_model)
+        check_last_operation_description(
+            client, "4321", operation_id, "Registering user for Lets Encrypt"
+        )
+        subtest_provision_creates_private_key_and_csr(tasks, instance_model)
+        check_last_operation_description(
+            client, "4321", operation_id, "Creating credentials for Lets Encrypt"
+        )
+        subtest_provision_initiates_LE_challenge(tasks, instance_model)
+        check_last_operation_description(
+            client, "4321", operation_id, "Initiating Lets Encrypt challenges"
+        )
+        subtest_provision_updates_TXT_records(tasks, route53, instance_model)
+        check_last_operation_description(
+            client, "4321", operation_id, "Updating DNS TXT records"
+        )
+        subtest_provision_waits_for_route53_changes(tasks, route53, instance_model)
+        check_last_operation_description(
+            client, "4321", operation_id, "Waiting for DNS changes"
+        )
+        subtest_provision_answers_challenges(tasks, dns, instance_model)
+        check_last_operation_description(
+            client, "4321", operation_id, "Answering Lets Encrypt challenges"
+        )
+        subtest_provision_retrieves_certificate(tasks, instance_model)
+        check_last_operation_description(
+            client,
+            "4321",
+            operation_id,
+            "Retrieving SSL certificate from Lets Encrypt",
+        )
+        subtest_provision_uploads_certificate_to_iam(
+            tasks, iam_commercial, simple_regex, instance_model
+        )
+        check_last_operation_description(
+            client, "4321", operation_id, "Uploading SSL certificate to AWS"
+        )
+        subtest_provision_joins_branch(tasks)
+    with tasks.hold_back("create_notification_topic", "create_new_health_checks"):
+        subtest_provision_create_web_acl(tasks, wafv2)
+        check_last_operation_description(
+            client, "4321", operation_id, "Creating custom WAFv2 web ACL"
+        )
+        subtest_provision_put_web_acl_logging_configuration(tasks, wafv2)
+        check_last_operation_description(
+            client,
+            "4321",
+            operation_id,
+            "Updating WAFv2 web ACL logging configuration",
+        )
+        subtest_provision_joins_branch(tasks)
+    with tasks.hold_back("create_new_health_checks"):
+        subtest_provision_creates_sns_notification_topic(
+            tasks, sns_commercial, instance_model
+        )
+        check_last_operation_description(
+            client, "4321", operation_id, "Creating SNS notification topic"
+        )
+        subtest_provision_subscribes_sns_notification_topic(
+            tasks, sns_commercial, instance_model
+        )
+        check_last_operation_description(
+            client, "4321", operation_id, "Subscribing to SNS notification topic"
+        )
+        subtest_provision_joins_branch(tasks)
+    subtest_provision_creates_health_checks(tasks, route53, instance_model)
     check_last_operation_description(
-        client, "4321", operation_id, "Updating WAFv2 web ACL logging configuration"
+        client, "4321", operation_id, "Creating new health checks"
     )
+    subtest_provision_joins_branch(tasks, last=True)
     subtest_provision_creates_cloudfront_distribution(tasks, cloudfront, instance_model)
     check_last_operation_description(
         client, "4321", operation_id, "Creating CloudFront distribution"
@@ -154,49 +187,47 @@ def test_provision_happy_path(
     check_last_operation_description(
         client, "4321", operation_id, "Waiting for CloudFront distribution"
     )
-    subtest_provision_provisions_ALIAS_records(tasks, route53, instance_model)
-    check_last_operation_description(
-        client, "4321", operation_id, "Creating DNS ALIAS records"
-    )
-    subtest_provision_waits_for_route53_changes(tasks, route53, instance_model)
-    check_last_operation_description(
-        client, "4321", operation_id, "Waiting for DNS changes"
-    )
-    subtest_provision_creates_sns_notification_topic(
-        tasks, sns_commercial, instance_model
-    )
-    check_last_operation_description(
-        client, "4321", operation_id, "Creating SNS notification topic"
-    )
-    subtest_provision_subscribes_sns_notification_topic(
-        tasks, sns_commercial, instance_model
-    )
-    check_last_operation_description(
-        client, "4321", operation_id, "Subscribing to SNS notification topic"
-    )
-    subtest_provision_creates_health_checks(tasks, route53, instance_model)
-    check_last_operation_description(
-        client, "4321", operation_id, "Creating new health checks"
-    )
-    subtest_provision_associate_health_check(tasks, shield, instance_model)
-    check_last_operation_description(
-        client, "4321", operation_id, "Associating health check with Shield"
-    )
-    subtest_provision_creates_health_check_alarms(
-        tasks, cloudwatch_commercial, instance_model
-    )
-    check_last_operation_description(
-        client,
-        "4321",
-        operation_id,
-        "Creating Cloudwatch alarms for Route53 health checks",
-    )
+    # the ALIAS records, Shield health check and alarms only depend on the
+    # distribution, so they're created in parallel branches too
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    with tasks.hold_back(
+        "associate_health_check",
+        "create_health_check_alarms",
+        "create_ddos_detected_alarm",
+    ):
+        subtest_provision_provisions_ALIAS_records(tasks, route53, instance_model)
+        check_last_operation_description(
+            client, "4321", operation_id, "Creating DNS ALIAS records"
+        )
+        subtest_provision_waits_for_route53_changes(tasks, route53, instance_model)
+        check_last_operation_description(
+            client, "4321", operation_id, "Waiting for DNS changes"
+        )
+        subtest_provision_joins_branch(tasks)
+    with tasks.hold_back("create_health_check_alarms", "create_ddos_detected_alarm"):
+        subtest_provision_associate_health_check(tasks, shield, instance_model)
+        check_last_operation_description(
+            client, "4321", operation_id, "Associating health check with Shield"
+        )
+        subtest_provision_joins_branch(tasks)
+    with tasks.hold_back("create_ddos_detected_alarm"):
+        subtest_provision_creates_health_check_alarms(
+            tasks, cloudwatch_commercial, instance_model
+        )
+        check_last_operation_description(
+            client,
+            "4321",
+            operation_id,
+            "Creating Cloudwatch alarms for Route53 health checks",
+        )
+        subtest_provision_joins_branch(tasks)
     subtest_provision_creates_ddos_detected_alarm(
         tasks, cloudwatch_commercial, instance_model
     )
     check_last_operation_description(
         client, "4321", operation_id, "Creating DDoS detection alarm"
     )
+    subtest_provision_joins_branch(tasks, last=True)
     subtest_provision_marks_operation_as_succeeded(tasks, instance_model)
     check_last_operation_description(client, "4321", operation_id, "Complete!")
     subtest_update_happy_path(
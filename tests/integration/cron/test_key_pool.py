@@ -0,0 +1,59 @@
+import pytest
+
+from broker.extensions import config, db
+from broker.models import CDNServiceInstance, PooledPrivateKey
+from broker.tasks.cron import refill_private_keys
+from broker.tasks.letsencrypt import generate_private_key
+
+from tests.lib import factories
+
+
+@pytest.fixture
+def pool_size():
+    size = config.PRIVATE_KEY_POOL_SIZE
+    config.PRIVATE_KEY_POOL_SIZE = 3
+    yield 3
+    config.PRIVATE_KEY_POOL_SIZE = size
+
+
+@pytest.fixture
+def provision_operation(clean_db):
+    service_instance = factories.CDNServiceInstanceFactory.create(
+        id="1234", domain_names=["example.com"]
+    )
+    return factories.OperationFactory.create(id=4321, service_instance=service_instance)
+
+
+def test_refill_private_keys_tops_up_the_pool(clean_db, pool_size):
+    db.session.add(PooledPrivateKey(private_key_pem="already here"))
+    db.session.commit()
+
+    refill_private_keys()
+
+    pems = [pooled_key.private_key_pem for pooled_key in PooledPrivateKey.query]
+    assert len(pems) == 3
+    assert "already here" in pems
+    assert all("PRIVATE KEY" in pem for pem in pems if pem != "already here")
+
+
+def test_generate_private_key_takes_a_pooled_key(
+    clean_db, pool_size, provision_operation
+):
+    refill_private_keys()
+    oldest = PooledPrivateKey.query.order_by(PooledPrivateKey.id).first()
+    oldest_pem = oldest.private_key_pem
+    db.session.expunge_all()
+
+    generate_private_key.call_local(4321)
+
+    instance = db.session.get(CDNServiceInstance, "1234")
+    assert instance.new_certificate.private_key_pem == oldest_pem
+    assert "CERTIFICATE REQUEST" in instance.new_certificate.csr_pem
+    assert PooledPrivateKey.query.count() == 2
+
+
+def test_generate_private_key_without_pooled_keys(clean_db, provision_operation):
+    generate_private_key.call_local(4321)
+
+    instance = db.session.get(CDNServiceInstance, "1234")
+    assert "PRIVATE KEY" in instance.new_certificate.private_key_pem
@@ -4,7 +4,7 @@ import pytest
 from broker.extensions import db
 from broker.models import Operation
 from broker.tasks.cron import scan_for_stalled_pipelines, reschedule_operation
-from broker.tasks.huey import huey
+from broker.tasks.huey import huey, Pipeline
 from sqlalchemy import text
 
 import tests.lib.factories as factories
@@ -106,3 +106,63 @@ def test_reschedules_operation(clean_db, action):
     reschedule_operation(1234)
     assert len(huey.pending()) == 1
     huey.dequeue()
+
+
+def test_reschedules_operation_from_the_step_after_the_last_completed_one(clean_db):
+    stalled_operation = factories.OperationFactory.create(
+        id=1234,
+        state="in progress",
+        action="Provision",
+        pipeline_name="cdn_provision",
+        pipeline_step=8,
+        pipeline_step_name=Pipeline.get("cdn_provision").step_name(8),
+    )
+    db.session.add(stalled_operation)
+    db.session.commit()
+
+    reschedule_operation(1234)
+    pending = huey.pending()
+    assert len(pending) == 1
+    assert pending[0].name.endswith("wait_for_distribution")
+    assert pending[0].kwargs["pipeline"] == "cdn_provision"
+    assert pending[0].kwargs["pipeline_step"] == 9
+    assert pending[0].kwargs["correlation_id"] == "Recovered operation"
+    huey.dequeue()
+
+
+def test_reschedules_operation_from_the_start_for_unknown_pipelines(clean_db):
+    stalled_operation = factories.OperationFactory.create(
+        id=1234,
+        state="in progress",
+        action="Provision",
+        pipeline_name="no_such_pipeline",
+        pipeline_step=8,
+    )
+    db.session.add(stalled_operation)
+    db.session.commit()
+
+    reschedule_operation(1234)
+    pending = huey.pending()
+    assert len(pending) == 1
+    assert pending[0].kwargs["pipeline_step"] == 0
+    huey.dequeue()
+
+
+def test_reschedules_operation_from_the_start_when_the_pipeline_changed(clean_db):
+    stalled_operation = factories.OperationFactory.create(
+        id=1234,
+        state="in progress",
+        action="Provision",
+        pipeline_name="cdn_provision",
+        pipeline_step=8,
+        # a step that was at this index before a deploy moved it
+        pipeline_step_name=Pipeline.get("cdn_provision").step_name(7),
+    )
+    db.session.add(stalled_operation)
+    db.session.commit()
+
+    reschedule_operation(1234)
+    pending = huey.pending()
+    assert len(pending) == 1
+    assert pending[0].kwargs["pipeline_step"] == 0
+    huey.dequeue()
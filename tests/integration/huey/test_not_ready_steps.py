@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from broker.extensions import db
+from broker.models import Operation
+from broker.tasks.huey import huey, pipeline_operation, StepNotReady, StepTimedOut
+
+from tests.lib.factories import OperationFactory
+from tests.lib.tasks import fallible_huey
+
+checked = []
+
+
+@pipeline_operation("Waiting for cookies to bake")
+def wait_for_cookies(operation_id, *, operation, db, checks=0, **kwargs):
+    checked.append(checks)
+    if checks < 2:
+        raise StepNotReady("Cookies are still baking", delay=60)
+
+
+@pipeline_operation("Eating cookies")
+def eat_cookies(operation_id, *, operation, db, **kwargs):
+    checked.append("eaten")
+
+
+@pipeline_operation("Waiting forever")
+def wait_forever(operation_id, *, operation, db, **kwargs):
+    raise StepNotReady("Never ready", delay=0, max_checks=3)
+
+
+@pipeline_operation("Waiting for the oven")
+def wait_for_oven(operation_id, *, operation, db, checks=0, **kwargs):
+    checked.append(checks)
+    raise StepNotReady("The oven is still heating", delay=0, max_checks=2)
+
+
+@pytest.fixture
+def operation(clean_db):
+    checked.clear()
+    operation = OperationFactory.create(id=4321)
+    db.session.commit()
+    return operation
+
+
+def test_not_ready_step_reschedules_itself_without_running_the_rest(operation, tasks):
+    huey.enqueue(
+        wait_for_cookies.s(4321, correlation_id="cookies").then(eat_cookies, 4321)
+    )
+
+    task = huey.dequeue()
+    huey.execute(task, None)
+
+    assert checked == [0]
+    assert len(huey.pending()) == 0
+    rechecks = huey.scheduled()
+    assert len(rechecks) == 1
+    assert rechecks[0].eta is not None
+    assert rechecks[0].kwargs["step_checks"] == 1
+    assert rechecks[0].on_complete is not None
+
+    tasks.run_scheduled_rechecks()
+
+    assert checked == [0, 1, 2]
+    assert len(huey.scheduled()) == 0
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+
+    assert checked == [0, 1, 2, "eaten"]
+    operation = db.session.get(Operation, 4321)
+    assert operation.step_description == "Eating cookies"
+
+
+def test_not_ready_step_waits_inline_when_called_locally(operation, monkeypatch):
+    slept = []
+    monkeypatch.setattr("broker.tasks.huey.time.sleep", slept.append)
+
+    wait_for_cookies.call_local(4321)
+
+    assert checked == [0, 1, 2]
+    assert slept == [60, 60]
+
+
+def test_not_ready_step_gives_up_after_max_checks(operation):
+    with pytest.raises(StepTimedOut):
+        wait_forever.call_local(4321)
+
+
+def test_retry_after_timing_out_gets_its_own_checks(operation):
+    later = datetime.utcnow() + timedelta(days=1)
+    with fallible_huey():
+        huey.enqueue(wait_for_oven.s(4321, correlation_id="cookies"))
+        huey.execute(huey.dequeue(), None)
+
+        (recheck,) = huey.read_schedule(later)
+        huey.execute(recheck, later)
+
+        (retry,) = huey.read_schedule(later)
+        assert retry.retries == 6 * 4 - 1
+        assert retry.kwargs["step_checks"] == 0
+
+        huey.execute(retry, later)
+
+    assert checked == [0, 1, 0]
+    (recheck,) = huey.scheduled()
+    assert recheck.kwargs["step_checks"] == 1
@@ -0,0 +1,128 @@
+import pytest
+
+from broker.extensions import db
+from broker.models import Operation
+from broker.tasks.huey import huey, Parallel, Pipeline, pipeline_operation
+
+from tests.lib.factories import OperationFactory
+
+ran = []
+
+
+@pipeline_operation("Mixing dough")
+def mix_dough(operation_id, *, operation, db, **kwargs):
+    ran.append("mix")
+
+
+@pipeline_operation("Baking cookies")
+def bake_cookies(operation_id, *, operation, db, **kwargs):
+    ran.append("bake")
+
+
+@pipeline_operation("Eating cookies")
+def eat_cookies(operation_id, *, operation, db, **kwargs):
+    ran.append("eat")
+
+
+@pipeline_operation("Pouring milk")
+def pour_milk(operation_id, *, operation, db, **kwargs):
+    ran.append("pour")
+
+
+cookie_pipeline = Pipeline("test_cookies", [mix_dough, bake_cookies, eat_cookies])
+parallel_cookie_pipeline = Pipeline(
+    "test_parallel_cookies",
+    [mix_dough, Parallel([bake_cookies], pour_milk), eat_cookies],
+)
+
+
+@pytest.fixture
+def operation(clean_db):
+    ran.clear()
+    operation = OperationFactory.create(id=4321)
+    db.session.commit()
+    return operation
+
+
+def test_steps_record_the_last_completed_step(operation, tasks):
+    cookie_pipeline.queue(4321, "cookies")
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+
+    operation = db.session.get(Operation, 4321)
+    assert operation.pipeline_name == "test_cookies"
+    assert operation.pipeline_step == 0
+    assert operation.pipeline_step_name == "mix_dough"
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+
+    db.session.expire_all()
+    operation = db.session.get(Operation, 4321)
+    assert operation.pipeline_step == 1
+    assert ran == ["mix", "bake"]
+
+
+def test_pipeline_can_be_queued_from_a_later_step(operation, tasks):
+    cookie_pipeline.queue(4321, "cookies", start_at=1)
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    tasks.run_queued_tasks_and_enqueue_dependents()
+
+    assert ran == ["bake", "eat"]
+    db.session.expire_all()
+    operation = db.session.get(Operation, 4321)
+    assert operation.pipeline_step == 2
+
+
+def test_pipeline_names_are_unique():
+    with pytest.raises(RuntimeError):
+        Pipeline("test_cookies", [mix_dough])
+
+
+def test_parallel_branches_join_before_the_next_step(operation, tasks):
+    parallel_cookie_pipeline.queue(4321, "cookies")
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert ran == ["mix"]
+
+    # queues the branches
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert len(huey.pending()) == 2
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert sorted(ran) == ["bake", "mix", "pour"]
+
+    # the first branch to join doesn't queue anything
+    task = huey.dequeue()
+    huey.execute(task, None)
+    assert len(huey.pending()) == 1
+    db.session.expire_all()
+    operation = db.session.get(Operation, 4321)
+    assert operation.pipeline_step == 0
+    assert len(operation.pipeline_branches) == 1
+
+    # the last one records the step and queues the rest of the pipeline
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    db.session.expire_all()
+    operation = db.session.get(Operation, 4321)
+    assert operation.pipeline_step == 1
+    assert operation.pipeline_step_name == "Parallel([bake_cookies], [pour_milk])"
+    assert operation.pipeline_branches == [0, 1]
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert ran[-1] == "eat"
+
+
+def test_pipeline_starting_at_parallel_step_queues_branches(operation, tasks):
+    parallel_cookie_pipeline.queue(4321, "cookies", start_at=1)
+
+    assert len(huey.pending()) == 2
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert sorted(ran) == ["bake", "pour"]
+
+
+def test_step_names():
+    assert cookie_pipeline.step_name(1) == "bake_cookies"
+    assert (
+        parallel_cookie_pipeline.step_name(1) == "Parallel([bake_cookies], [pour_milk])"
+    )
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from broker.extensions import db
+from broker.models import Operation
+from broker.pipelines.cdn import (
+    queue_all_cdn_provision_tasks_for_operation,
+    queue_all_cdn_renewal_tasks_for_operation,
+)
+from broker.tasks.huey import (
+    drain_legacy_queue,
+    huey,
+    LEGACY_QUEUE_KEY,
+    LEGACY_SCHEDULE_KEY,
+    operation_priority,
+    RENEWAL_PRIORITY,
+    URGENT_RENEWAL_PRIORITY,
+    USER_PRIORITY,
+)
+from broker.tasks.letsencrypt import create_user, generate_private_key
+
+from tests.lib.factories import (
+    CDNServiceInstanceFactory,
+    CertificateFactory,
+    OperationFactory,
+)
+
+
+def create_operation(action, expires_in_days=None):
+    service_instance = CDNServiceInstanceFactory.create(
+        id="4321", domain_names=["example.com"]
+    )
+    if expires_in_days is not None:
+        certificate = CertificateFactory.create(
+            service_instance=service_instance,
+            expires_at=datetime.now(timezone.utc) + timedelta(days=expires_in_days),
+        )
+        service_instance.current_certificate = certificate
+    operation = OperationFactory.create(
+        service_instance=service_instance, action=action
+    )
+    db.session.commit()
+    return operation
+
+
+@pytest.mark.parametrize(
+    "action, expires_in_days, priority",
+    [
+        (Operation.Actions.PROVISION.value, None, USER_PRIORITY),
+        (Operation.Actions.UPDATE.value, 20, USER_PRIORITY),
+        (Operation.Actions.DEPROVISION.value, 20, USER_PRIORITY),
+        (Operation.Actions.RENEW.value, 2, URGENT_RENEWAL_PRIORITY),
+        (Operation.Actions.RENEW.value, 20, RENEWAL_PRIORITY),
+    ],
+)
+def test_operation_priority(clean_db, action, expires_in_days, priority):
+    operation = create_operation(action, expires_in_days)
+
+    assert operation_priority(operation) == priority
+
+
+def test_user_operations_are_dequeued_before_renewals(clean_db):
+    renewal = create_operation(Operation.Actions.RENEW.value, 20)
+    renewal_id = renewal.id
+    provision = OperationFactory.create(
+        service_instance=renewal.service_instance,
+        action=Operation.Actions.PROVISION.value,
+    )
+    db.session.commit()
+    provision_id = provision.id
+
+    queue_all_cdn_renewal_tasks_for_operation(renewal_id)
+    queue_all_cdn_provision_tasks_for_operation(provision_id, "user")
+
+    first = huey.dequeue()
+    second = huey.dequeue()
+    assert first.args == (provision_id,)
+    assert first.priority == USER_PRIORITY
+    assert first.on_complete.priority == USER_PRIORITY
+    assert second.args == (renewal_id,)
+    assert second.priority == RENEWAL_PRIORITY
+
+
+def test_drain_legacy_queue_moves_queued_and_scheduled_tasks(clean_db):
+    queued = huey.serialize_task(create_user.s(1))
+    scheduled = huey.serialize_task(generate_private_key.s(2))
+    eta = datetime.now(timezone.utc).timestamp() + 600
+    huey.storage.conn.lpush(LEGACY_QUEUE_KEY, queued)
+    huey.storage.conn.zadd(LEGACY_SCHEDULE_KEY, {scheduled: eta})
+
+    assert drain_legacy_queue() == 2
+    assert drain_legacy_queue() == 0
+
+    assert huey.storage.enqueued_items() == [queued]
+    assert huey.storage.conn.zrange(
+        huey.storage.schedule_key, 0, -1, withscores=True
+    ) == [(scheduled, eta)]
+    assert not huey.storage.conn.exists(LEGACY_QUEUE_KEY, LEGACY_SCHEDULE_KEY)
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import pytest
+from botocore.exceptions import ClientError
+
+from broker.extensions import db
+from broker.models import Operation
+from broker.tasks.huey import huey, pipeline_operation
+
+from tests.lib.factories import OperationFactory
+from tests.lib.tasks import fallible_huey
+
+
+def client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": "oops"}}, "SomeOperation")
+
+
+@pipeline_operation("Asking for cookies too fast")
+def get_throttled(operation_id, *, operation, db, **kwargs):
+    raise client_error("Throttling")
+
+
+@pipeline_operation("Asking for cookies we can't have")
+def get_denied(operation_id, *, operation, db, **kwargs):
+    raise client_error("AccessDenied")
+
+
+@pytest.fixture
+def operation(clean_db):
+    operation = OperationFactory.create(id=4321)
+    db.session.commit()
+    return operation
+
+
+def test_throttled_step_retries_quickly(operation):
+    with fallible_huey():
+        huey.enqueue(get_throttled.s(4321, correlation_id="cookies"))
+        huey.execute(huey.dequeue(), None)
+
+    retries = huey.scheduled()
+    assert len(retries) == 1
+    assert retries[0].retries == 6 * 4 - 1
+    assert retries[0].eta < datetime.utcnow() + timedelta(minutes=1)
+
+
+def test_denied_step_fails_without_retrying(operation):
+    with fallible_huey():
+        huey.enqueue(get_denied.s(4321, correlation_id="cookies"))
+        huey.execute(huey.dequeue(), None)
+
+    assert len(huey.scheduled()) == 0
+    db.session.expunge_all()
+    operation = db.session.get(Operation, 4321)
+    assert operation.state == Operation.States.FAILED.value
@@ -21,7 +21,6 @@ from tests.lib.cdn.update import (
 from tests.integration.cdn.test_cdn_renewals import (
     subtest_renew_retrieves_certificate,
     subtest_renewal_removes_certificate_from_iam,
-    subtest_updates_certificate_in_cloudfront,
 )
 
 
@@ -148,55 +147,44 @@ def test_migration_pipeline(
     subtest_provision_uploads_certificate_to_iam(
         tasks, iam_commercial, simple_regex, instance_model
     )
-    subtest_updates_certificate_in_cloudfront(tasks, cloudfront)
+    subtest_updates_cloudfront_once(tasks, cloudfront)
     subtest_renewal_removes_certificate_from_iam(tasks, iam_commercial)
     subtest_provision_marks_operation_as_succeeded(tasks, instance_model)
 
 
 def subtest_removes_s3_bucket(tasks, cloudfront, db):
-    db.session.expunge_all()
-    service_instance = db.session.get(CDNServiceInstance, "4321")
-    cloudfront.expect_get_distribution_config(
-        caller_reference="4321",
-        domains=["example.com", "foo.com"],
-        certificate_id=service_instance.current_certificate.iam_server_certificate_id,
-        origin_hostname="origin_hostname",
-        origin_path="origin_path",
-        distribution_id="FakeDistributionId",
-        include_le_bucket=True,
-    )
-    cloudfront.expect_update_distribution(
-        caller_reference="4321",
-        domains=["example.com", "foo.com"],
-        certificate_id=service_instance.current_certificate.iam_server_certificate_id,
-        origin_hostname="origin_hostname",
-        origin_path="origin_path",
-        distribution_id="FakeDistributionId",
-        distribution_hostname="example.cloudfront.net",
-    )
+    # the edit is saved for the certificate update
     tasks.run_queued_tasks_and_enqueue_dependents()
+    cloudfront.assert_no_pending_responses()
 
 
 def subtest_adds_logging(tasks, cloudfront, db):
-    db.session.expunge_all()
-    service_instance = db.session.get(CDNServiceInstance, "4321")
+    # the edit is saved for the certificate update
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    cloudfront.assert_no_pending_responses()
+
+
+def subtest_updates_cloudfront_once(tasks, cloudfront):
     cloudfront.expect_get_distribution_config(
         caller_reference="4321",
         domains=["example.com", "foo.com"],
-        certificate_id=service_instance.current_certificate.iam_server_certificate_id,
+        certificate_id="my-cert-id",
         origin_hostname="origin_hostname",
         origin_path="origin_path",
         distribution_id="FakeDistributionId",
+        include_le_bucket=True,
         include_log_bucket=False,
     )
     cloudfront.expect_update_distribution(
         caller_reference="4321",
         domains=["example.com", "foo.com"],
-        certificate_id=service_instance.current_certificate.iam_server_certificate_id,
+        certificate_id="FAKE_CERT_ID_XXXXXXXX",
         origin_hostname="origin_hostname",
         origin_path="origin_path",
         distribution_id="FakeDistributionId",
-        distribution_hostname="example.cloudfront.net",
+        distribution_hostname="fake1234.cloudfront.net",
         bucket_prefix="4321/",
     )
+
     tasks.run_queued_tasks_and_enqueue_dependents()
+    cloudfront.assert_no_pending_responses()
@@ -0,0 +1,76 @@
+import pytest
+
+from broker.extensions import config, db
+from broker.models import ACMEUser, CDNServiceInstance
+from broker.tasks.letsencrypt import create_user
+
+from tests.lib import factories
+
+
+@pytest.fixture
+def pool_size():
+    size = config.ACME_ACCOUNT_POOL_SIZE
+    config.ACME_ACCOUNT_POOL_SIZE = 2
+    yield 2
+    config.ACME_ACCOUNT_POOL_SIZE = size
+
+
+def pooled_user(**kwargs):
+    return factories.ACMEUserFactory.create(
+        pooled=True, acme_directory=config.ACME_DIRECTORY, **kwargs
+    )
+
+
+def provision(instance_id, operation_id):
+    service_instance = factories.CDNServiceInstanceFactory.create(id=instance_id)
+    factories.OperationFactory.create(
+        id=operation_id, service_instance=service_instance
+    )
+    create_user.call_local(operation_id)
+    db.session.expunge_all()
+    return db.session.get(CDNServiceInstance, instance_id).acme_user
+
+
+def test_create_user_registers_until_the_pool_is_full(clean_db, pool_size):
+    first = provision("1", 1)
+    second = provision("2", 2)
+
+    assert first.id != second.id
+    assert first.pooled and second.pooled
+    assert first.acme_directory == config.ACME_DIRECTORY
+    assert "localhost:14000" in second.uri
+
+
+def test_create_user_uses_the_least_used_pooled_account(clean_db, pool_size):
+    busy = pooled_user()
+    quiet = pooled_user()
+    factories.CDNServiceInstanceFactory.create(id="busy", acme_user=busy)
+    factories.CDNServiceInstanceFactory.create(
+        id="gone", acme_user=quiet, deactivated_at=db.func.now()
+    )
+    db.session.commit()
+
+    assert provision("1", 1).id == quiet.id
+    # one instance each now, so ties go to the oldest account
+    assert provision("2", 2).id == busy.id
+    assert db.session.query(ACMEUser).count() == 2
+
+
+def test_create_user_ignores_accounts_for_other_directories(clean_db, pool_size):
+    pooled_user(acme_directory="https://acme.example.com/directory")
+    pooled_user(acme_directory="https://acme.example.com/directory")
+
+    acme_user = provision("1", 1)
+
+    assert acme_user.acme_directory == config.ACME_DIRECTORY
+    assert db.session.query(ACMEUser).count() == 3
+
+
+def test_create_user_without_a_pool_registers_every_time(clean_db, pool_size):
+    config.ACME_ACCOUNT_POOL_SIZE = 0
+    pooled_user()
+
+    acme_user = provision("1", 1)
+
+    assert not acme_user.pooled
+    assert db.session.query(ACMEUser).count() == 2
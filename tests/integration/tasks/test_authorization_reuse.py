@@ -0,0 +1,94 @@
+import pytest
+from acme import messages
+
+from broker.acme_client import AcmeClient
+from broker.extensions import db
+from broker.models import CDNServiceInstance
+from broker.tasks.letsencrypt import (
+    answer_challenges,
+    create_user,
+    generate_private_key,
+    initiate_challenges,
+)
+
+from tests.lib import factories
+
+
+@pytest.fixture
+def service_instance():
+    service_instance = factories.CDNServiceInstanceFactory.create(
+        id="1234",
+        domain_names=["example.com", "foo.com"],
+    )
+    db.session.refresh(service_instance)
+    return service_instance
+
+
+@pytest.fixture
+def provision_operation(service_instance):
+    return factories.OperationFactory.create(id=4321, service_instance=service_instance)
+
+
+@pytest.fixture
+def example_com_already_valid(monkeypatch):
+    # pebble runs with authorization reuse off, so stand in for a CA that
+    # still has a valid authorization for example.com
+    new_order = AcmeClient.new_order
+
+    def new_order_with_valid_authorization(self, csr_pem):
+        order = new_order(self, csr_pem)
+        return order.update(
+            authorizations=[
+                (
+                    authorization.update(
+                        body=authorization.body.update(status=messages.STATUS_VALID)
+                    )
+                    if authorization.body.identifier.value == "example.com"
+                    else authorization
+                )
+                for authorization in order.authorizations
+            ]
+        )
+
+    monkeypatch.setattr(AcmeClient, "new_order", new_order_with_valid_authorization)
+
+
+def test_initiate_challenges_skips_domains_with_valid_authorizations(
+    clean_db, service_instance, provision_operation, example_com_already_valid
+):
+    create_user.call_local(4321)
+    generate_private_key.call_local(4321)
+
+    initiate_challenges.call_local(4321)
+
+    db.session.expunge_all()
+    instance = db.session.get(CDNServiceInstance, "1234")
+    answered = {
+        challenge.domain: challenge.answered
+        for challenge in instance.new_certificate.challenges.all()
+    }
+    assert answered == {"example.com": True, "foo.com": False}
+
+
+def test_answer_challenges_does_nothing_when_every_authorization_is_valid(
+    clean_db, service_instance, provision_operation, example_com_already_valid
+):
+    service_instance.domain_names = ["example.com"]
+    db.session.add(service_instance)
+    db.session.commit()
+    create_user.call_local(4321)
+    generate_private_key.call_local(4321)
+    initiate_challenges.call_local(4321)
+    db.session.expunge_all()
+    instance = db.session.get(CDNServiceInstance, "1234")
+    [challenge] = instance.new_certificate.challenges.all()
+    answered_at = challenge.updated_at
+    db.session.expunge_all()
+
+    # no TXT record exists, so this would fail if it answered the challenge
+    answer_challenges.call_local(4321)
+
+    instance = db.session.get(CDNServiceInstance, "1234")
+    [challenge] = instance.new_certificate.challenges.all()
+    assert challenge.answered
+    assert challenge.updated_at == answered_at
@@ -3,9 +3,10 @@ import pytest
 from broker.tasks.cloudfront import (
     wait_for_distribution_disabled,
     create_distribution,
+    create_distribution_early,
     update_distribution,
 )
-from broker.models import Operation, ServiceInstanceTypes
+from broker.models import CDNServiceInstance, Operation, ServiceInstanceTypes
 from broker.extensions import config
 
 from tests.lib import factories
@@ -214,6 +215,82 @@ def test_cloudfront_create_distribution(
     assert operation.step_description == "Creating CloudFront distribution"
 
 
+@pytest.mark.parametrize(
+    "instance_factory",
+    [
+        factories.CDNServiceInstanceFactory,
+        factories.CDNDedicatedWAFServiceInstanceFactory,
+    ],
+)
+def test_cloudfront_create_distribution_early(
+    clean_db,
+    service_instance,
+    operation_id,
+    cloudfront,
+):
+    cloudfront.expect_get_distribution_returning_no_such_distribution(
+        distribution_id=service_instance.cloudfront_distribution_id,
+    )
+    cloudfront.expect_create_distribution_with_tags(
+        caller_reference=service_instance.id,
+        domains=service_instance.domain_names,
+        certificate_id=None,
+        origin_hostname=service_instance.cloudfront_origin_hostname,
+        origin_path=service_instance.cloudfront_origin_path,
+        distribution_id=service_instance.cloudfront_distribution_id,
+        distribution_hostname=service_instance.cloudfront_origin_hostname,
+        bucket_prefix=f"{service_instance.id}/",
+        dedicated_waf_web_acl_arn=getattr(
+            service_instance, "dedicated_waf_web_acl_arn", ""
+        ),
+    )
+
+    create_distribution_early.call_local(operation_id)
+
+    cloudfront.assert_no_pending_responses()
+    clean_db.session.expunge_all()
+
+    # the certificate is added once it's issued
+    service_instance = clean_db.session.get(CDNServiceInstance, service_instance.id)
+    assert service_instance.new_certificate.id == 1002
+    assert service_instance.cloudfront_distribution_config["DistributionConfig"][
+        "ViewerCertificate"
+    ] == {"CloudFrontDefaultCertificate": True}
+
+    cloudfront.expect_get_distribution_config(
+        caller_reference=service_instance.id,
+        domains=service_instance.domain_names,
+        certificate_id=None,
+        origin_hostname=service_instance.cloudfront_origin_hostname,
+        origin_path=service_instance.cloudfront_origin_path,
+        distribution_id=service_instance.cloudfront_distribution_id,
+        bucket_prefix=f"{service_instance.id}/",
+    )
+    cloudfront.expect_update_distribution(
+        caller_reference=service_instance.id,
+        domains=service_instance.domain_names,
+        certificate_id=service_instance.new_certificate.iam_server_certificate_id,
+        origin_hostname=service_instance.cloudfront_origin_hostname,
+        origin_path=service_instance.cloudfront_origin_path,
+        distribution_id=service_instance.cloudfront_distribution_id,
+        distribution_hostname=service_instance.cloudfront_origin_hostname,
+        bucket_prefix=f"{service_instance.id}/",
+        dedicated_waf_web_acl_arn=getattr(
+            service_instance, "dedicated_waf_web_acl_arn", None
+        ),
+    )
+
+    update_distribution.call_local(operation_id)
+
+    # the tags were set when it was created
+    cloudfront.assert_no_pending_responses()
+    clean_db.session.expunge_all()
+
+    service_instance = clean_db.session.get(CDNServiceInstance, service_instance.id)
+    assert service_instance.new_certificate is None
+    assert service_instance.current_certificate.id == 1002
+
+
 @pytest.mark.parametrize(
     "instance_factory",
     [
@@ -560,3 +637,249 @@ def test_cloudfront_update_distribution_already_has_tags(
 
     operation = clean_db.session.get(Operation, operation_id)
     assert operation.step_description == "Updating CloudFront distribution"
+
+
+def update_distribution_again(clean_db, service_instance_id, operation_id, tags=None):
+    service_instance = clean_db.session.get(CDNServiceInstance, service_instance_id)
+    # what the API does for updates that don't need a new certificate
+    service_instance.new_certificate = service_instance.current_certificate
+    if tags is not None:
+        service_instance.tags = tags
+    clean_db.session.add(service_instance)
+    clean_db.session.commit()
+    clean_db.session.expunge_all()
+
+    update_distribution.call_local(operation_id)
+
+    clean_db.session.expunge_all()
+    return clean_db.session.get(CDNServiceInstance, service_instance_id)
+
+
+@pytest.mark.parametrize(
+    "instance_factory",
+    [
+        factories.CDNServiceInstanceFactory,
+    ],
+)
+def test_cloudfront_update_distribution_skips_unchanged_distribution(
+    clean_db,
+    service_instance,
+    operation_id,
+    cloudfront,
+):
+    cloudfront.expect_get_distribution_config(
+        caller_reference="asdf",
+        domains=service_instance.domain_names,
+        certificate_id=service_instance.new_certificate.iam_server_certificate_id,
+        origin_hostname=service_instance.cloudfront_origin_hostname,
+        origin_path=service_instance.cloudfront_origin_path,
+        distribution_id=service_instance.cloudfront_distribution_id,
+    )
+    cloudfront.expect_update_distribution(
+        caller_reference="asdf",
+        domains=service_instance.domain_names,
+        certificate_id=service_instance.new_certificate.iam_server_certificate_id,
+        origin_hostname=service_instance.cloudfront_origin_hostname,
+        origin_path=service_instance.cloudfront_origin_path,
+        distribution_id=service_instance.cloudfront_distribution_id,
+        distribution_hostname=service_instance.cloudfront_origin_hostname,
+    )
+    cloudfront.expect_tag_resource(service_instance)
+
+    update_distribution.call_local(operation_id)
+    cloudfront.assert_no_pending_responses()
+    clean_db.session.expunge_all()
+
+    service_instance = update_distribution_again(
+        clean_db, service_instance.id, operation_id
+    )
+
+    # nothing changed, so CloudFront wasn't called
+    cloudfront.assert_no_pending_responses()
+    assert service_instance.new_certificate is None
+    assert service_instance.current_certificate.id == 1002
+    assert (
+        service_instance.cloudfront_distribution_config["DistributionConfig"][
+            "ViewerCertificate"
+        ]["IAMCertificateId"]
+        == "certificate_id"
+    )
+
+    tags = [{"Key": "team", "Value": "edge"}]
+    cloudfront.expect_tag_resource(service_instance, tags)
+
+    service_instance = update_distribution_again(
+        clean_db, service_instance.id, operation_id, tags=tags
+    )
+
+    # only the tags changed, so the distribution wasn't updated
+    cloudfront.assert_no_pending_responses()
+    assert service_instance.cloudfront_distribution_config["Tags"] == tags
+
+
+@pytest.mark.parametrize(
+    "instance_factory",
+    [
+        factories.CDNServiceInstanceFactory,
+        factories.CDNDedicatedWAFServiceInstanceFactory,
+    ],
+)
+def test_cloudfront_create_distribution_with_origin_shield(
+    clean_db,
+    service_instance,
+    operation_id,
+    cloudfront,
+):
+    service_instance.origin_shield_region = "us-east-1"
+    clean_db.session.add(service_instance)
+    clean_db.session.commit()
+
+    cloudfront.expect_get_distribution_returning_no_such_distribution(
+        distribution_id=service_instance.cloudfront_distribution_id,
+    )
+    cloudfront.expect_create_distribution_with_tags(
+        caller_reference=service_instance.id,
+        domains=service_instance.domain_names,
+        certificate_id=service_instance.new_certificate.iam_server_certificate_id,
+        origin_hostname=service_instance.cloudfront_origin_hostname,
+        origin_path=service_instance.cloudfront_origin_path,
+        distribution_id=service_instance.cloudfront_distribution_id,
+        distribution_hostname=service_instance.cloudfront_origin_hostname,
+        bucket_prefix=f"{service_instance.id}/",
+        dedicated_waf_web_acl_arn=getattr(
+            service_instance, "dedicated_waf_web_acl_arn", ""
+        ),
+        origin_shield_region="us-east-1",
+    )
+
+    create_distribution.call_local(operation_id)
+
+    # asserts that all the mocked calls above were made
+    cloudfront.assert_no_pending_responses()
+
+
+@pytest.mark.parametrize(
+    "instance_factory",
+    [
+        factories.CDNServiceInstanceFactory,
+    ],
+)
+def test_cloudfront_update_distribution_turns_off_origin_shield(
+    clean_db,
+    service_instance,
+    operation_id,
+    cloudfront,
+):
+    cloudfront.expect_get_distribution_config(
+        caller_reference="asdf",
+        domains=service_instance.domain_names,
+        certificate_id=service_instance.new_certificate.iam_server_certificate_id,
+        origin_hostname=service_instance.cloudfront_origin_hostname,
+        origin_path=service_instance.cloudfront_origin_path,
+        distribution_id=service_instance.cloudfront_distribution_id,
+        origin_shield_region="us-east-1",
+    )
+    cloudfront.expect_update_distribution(
+        caller_reference="asdf",
+        domains=service_instance.domain_names,
+        certificate_id=service_instance.new_certificate.iam_server_certificate_id,
+        origin_hostname=service_instance.cloudfront_origin_hostname,
+        origin_path=service_instance.cloudfront_origin_path,
+        distribution_id=service_instance.cloudfront_distribution_id,
+        distribution_hostname=service_instance.cloudfront_origin_hostname,
+    )
+    cloudfront.expect_tag_resource(service_instance)
+
+    update_distribution.call_local(operation_id)
+
+    # asserts that all the mocked calls above were made
+    cloudfront.assert_no_pending_responses()
+
+
+@pytest.mark.parametrize(
+    "instance_factory",
+    [
+        factories.CDNServiceInstanceFactory,
+        factories.CDNDedicatedWAFServiceInstanceFactory,
+    ],
+)
+def test_cloudfront_create_distribution_with_http_version_and_compress(
+    clean_db,
+    service_instance,
+    operation_id,
+    cloudfront,
+):
+    service_instance.http_version = "http2and3"
+    service_instance.compress = True
+    clean_db.session.add(service_instance)
+    clean_db.session.commit()
+
+    cloudfront.expect_get_distribution_returning_no_such_distribution(
+        distribution_id=service_instance.cloudfront_distribution_id,
+    )
+    cloudfront.expect_create_distribution_with_tags(
+        caller_reference=service_instance.id,
+        domains=service_instance.domain_names,
+        certificate_id=service_instance.new_certificate.iam_server_certificate_id,
+        origin_hostname=service_instance.cloudfront_origin_hostname,
+        origin_path=service_instance.cloudfront_origin_path,
+        distribution_id=service_instance.cloudfront_distribution_id,
+        distribution_hostname=service_instance.cloudfront_origin_hostname,
+        bucket_prefix=f"{service_instance.id}/",
+        dedicated_waf_web_acl_arn=getattr(
+            service_instance, "dedicated_waf_web_acl_arn", ""
+        ),
+        http_version="http2and3",
+        compress=True,
+    )
+
+    create_distribution.call_local(operation_id)
+
+    # asserts that all the mocked calls above were made
+    cloudfront.assert_no_pending_responses()
+
+
+@pytest.mark.parametrize(
+    "instance_factory",
+    [
+        factories.CDNServiceInstanceFactory,
+    ],
+)
+def test_cloudfront_update_distribution_sets_http_version_and_compress(
+    clean_db,
+    service_instance,
+    operation_id,
+    cloudfront,
+):
+    service_instance.http_version = "http2"
+    service_instance.compress = False
+    clean_db.session.add(service_instance)
+    clean_db.session.commit()
+
+    cloudfront.expect_get_distribution_config(
+        caller_reference="asdf",
+        domains=service_instance.domain_names,
+        certificate_id=service_instance.new_certificate.iam_server_certificate_id,
+        origin_hostname=service_instance.cloudfront_origin_hostname,
+        origin_path=service_instance.cloudfront_origin_path,
+        distribution_id=service_instance.cloudfront_distribution_id,
+        http_version="http2and3",
+        compress=True,
+    )
+    cloudfront.expect_update_distribution(
+        caller_reference="asdf",
+        domains=service_instance.domain_names,
+        certificate_id=service_instance.new_certificate.iam_server_certificate_id,
+        origin_hostname=service_instance.cloudfront_origin_hostname,
+        origin_path=service_instance.cloudfront_origin_path,
+        distribution_id=service_instance.cloudfront_distribution_id,
+        distribution_hostname=service_instance.cloudfront_origin_hostname,
+        http_version="http2",
+        compress=False,
+    )
+    cloudfront.expect_tag_resource(service_instance)
+
+    update_distribution.call_local(operation_id)
+
+    # asserts that all the mocked calls above were made
+    cloudfront.assert_no_pending_responses()
@@ -0,0 +1,175 @@
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from broker import dns as broker_dns
+from broker.extensions import config, db
+from broker.models import CDNServiceInstance, Challenge
+from broker.tasks.huey import huey
+from broker.tasks.letsencrypt import (
+    answer_challenges,
+    create_user,
+    generate_private_key,
+    initiate_challenges,
+)
+
+from tests.lib import factories
+
+
+@pytest.fixture(autouse=True)
+def no_authoritative_nameservers(monkeypatch):
+    # the test DNS server stands in for the public resolvers, and doesn't
+    # answer NS queries
+    monkeypatch.setattr(broker_dns, "authoritative_nameservers", lambda: [])
+
+
+def challenge(domain, contents):
+    return Challenge(
+        domain=domain,
+        validation_domain=f"_acme-challenge.{domain}",
+        validation_contents=contents,
+    )
+
+
+def test_servers_missing_challenges_when_propagated(dns):
+    dns.add_cname("_acme-challenge.example.com")
+    dns.add_txt("_acme-challenge.example.com.domains.cloud.test.", "example txt")
+
+    assert (
+        broker_dns.servers_missing_challenges([challenge("example.com", "example txt")])
+        == []
+    )
+
+
+def test_servers_missing_challenges_when_one_is_missing(dns):
+    dns.add_cname("_acme-challenge.example.com")
+    dns.add_cname("_acme-challenge.foo.com")
+    dns.add_txt("_acme-challenge.example.com.domains.cloud.test.", "example txt")
+
+    assert broker_dns.servers_missing_challenges(
+        [challenge("example.com", "example txt"), challenge("foo.com", "foo txt")]
+    ) == ["127.0.0.1"]
+
+
+def test_servers_missing_challenges_when_contents_are_stale(dns):
+    dns.add_cname("_acme-challenge.example.com")
+    dns.add_txt("_acme-challenge.example.com.domains.cloud.test.", "old txt")
+
+    assert broker_dns.servers_missing_challenges(
+        [challenge("example.com", "new txt")]
+    ) == ["127.0.0.1"]
+
+
+@pytest.fixture
+def initiated_challenges(clean_db, monkeypatch):
+    service_instance = factories.CDNServiceInstanceFactory.create(
+        id="1234", domain_names=["example.com"]
+    )
+    factories.OperationFactory.create(id=4321, service_instance=service_instance)
+    db.session.commit()
+    create_user.call_local(4321)
+    generate_private_key.call_local(4321)
+    initiate_challenges.call_local(4321)
+
+    monkeypatch.setattr(config, "DNS_PROPAGATION_CHECK_ENABLED", True)
+    monkeypatch.setattr(config, "DNS_PROPAGATION_SLEEP_TIME", 300)
+
+
+def new_certificate():
+    db.session.expunge_all()
+    return db.session.get(CDNServiceInstance, "1234").new_certificate
+
+
+def test_answer_challenges_waits_for_missing_txt_records(
+    dns, tasks, initiated_challenges
+):
+    dns.add_cname("_acme-challenge.example.com")
+
+    huey.enqueue(answer_challenges.s(4321, correlation_id="propagation"))
+    huey.execute(huey.dequeue(), None)
+
+    certificate = new_certificate()
+    assert certificate.dns_propagation_started_at is not None
+    assert not any(challenge.answered for challenge in certificate.challenges)
+    (recheck,) = huey.scheduled()
+    assert recheck.eta is not None
+
+    [challenge] = certificate.challenges.all()
+    dns.add_txt(
+        "_acme-challenge.example.com.domains.cloud.test.",
+        challenge.validation_contents,
+    )
+    tasks.run_scheduled_rechecks()
+
+    assert all(challenge.answered for challenge in new_certificate().challenges)
+
+
+def test_answer_challenges_stops_waiting_after_sleep_time(dns, initiated_challenges):
+    dns.add_cname("_acme-challenge.example.com")
+    dns.add_txt("_acme-challenge.example.com.domains.cloud.test.", "stale txt")
+    certificate = new_certificate()
+    certificate.dns_propagation_started_at = datetime.now(timezone.utc) - timedelta(
+        seconds=config.DNS_PROPAGATION_SLEEP_TIME
+    )
+    db.session.add(certificate)
+    db.session.commit()
+
+    huey.enqueue(answer_challenges.s(4321, correlation_id="propagation"))
+    huey.execute(huey.dequeue(), None)
+
+    assert len(huey.scheduled()) == 0
+    assert all(challenge.answered for challenge in new_certificate().challenges)
+
+
+def test_answer_challenges_waits_sleep_time_without_the_check(
+    dns, tasks, monkeypatch, initiated_challenges
+):
+    monkeypatch.setattr(config, "DNS_PROPAGATION_CHECK_ENABLED", False)
+    dns.add_cname("_acme-challenge.example.com")
+    [challenge] = new_certificate().challenges.all()
+    dns.add_txt(
+        "_acme-challenge.example.com.domains.cloud.test.",
+        challenge.validation_contents,
+    )
+
+    huey.enqueue(answer_challenges.s(4321, correlation_id="propagation"))
+    huey.execute(huey.dequeue(), None)
+
+    certificate = new_certificate()
+    assert not any(challenge.answered for challenge in certificate.challenges)
+    (recheck,) = huey.scheduled()
+    assert recheck.eta is not None
+
+    certificate.dns_propagation_started_at = datetime.now(timezone.utc) - timedelta(
+        seconds=config.DNS_PROPAGATION_SLEEP_TIME
+    )
+    db.session.add(certificate)
+    db.session.commit()
+    tasks.run_scheduled_rechecks()
+
+    assert all(challenge.answered for challenge in new_certificate().challenges)
+
+
+def test_servers_missing_challenges_does_not_wait_on_silent_servers(monkeypatch):
+    # these never answer, so every lookup on them runs until it times out
+    silent = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(2)]
+    for server in silent:
+        server.bind(("127.0.0.1", 0))
+    monkeypatch.setattr(
+        config,
+        "DNS_PROPAGATION_RESOLVERS",
+        [f"127.0.0.1:{server.getsockname()[1]}" for server in silent],
+    )
+    monkeypatch.setattr(config, "DNS_PROPAGATION_QUERY_TIMEOUT", 1)
+
+    started = time.monotonic()
+    missing = broker_dns.servers_missing_challenges(
+        [challenge(f"example{i}.com", "example txt") for i in range(3)]
+    )
+    for server in silent:
+        server.close()
+
+    assert missing == ["127.0.0.1", "127.0.0.1"]
+    assert time.monotonic() - started < 2
@@ -0,0 +1,65 @@
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+from broker.extensions import config, db
+from broker.models import CDNServiceInstance, PooledPrivateKey
+from broker.tasks.letsencrypt import generate_private_key
+
+from tests.lib import factories
+
+
+@pytest.fixture
+def default_key_type():
+    key_type = config.DEFAULT_CERTIFICATE_KEY_TYPE
+    yield
+    config.DEFAULT_CERTIFICATE_KEY_TYPE = key_type
+
+
+def provision(key_type=None):
+    service_instance = factories.CDNServiceInstanceFactory.create(
+        id="1234", domain_names=["example.com"], key_type=key_type
+    )
+    factories.OperationFactory.create(id=4321, service_instance=service_instance)
+    generate_private_key.call_local(4321)
+    db.session.expunge_all()
+    return db.session.get(CDNServiceInstance, "1234").new_certificate
+
+
+def private_key(certificate):
+    return serialization.load_pem_private_key(
+        certificate.private_key_pem.encode(), password=None
+    )
+
+
+def test_generate_private_key_for_ecdsa_instance(clean_db, default_key_type):
+    db.session.add(PooledPrivateKey(private_key_pem="an RSA key"))
+    db.session.commit()
+
+    certificate = provision(key_type="ECDSA")
+
+    assert certificate.key_type == "ECDSA"
+    key = private_key(certificate)
+    assert isinstance(key, ec.EllipticCurvePrivateKey)
+    assert key.curve.name == "secp256r1"
+    assert "CERTIFICATE REQUEST" in certificate.csr_pem
+    # pooled keys are RSA, so they're left for someone else
+    assert PooledPrivateKey.query.count() == 1
+
+
+def test_generate_private_key_follows_broker_default(clean_db, default_key_type):
+    config.DEFAULT_CERTIFICATE_KEY_TYPE = "ECDSA"
+
+    certificate = provision()
+
+    assert certificate.key_type == "ECDSA"
+    assert isinstance(private_key(certificate), ec.EllipticCurvePrivateKey)
+
+
+def test_instance_key_type_overrides_broker_default(clean_db, default_key_type):
+    config.DEFAULT_CERTIFICATE_KEY_TYPE = "ECDSA"
+
+    certificate = provision(key_type="RSA")
+
+    assert certificate.key_type == "RSA"
+    assert isinstance(private_key(certificate), rsa.RSAPrivateKey)
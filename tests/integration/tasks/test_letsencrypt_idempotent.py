@@ -1,5 +1,8 @@
+import json
+
 import pytest
 
+from broker.acme_client import AcmeClient
 from broker.extensions import db
 from broker.models import CDNServiceInstance, Challenge
 from broker.tasks.letsencrypt import (
@@ -173,3 +176,47 @@ def test_retrieve_certificate_idempotent(
     retrieve_certificate.call_local(4321)
     # no need to check stuff - acme raises if we try to get the same cert twice
     retrieve_certificate.call_local(4321)
+
+
+def test_answer_challenges_keeps_answers_when_another_fails(
+    clean_db, service_instance, provision_operation, dns, monkeypatch
+):
+    service_instance.domain_names = ["example.com", "foo.com"]
+    db.session.add(service_instance)
+    db.session.commit()
+    dns.add_cname("_acme-challenge.example.com")
+    dns.add_cname("_acme-challenge.foo.com")
+    create_user.call_local(4321)
+    generate_private_key.call_local(4321)
+    initiate_challenges.call_local(4321)
+
+    certificate = db.session.get(CDNServiceInstance, "1234").new_certificate
+    foo_challenge = certificate.challenges.filter(Challenge.domain == "foo.com").one()
+    foo_url = json.loads(foo_challenge.body_json)["url"]
+    failing = {foo_url}
+    answered = []
+    answer_challenge = AcmeClient.answer_challenge
+
+    def fail_for_foo(self, challenge_body, response):
+        if challenge_body.uri in failing:
+            raise RuntimeError("answering failed")
+        answered.append(challenge_body.uri)
+        return answer_challenge(self, challenge_body, response)
+
+    monkeypatch.setattr(AcmeClient, "answer_challenge", fail_for_foo)
+
+    with pytest.raises(RuntimeError, match="answering failed"):
+        answer_challenges.call_local(4321)
+
+    db.session.expunge_all()
+    certificate = db.session.get(CDNServiceInstance, "1234").new_certificate
+    assert {
+        challenge.domain: challenge.answered for challenge in certificate.challenges
+    } == {"example.com": True, "foo.com": False}
+
+    # the retry only answers the challenge that failed
+    failing.clear()
+    answered.clear()
+    answer_challenges.call_local(4321)
+
+    assert answered == [foo_url]
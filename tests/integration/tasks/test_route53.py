@@ -6,6 +6,7 @@ from broker.tasks.route53 import (
     delete_unused_health_checks,
     delete_health_checks,
     remove_old_DNS_records,
+    wait_for_changes,
 )
 from broker.models import (
     CDNServiceInstance,
@@ -385,6 +386,29 @@ def test_route53_deletes_old_DNS_records_does_nothing(
     assert operation.step_description == "Removing old DNS records"
 
 
+def old_DNS_record_changes(route53):
+    return (
+        [
+            route53.TXT_change(
+                "DELETE",
+                "_acme-challenge.example.com.domains.cloud.test",
+                "example txt",
+            )
+        ]
+        + route53.ALIAS_changes(
+            "DELETE", "example.com.domains.cloud.test", "fake1234.cloudfront.net"
+        )
+        + [
+            route53.TXT_change(
+                "DELETE", "_acme-challenge.foo.com.domains.cloud.test", "foo txt"
+            )
+        ]
+        + route53.ALIAS_changes(
+            "DELETE", "foo.com.domains.cloud.test", "fake1234.cloudfront.net"
+        )
+    )
+
+
 def test_route53_deletes_old_DNS_records(
     clean_db, route53, service_instance_with_challenges, operation_id
 ):
@@ -394,14 +418,9 @@ def test_route53_deletes_old_DNS_records(
     clean_db.session.add(service_instance_with_challenges)
     clean_db.session.commit()
 
-    route53.expect_remove_TXT(
-        "_acme-challenge.example.com.domains.cloud.test", "example txt"
+    route53.expect_changes_and_return_change_id(
+        old_DNS_record_changes(route53), "ignored"
     )
-    route53.expect_remove_ALIAS(
-        "example.com.domains.cloud.test", "fake1234.cloudfront.net"
-    )
-    route53.expect_remove_TXT("_acme-challenge.foo.com.domains.cloud.test", "foo txt")
-    route53.expect_remove_ALIAS("foo.com.domains.cloud.test", "fake1234.cloudfront.net")
 
     remove_old_DNS_records.call_local(operation_id)
 
@@ -417,19 +436,45 @@ def test_route53_deletes_old_DNS_records_ignores_errors(
     clean_db.session.add(service_instance_with_challenges)
     clean_db.session.commit()
 
-    # error should be ignored
-    route53.expect_remove_missing_TXT(
-        "_acme-challenge.example.com.domains.cloud.test", "example txt"
+    changes = old_DNS_record_changes(route53)
+    # the batch fails, then each change is tried on its own
+    route53.expect_changes_rejected(changes)
+    # errors should be ignored
+    example_txt, example_a, example_aaaa, foo_txt, foo_a, foo_aaaa = changes
+    route53.expect_changes_rejected([example_txt])
+    route53.expect_changes_and_return_change_id([example_a], "ignored")
+    route53.expect_changes_and_return_change_id([example_aaaa], "ignored")
+    route53.expect_changes_and_return_change_id([foo_txt], "ignored")
+    route53.expect_changes_rejected([foo_a])
+    route53.expect_changes_rejected([foo_aaaa])
+
+    remove_old_DNS_records.call_local(operation_id)
+
+    route53.assert_no_pending_responses()
+
+
+def test_route53_waits_for_all_changes_at_once(
+    clean_db, route53, service_instance, operation_id, service_instance_id
+):
+    service_instance.route53_change_ids = ["slow ID", "fast ID", "slow ID"]
+    clean_db.session.add(service_instance)
+    clean_db.session.commit()
+    # each change ID is checked once per check, even if it's listed twice
+    route53.stubber.add_response(
+        "get_change", route53._change_info("slow ID", "PENDING"), {"Id": "slow ID"}
     )
-    route53.expect_remove_ALIAS(
-        "example.com.domains.cloud.test", "fake1234.cloudfront.net"
+    route53.stubber.add_response(
+        "get_change", route53._change_info("fast ID", "INSYNC"), {"Id": "fast ID"}
     )
-    route53.expect_remove_TXT("_acme-challenge.foo.com.domains.cloud.test", "foo txt")
-    # error should be ignored
-    route53.expect_remove_missing_ALIAS(
-        "foo.com.domains.cloud.test", "fake1234.cloudfront.net"
+    route53.stubber.add_response(
+        "get_change", route53._change_info("slow ID", "INSYNC"), {"Id": "slow ID"}
     )
 
-    remove_old_DNS_records.call_local(operation_id)
+    wait_for_changes.call_local(operation_id)
 
     route53.assert_no_pending_responses()
+    clean_db.session.expunge_all()
+    service_instance = clean_db.session.get(
+        CDNDedicatedWAFServiceInstance, service_instance_id
+    )
+    assert service_instance.route53_change_ids == []
@@ -24,10 +24,9 @@ def subtest_deprovision_creates_deprovision_operation(
 
 def subtest_deprovision_removes_ALIAS_records(tasks, route53):
     route53.expect_remove_ALIAS(
-        "example.com.domains.cloud.test", "fake1234.cloud.test", "ALBHOSTEDZONEID"
-    )
-    route53.expect_remove_ALIAS(
-        "foo.com.domains.cloud.test", "fake1234.cloud.test", "ALBHOSTEDZONEID"
+        ["example.com.domains.cloud.test", "foo.com.domains.cloud.test"],
+        "fake1234.cloud.test",
+        "ALBHOSTEDZONEID",
     )
 
     # one for marking provisioning tasks canceled, which is tested elsewhere
@@ -5,11 +5,10 @@ from broker.extensions import db
 def subtest_update_provisions_ALIAS_records(tasks, route53, instance_model):
     db.session.expunge_all()
     service_instance = db.session.get(instance_model, "4321")
-    example_com_change_id = route53.expect_create_ALIAS_and_return_change_id(
-        "bar.com.domains.cloud.test", "alb.cloud.test", "ALBHOSTEDZONEID"
-    )
-    foo_com_change_id = route53.expect_create_ALIAS_and_return_change_id(
-        "foo.com.domains.cloud.test", "alb.cloud.test", "ALBHOSTEDZONEID"
+    route53.expect_create_ALIAS_and_return_change_id(
+        ["bar.com.domains.cloud.test", "foo.com.domains.cloud.test"],
+        "alb.cloud.test",
+        "ALBHOSTEDZONEID",
     )
     tasks.run_queued_tasks_and_enqueue_dependents()
 
@@ -77,11 +76,21 @@ def subtest_update_removes_old_DNS_records(
         None,
     )
 
-    route53.expect_remove_TXT(
-        "_acme-challenge.example.com.domains.cloud.test", challenge.validation_contents
-    )
-    route53.expect_remove_ALIAS(
-        "example.com.domains.cloud.test", "alb.cloud.test", "ALBHOSTEDZONEID"
+    route53.expect_changes_and_return_change_id(
+        [
+            route53.TXT_change(
+                "DELETE",
+                "_acme-challenge.example.com.domains.cloud.test",
+                challenge.validation_contents,
+            )
+        ]
+        + route53.ALIAS_changes(
+            "DELETE",
+            "example.com.domains.cloud.test",
+            "alb.cloud.test",
+            "ALBHOSTEDZONEID",
+        ),
+        "ignored",
     )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
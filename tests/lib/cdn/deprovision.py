@@ -22,12 +22,18 @@ def subtest_deprovision_creates_deprovision_operation(instance_model, client):
 
 
 def subtest_deprovision_removes_TXT_records_when_missing(tasks, route53):
-    route53.expect_remove_missing_TXT(
-        "example.com.domains.cloud.test", "fake1234.cloudfront.net"
-    )
-    route53.expect_remove_missing_TXT(
-        "foo.com.domains.cloud.test", "fake1234.cloudfront.net"
-    )
+    changes = [
+        route53.TXT_change(
+            "DELETE", "_acme-challenge.example.com.domains.cloud.test", "example txt"
+        ),
+        route53.TXT_change(
+            "DELETE", "_acme-challenge.foo.com.domains.cloud.test", "foo txt"
+        ),
+    ]
+    # the batch fails, then each record is tried on its own
+    route53.expect_changes_rejected(changes)
+    for change in changes:
+        route53.expect_changes_rejected([change])
 
     tasks.run_queued_tasks_and_enqueue_dependents()
 
@@ -35,12 +41,15 @@ def subtest_deprovision_removes_TXT_records_when_missing(tasks, route53):
 
 
 def subtest_deprovision_removes_ALIAS_records_when_missing(tasks, route53):
-    route53.expect_remove_missing_ALIAS(
-        "_acme-challenge.example.com.domains.cloud.test", "example txt"
-    )
-    route53.expect_remove_missing_ALIAS(
-        "_acme-challenge.foo.com.domains.cloud.test", "foo txt"
+    changes = route53.ALIAS_changes(
+        "DELETE", "example.com.domains.cloud.test", "fake1234.cloudfront.net"
+    ) + route53.ALIAS_changes(
+        "DELETE", "foo.com.domains.cloud.test", "fake1234.cloudfront.net"
     )
+    # the batch fails, then each record is tried on its own
+    route53.expect_changes_rejected(changes)
+    for change in changes:
+        route53.expect_changes_rejected([change])
 
     # one for marking provisioning tasks canceled, which is tested elsewhere
     tasks.run_queued_tasks_and_enqueue_dependents()
@@ -51,9 +60,9 @@ def subtest_deprovision_removes_ALIAS_records_when_missing(tasks, route53):
 
 def subtest_deprovision_removes_ALIAS_records(tasks, route53):
     route53.expect_remove_ALIAS(
-        "example.com.domains.cloud.test", "fake1234.cloudfront.net"
+        ["example.com.domains.cloud.test", "foo.com.domains.cloud.test"],
+        "fake1234.cloudfront.net",
     )
-    route53.expect_remove_ALIAS("foo.com.domains.cloud.test", "fake1234.cloudfront.net")
 
     # one for marking provisioning tasks canceled, which is tested elsewhere
     tasks.run_queued_tasks_and_enqueue_dependents()
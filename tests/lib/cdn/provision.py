@@ -211,11 +211,9 @@ def subtest_provision_uploads_certificate_to_iam(
 
 
 def subtest_provision_provisions_ALIAS_records(tasks, route53, instance_model):
-    example_com_change_id = route53.expect_create_ALIAS_and_return_change_id(
-        "example.com.domains.cloud.test", "fake1234.cloudfront.net"
-    )
-    foo_com_change_id = route53.expect_create_ALIAS_and_return_change_id(
-        "foo.com.domains.cloud.test", "fake1234.cloudfront.net"
+    change_id = route53.expect_create_ALIAS_and_return_change_id(
+        ["example.com.domains.cloud.test", "foo.com.domains.cloud.test"],
+        "fake1234.cloudfront.net",
     )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
@@ -223,10 +221,7 @@ def subtest_provision_provisions_ALIAS_records(tasks, route53, instance_model):
     route53.assert_no_pending_responses()
     db.session.expunge_all()
     service_instance = db.session.get(instance_model, "4321")
-    assert service_instance.route53_change_ids == [
-        example_com_change_id,
-        foo_com_change_id,
-    ]
+    assert service_instance.route53_change_ids == [change_id]
 
 
 def subtest_provision_creates_cloudfront_distribution(
@@ -274,6 +269,8 @@ def subtest_provision_creates_cloudfront_distribution(
         },
         dedicated_waf_web_acl_arn=dedicated_waf_web_acl_arn,
         tags=service_instance.tags,
+        http_version=service_instance.http_version,
+        compress=service_instance.compress,
     )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
@@ -159,9 +159,13 @@ def subtest_updates_cloudfront(
             ],
         },
         dedicated_waf_web_acl_arn=dedicated_waf_web_acl_arn,
+        http_version=service_instance.http_version,
+        compress=service_instance.compress,
     )
 
-    cloudfront.expect_tag_resource(service_instance, service_instance.tags)
+    cloudfront.expect_tag_resource(
+        service_instance, service_instance.tags, only_if_changed=True
+    )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
     db.session.expunge_all()
@@ -306,11 +310,18 @@ def subtest_update_removes_old_DNS_records(
         None,
     )
 
-    route53.expect_remove_TXT(
-        "_acme-challenge.example.com.domains.cloud.test", challenge.validation_contents
-    )
-    route53.expect_remove_ALIAS(
-        "example.com.domains.cloud.test", "fake1234.cloudfront.net"
+    route53.expect_changes_and_return_change_id(
+        [
+            route53.TXT_change(
+                "DELETE",
+                "_acme-challenge.example.com.domains.cloud.test",
+                challenge.validation_contents,
+            )
+        ]
+        + route53.ALIAS_changes(
+            "DELETE", "example.com.domains.cloud.test", "fake1234.cloudfront.net"
+        ),
+        "ignored",
     )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
@@ -401,9 +412,13 @@ def subtest_update_same_domains_updates_cloudfront(
         bucket_prefix="4321/",
         custom_error_responses=expect_custom_error_responses,
         dedicated_waf_web_acl_arn=dedicated_waf_web_acl_arn,
+        http_version=service_instance.http_version,
+        compress=service_instance.compress,
     )
 
-    cloudfront.expect_tag_resource(service_instance, service_instance.tags)
+    cloudfront.expect_tag_resource(
+        service_instance, service_instance.tags, only_if_changed=True
+    )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
     db.session.expunge_all()
@@ -430,18 +445,16 @@ def subtest_update_updates_ALIAS_records(
     expected_domains=["bar.com", "foo.com"],
     hosted_zone_id="fake1234.cloudfront.net",
 ):
-    change_ids = []
-    for domain in expected_domains:
-        change_id = route53.expect_create_ALIAS_and_return_change_id(
-            f"{domain}.{config.DNS_ROOT_DOMAIN}", hosted_zone_id
-        )
-        change_ids.append(change_id)
+    change_id = route53.expect_create_ALIAS_and_return_change_id(
+        [f"{domain}.{config.DNS_ROOT_DOMAIN}" for domain in expected_domains],
+        hosted_zone_id,
+    )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
     route53.assert_no_pending_responses()
     db.session.expunge_all()
     service_instance = db.session.get(instance_model, service_instance_id)
-    assert service_instance.route53_change_ids.sort() == change_ids.sort()
+    assert service_instance.route53_change_ids == [change_id]
 
 
 def subtest_update_uploads_new_cert(
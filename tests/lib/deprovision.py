@@ -23,10 +23,19 @@ def subtest_deprovision_removes_certificate_from_iam(
 
 
 def subtest_deprovision_removes_TXT_records(tasks, route53):
-    route53.expect_remove_TXT(
-        "_acme-challenge.example.com.domains.cloud.test", "example txt"
+    route53.expect_changes_and_return_change_id(
+        [
+            route53.TXT_change(
+                "DELETE",
+                "_acme-challenge.example.com.domains.cloud.test",
+                "example txt",
+            ),
+            route53.TXT_change(
+                "DELETE", "_acme-challenge.foo.com.domains.cloud.test", "foo txt"
+            ),
+        ],
+        "ignored",
     )
-    route53.expect_remove_TXT("_acme-challenge.foo.com.domains.cloud.test", "foo txt")
 
     tasks.run_queued_tasks_and_enqueue_dependents()
 
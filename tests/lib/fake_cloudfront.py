@@ -29,6 +29,9 @@ class FakeCloudFront(FakeAWS):
         tags: list[Tag] = [],
         cache_policy_id: str = None,
         origin_request_policy_id: str = None,
+        origin_shield_region: str = None,
+        http_version: str = None,
+        compress: bool = None,
     ):
         self.stubber.add_response(
             "create_distribution_with_tags",
@@ -64,6 +67,9 @@ class FakeCloudFront(FakeAWS):
                     tags=tags,
                     cache_policy_id=cache_policy_id,
                     origin_request_policy_id=origin_request_policy_id,
+                    origin_shield_region=origin_shield_region,
+                    http_version=http_version,
+                    compress=compress,
                 ),
             },
         )
@@ -85,6 +91,8 @@ class FakeCloudFront(FakeAWS):
         include_le_bucket: bool = False,
         include_log_bucket: bool = True,
         compress: bool = None,
+        origin_shield_region: str = None,
+        http_version: str = None,
     ):
         if custom_error_responses is None:
             custom_error_responses = {"Quantity": 0}
@@ -109,6 +117,8 @@ class FakeCloudFront(FakeAWS):
                     include_le_bucket=include_le_bucket,
                     include_log_bucket=include_log_bucket,
                     compress=compress,
+                    origin_shield_region=origin_shield_region,
+                    http_version=http_version,
                 ),
                 "ETag": self.etag,
             },
@@ -299,6 +309,8 @@ class FakeCloudFront(FakeAWS):
         cache_policy_id: str = None,
         origin_request_policy_id: str = None,
         compress: bool = None,
+        origin_shield_region: str = None,
+        http_version: str = None,
     ):
         self.stubber.add_response(
             "update_distribution",
@@ -334,18 +346,26 @@ class FakeCloudFront(FakeAWS):
                     cache_policy_id=cache_policy_id,
                     origin_request_policy_id=origin_request_policy_id,
                     compress=compress,
+                    origin_shield_region=origin_shield_region,
+                    http_version=http_version,
                 ),
                 "Id": distribution_id,
                 "IfMatch": self.etag,
             },
         )
 
-    def expect_tag_resource(self, service_instance, tags: list[Tag] = []):
+    def expect_tag_resource(
+        self, service_instance, tags: list[Tag] = [], only_if_changed: bool = False
+    ):
         tags = tags if tags else []
         if is_cdn_with_dedicated_waf_instance(
             service_instance
         ) and not service_instance.has_dedicated_web_acl_tag(tags):
             tags = add_tag(tags, {"Key": "has_dedicated_acl", "Value": "true"})
+        last_applied = service_instance.cloudfront_distribution_config
+        if only_if_changed and last_applied and last_applied["Tags"] == tags:
+            # the broker skips tagging when the tags haven't changed
+            return
         self.stubber.add_response(
             "tag_resource",
             {},
@@ -453,6 +473,8 @@ class FakeCloudFront(FakeAWS):
         origin_request_policy_id: str = None,
         dedicated_waf_web_acl_arn: str = None,
         compress: bool = None,
+        origin_shield_region: str = None,
+        http_version: str = None,
     ) -> Dict[str, Any]:
         if forwarded_headers is None:
             forwarded_headers = ["HOST"]
@@ -488,8 +510,8 @@ class FakeCloudFront(FakeAWS):
             "MaxTTL": 31536000,
         }
 
-        if compress:
-            default_cache_behavior.update({"Compress": True})
+        if compress is not None:
+            default_cache_behavior.update({"Compress": compress})
 
         if cache_policy_id is None:
             default_cache_behavior.update(
@@ -611,6 +633,19 @@ class FakeCloudFront(FakeAWS):
             }
         if dedicated_waf_web_acl_arn:
             distribution_config["WebACLId"] = dedicated_waf_web_acl_arn
+        if http_version:
+            distribution_config["HttpVersion"] = http_version
+        if origin_shield_region:
+            distribution_config["Origins"]["Items"][0]["OriginShield"] = {
+                "Enabled": True,
+                "OriginShieldRegion": origin_shield_region,
+            }
+        if iam_server_certificate_id is None:
+            # created before the certificate was issued
+            distribution_config["Aliases"] = {"Quantity": 0}
+            distribution_config["ViewerCertificate"] = {
+                "CloudFrontDefaultCertificate": True
+            }
         return distribution_config
 
     def _distribution_config_with_tags(
@@ -633,6 +668,9 @@ class FakeCloudFront(FakeAWS):
         tags: list[Tag] = [],
         origin_request_policy_id: str = None,
         cache_policy_id: str = None,
+        origin_shield_region: str = None,
+        http_version: str = None,
+        compress: bool = None,
     ) -> Dict[str, Any]:
         distribution_config = self._distribution_config(
             caller_reference,
@@ -652,6 +690,9 @@ class FakeCloudFront(FakeAWS):
             cache_policy_id=cache_policy_id,
             origin_request_policy_id=origin_request_policy_id,
             dedicated_waf_web_acl_arn=dedicated_waf_web_acl_arn,
+            origin_shield_region=origin_shield_region,
+            http_version=http_version,
+            compress=compress,
         )
         if dedicated_waf_web_acl_arn:
             tags = add_tag(tags, {"Key": "has_dedicated_acl", "Value": "true"})
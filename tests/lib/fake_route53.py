@@ -7,196 +7,81 @@ from tests.lib.fake_aws import FakeAWS
 
 
 class FakeRoute53(FakeAWS):
-    def expect_create_TXT_and_return_change_id(self, domain) -> str:
-        change_id = f"{domain} ID"
+    def TXT_change(self, action, domain, challenge_text=None) -> dict:
+        if challenge_text is None:
+            value = self.ANY
+        else:
+            value = f'"{challenge_text}"'
+        return {
+            "Action": action,
+            "ResourceRecordSet": {
+                "Name": domain,
+                "ResourceRecords": [{"Value": value}],
+                "TTL": 60,
+                "Type": "TXT",
+            },
+        }
+
+    def ALIAS_changes(
+        self, action, domain, target, target_hosted_zone_id="Z2FDTNDATAQYW2"
+    ) -> list:
+        return [
+            {
+                "Action": action,
+                "ResourceRecordSet": {
+                    "Name": domain,
+                    "Type": record_type,
+                    "AliasTarget": {
+                        "DNSName": target,
+                        "HostedZoneId": target_hosted_zone_id,
+                        "EvaluateTargetHealth": False,
+                    },
+                },
+            }
+            for record_type in ["A", "AAAA"]
+        ]
+
+    def expect_changes_and_return_change_id(self, changes, change_id) -> str:
         self.stubber.add_response(
             "change_resource_record_sets",
             self._change_info(change_id, "PENDING"),
-            {
-                "ChangeBatch": {
-                    "Changes": [
-                        {
-                            "Action": "UPSERT",
-                            "ResourceRecordSet": {
-                                "Name": domain,
-                                "ResourceRecords": [{"Value": self.ANY}],
-                                "TTL": 60,
-                                "Type": "TXT",
-                            },
-                        }
-                    ]
-                },
-                "HostedZoneId": "TestZoneID",
-            },
+            {"ChangeBatch": {"Changes": changes}, "HostedZoneId": "TestZoneID"},
         )
         return change_id
 
-    def expect_remove_missing_TXT(self, domain, challenge_text):
-        change_id = f"{domain} ID"
+    def expect_changes_rejected(self, changes):
         self.stubber.add_client_error(
             "change_resource_record_sets",
             "InvalidChangeBatch",
-            f"Tried to delete resource record set [name='{domain}', type='A'] but it was not found",
-            {
-                "ChangeBatch": {
-                    "Changes": [
-                        {
-                            "Action": "DELETE",
-                            "ResourceRecordSet": {
-                                "Name": domain,
-                                "ResourceRecords": [{"Value": f'"{challenge_text}"'}],
-                                "TTL": 60,
-                                "Type": "TXT",
-                            },
-                        }
-                    ]
-                },
-                "HostedZoneId": "TestZoneID",
-            },
+            "Tried to delete resource record set but it was not found",
+            {"ChangeBatch": {"Changes": changes}, "HostedZoneId": "TestZoneID"},
         )
 
-    def expect_remove_TXT(self, domain, challenge_text):
-        change_id = f"{domain} ID"
-        self.stubber.add_response(
-            "change_resource_record_sets",
-            self._change_info(change_id, "PENDING"),
-            {
-                "ChangeBatch": {
-                    "Changes": [
-                        {
-                            "Action": "DELETE",
-                            "ResourceRecordSet": {
-                                "Name": domain,
-                                "ResourceRecords": [{"Value": f'"{challenge_text}"'}],
-                                "TTL": 60,
-                                "Type": "TXT",
-                            },
-                        }
-                    ]
-                },
-                "HostedZoneId": "TestZoneID",
-            },
+    def expect_create_TXT_and_return_change_id(self, *domains) -> str:
+        return self.expect_changes_and_return_change_id(
+            [self.TXT_change("UPSERT", domain) for domain in domains],
+            f"{domains[0]} ID",
         )
 
     def expect_create_ALIAS_and_return_change_id(
-        self, domain, target, target_hosted_zone_id="Z2FDTNDATAQYW2"
+        self, domains, target, target_hosted_zone_id="Z2FDTNDATAQYW2"
     ) -> str:
-        change_id = f"{domain} ID"
-        self.stubber.add_response(
-            "change_resource_record_sets",
-            self._change_info(change_id, "PENDING"),
-            {
-                "ChangeBatch": {
-                    "Changes": [
-                        {
-                            "Action": "UPSERT",
-                            "ResourceRecordSet": {
-                                "Name": domain,
-                                "Type": "A",
-                                "AliasTarget": {
-                                    "DNSName": target,
-                                    "HostedZoneId": target_hosted_zone_id,
-                                    "EvaluateTargetHealth": False,
-                                },
-                            },
-                        },
-                        {
-                            "Action": "UPSERT",
-                            "ResourceRecordSet": {
-                                "Name": domain,
-                                "Type": "AAAA",
-                                "AliasTarget": {
-                                    "DNSName": target,
-                                    "HostedZoneId": target_hosted_zone_id,
-                                    "EvaluateTargetHealth": False,
-                                },
-                            },
-                        },
-                    ]
-                },
-                "HostedZoneId": "TestZoneID",
-            },
-        )
-        return change_id
+        changes = []
+        for domain in domains:
+            changes += self.ALIAS_changes(
+                "UPSERT", domain, target, target_hosted_zone_id
+            )
+        return self.expect_changes_and_return_change_id(changes, f"{domains[0]} ID")
 
     def expect_remove_ALIAS(
-        self, domain, target, target_hosted_zone_id="Z2FDTNDATAQYW2"
-    ):
-        self.stubber.add_response(
-            "change_resource_record_sets",
-            self._change_info("ignored", "PENDING"),
-            {
-                "ChangeBatch": {
-                    "Changes": [
-                        {
-                            "Action": "DELETE",
-                            "ResourceRecordSet": {
-                                "Name": domain,
-                                "Type": "A",
-                                "AliasTarget": {
-                                    "DNSName": target,
-                                    "HostedZoneId": target_hosted_zone_id,
-                                    "EvaluateTargetHealth": False,
-                                },
-                            },
-                        },
-                        {
-                            "Action": "DELETE",
-                            "ResourceRecordSet": {
-                                "Name": domain,
-                                "Type": "AAAA",
-                                "AliasTarget": {
-                                    "DNSName": target,
-                                    "HostedZoneId": target_hosted_zone_id,
-                                    "EvaluateTargetHealth": False,
-                                },
-                            },
-                        },
-                    ]
-                },
-                "HostedZoneId": "TestZoneID",
-            },
-        )
-
-    def expect_remove_missing_ALIAS(
-        self, domain, target, target_hosted_zone_id="Z2FDTNDATAQYW2"
+        self, domains, target, target_hosted_zone_id="Z2FDTNDATAQYW2"
     ):
-        self.stubber.add_client_error(
-            "change_resource_record_sets",
-            "InvalidChangeBatch",
-            f"Tried to delete resource record set [name='{domain}', type='A'] but it was not found",
-            {
-                "ChangeBatch": {
-                    "Changes": [
-                        {
-                            "Action": "DELETE",
-                            "ResourceRecordSet": {
-                                "Name": domain,
-                                "Type": "A",
-                                "AliasTarget": {
-                                    "DNSName": target,
-                                    "HostedZoneId": target_hosted_zone_id,
-                                    "EvaluateTargetHealth": False,
-                                },
-                            },
-                        },
-                        {
-                            "Action": "DELETE",
-                            "ResourceRecordSet": {
-                                "Name": domain,
-                                "Type": "AAAA",
-                                "AliasTarget": {
-                                    "DNSName": target,
-                                    "HostedZoneId": target_hosted_zone_id,
-                                    "EvaluateTargetHealth": False,
-                                },
-                            },
-                        },
-                    ]
-                },
-                "HostedZoneId": "TestZoneID",
-            },
-        )
+        changes = []
+        for domain in domains:
+            changes += self.ALIAS_changes(
+                "DELETE", domain, target, target_hosted_zone_id
+            )
+        self.expect_changes_and_return_change_id(changes, "ignored")
 
     def expect_wait_for_change_insync(self, change_id: str):
         self.stubber.add_response(
@@ -45,11 +45,9 @@ def subtest_provision_initiates_LE_challenge(tasks, instance_model):
 
 
 def subtest_provision_updates_TXT_records(tasks, route53, instance_model):
-    example_com_change_id = route53.expect_create_TXT_and_return_change_id(
-        "_acme-challenge.example.com.domains.cloud.test"
-    )
-    foo_com_change_id = route53.expect_create_TXT_and_return_change_id(
-        "_acme-challenge.foo.com.domains.cloud.test"
+    change_id = route53.expect_create_TXT_and_return_change_id(
+        "_acme-challenge.example.com.domains.cloud.test",
+        "_acme-challenge.foo.com.domains.cloud.test",
     )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
@@ -57,10 +55,7 @@ def subtest_provision_updates_TXT_records(tasks, route53, instance_model):
     route53.assert_no_pending_responses()
     db.session.expunge_all()
     service_instance = db.session.get(instance_model, "4321")
-    assert service_instance.route53_change_ids == [
-        example_com_change_id,
-        foo_com_change_id,
-    ]
+    assert service_instance.route53_change_ids == [change_id]
 
 
 def subtest_provision_waits_for_route53_changes(tasks, route53, instance_model):
@@ -1,4 +1,5 @@
 from contextlib import contextmanager
+from datetime import datetime, timedelta
 
 import pytest
 from huey import Huey
@@ -75,6 +76,46 @@ class Tasks:
             print(f"Executing Task {task.name}")
             huey.execute(task, None)
 
+        self.run_scheduled_rechecks()
+
+    def run_scheduled_rechecks(self):
+        """
+        Runs steps that raised StepNotReady and scheduled themselves to be
+        checked again, without waiting for their delay, until none are left.
+        """
+        later = datetime.utcnow() + timedelta(days=1)
+        while True:
+            rechecks = huey.read_schedule(later)
+            if not rechecks:
+                return
+            for task in rechecks:
+                print(f"Rechecking Task {task.name}")
+                huey.execute(task, later)
+
+    @contextmanager
+    def hold_back(self, *task_names):
+        """
+        Keeps queued tasks with these names (and the rest of their pipelines)
+        from running until the block exits. This is useful for stepping through
+        the branches of a Parallel pipeline step one at a time.
+        """
+        held = []
+        queued = []
+        task = huey.dequeue()
+        while task:
+            if task.name in task_names:
+                held.append(task)
+            else:
+                queued.append(task)
+            task = huey.dequeue()
+        for task in queued:
+            huey.enqueue(task)
+        try:
+            yield
+        finally:
+            for task in held:
+                huey.enqueue(task)
+
 
 @pytest.fixture(scope="function")
 def tasks():
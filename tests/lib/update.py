@@ -40,11 +40,9 @@ def subtest_gets_new_challenges(tasks, instance_model, service_instance_id="4321
 def subtest_update_creates_new_TXT_records(
     tasks, route53, instance_model, service_instance_id="4321"
 ):
-    bar_com_change_id = route53.expect_create_TXT_and_return_change_id(
-        "_acme-challenge.bar.com.domains.cloud.test"
-    )
-    foo_com_change_id = route53.expect_create_TXT_and_return_change_id(
-        "_acme-challenge.foo.com.domains.cloud.test"
+    change_id = route53.expect_create_TXT_and_return_change_id(
+        "_acme-challenge.bar.com.domains.cloud.test",
+        "_acme-challenge.foo.com.domains.cloud.test",
     )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
@@ -52,7 +50,7 @@ def subtest_update_creates_new_TXT_records(
     route53.assert_no_pending_responses()
     db.session.expunge_all()
     service_instance = db.session.get(instance_model, service_instance_id)
-    assert service_instance.route53_change_ids == [bar_com_change_id, foo_com_change_id]
+    assert service_instance.route53_change_ids == [change_id]
 
 
 def subtest_update_answers_challenges(
@@ -199,15 +197,13 @@ def subtest_update_same_domains_does_not_delete_server_certificate(
 
 
 def subtest_update_updates_ALIAS_records(tasks, route53, instance_model):
-    bar_com_change_id = route53.expect_create_ALIAS_and_return_change_id(
-        "bar.com.domains.cloud.test", "fake1234.cloudfront.net"
-    )
-    foo_com_change_id = route53.expect_create_ALIAS_and_return_change_id(
-        "foo.com.domains.cloud.test", "fake1234.cloudfront.net"
+    change_id = route53.expect_create_ALIAS_and_return_change_id(
+        ["bar.com.domains.cloud.test", "foo.com.domains.cloud.test"],
+        "fake1234.cloudfront.net",
     )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
     route53.assert_no_pending_responses()
     db.session.expunge_all()
     service_instance = db.session.get(instance_model, "4321")
-    assert service_instance.route53_change_ids == [bar_com_change_id, foo_com_change_id]
+    assert service_instance.route53_change_ids == [change_id]
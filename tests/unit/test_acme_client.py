@@ -0,0 +1,216 @@
+import json
+import threading
+
+import pytest
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from broker import acme_client
+from broker.extensions import config
+from broker.models import ACMEUser
+
+DIRECTORY = {
+    "newNonce": "https://localhost:14000/nonce-plz",
+    "newAccount": "https://localhost:14000/sign-me-up",
+    "newOrder": "https://localhost:14000/order-plz",
+}
+
+
+class FakeResponse:
+    def json(self):
+        return DIRECTORY
+
+
+class FakeNetwork:
+    def __init__(self):
+        self.gets = 0
+
+    def get(self, url):
+        self.gets += 1
+        return FakeResponse()
+
+
+@pytest.fixture(autouse=True)
+def empty_caches(monkeypatch):
+    monkeypatch.setattr(acme_client, "_directories", {})
+    monkeypatch.setattr(acme_client, "_clients", threading.local())
+
+
+@pytest.fixture
+def acme_user():
+    key = rsa.generate_private_key(
+        public_exponent=65537, key_size=2048, backend=default_backend()
+    )
+    pem = key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.TraditionalOpenSSL,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    return ACMEUser(
+        id=1,
+        private_key_pem=pem.decode(),
+        registration_json=json.dumps({"uri": "https://localhost:14000/my-account"}),
+    )
+
+
+@pytest.fixture
+def cached_directory():
+    acme_client.get_directory(FakeNetwork(), config.ACME_DIRECTORY)
+
+
+def test_get_directory_is_cached():
+    net = FakeNetwork()
+
+    first = acme_client.get_directory(net, config.ACME_DIRECTORY)
+    second = acme_client.get_directory(net, config.ACME_DIRECTORY)
+
+    assert first is second
+    assert net.gets == 1
+    assert first.newOrder == DIRECTORY["newOrder"]
+
+
+def test_get_directory_is_fetched_again_after_ttl(monkeypatch):
+    net = FakeNetwork()
+    acme_client.get_directory(net, config.ACME_DIRECTORY)
+
+    monkeypatch.setattr(config, "ACME_DIRECTORY_TTL_IN_SECONDS", 0)
+    acme_client.get_directory(net, config.ACME_DIRECTORY)
+
+    assert net.gets == 2
+
+
+def test_client_for_reuses_network(acme_user, cached_directory):
+    first = acme_client.client_for(acme_user)
+    second = acme_client.client_for(acme_user)
+
+    assert first.net is second.net
+    assert second.net.account == {"uri": "https://localhost:14000/my-account"}
+
+
+def test_client_for_replaces_idle_network(acme_user, cached_directory, monkeypatch):
+    first = acme_client.client_for(acme_user)
+
+    monkeypatch.setattr(config, "ACME_CLIENT_IDLE_TTL_IN_SECONDS", -1)
+    second = acme_client.client_for(acme_user)
+
+    assert second.net is not first.net
+    assert second.net.account == first.net.account
+
+
+def test_client_for_is_per_thread(acme_user, cached_directory):
+    ours = acme_client.client_for(acme_user)
+    theirs = []
+    thread = threading.Thread(
+        target=lambda: theirs.append(acme_client.client_for(acme_user))
+    )
+    thread.start()
+    thread.join()
+
+    assert theirs[0].net is not ours.net
+
+
+def test_client_for_evicts_least_recently_used(
+    acme_user, cached_directory, monkeypatch
+):
+    monkeypatch.setattr(acme_client, "MAX_CACHED_CLIENTS", 1)
+    first = acme_client.client_for(acme_user)
+
+    other_user = ACMEUser(
+        id=2,
+        private_key_pem=acme_user.private_key_pem,
+        registration_json=acme_user.registration_json,
+    )
+    acme_client.client_for(other_user)
+
+    assert acme_client.client_for(acme_user).net is not first.net
+
+
+def test_map_concurrently_returns_results_in_order(acme_user, cached_directory):
+    def which_thread(client, item):
+        return item, threading.current_thread().name, client.net.account
+
+    results = acme_client.map_concurrently(acme_user, which_thread, [1, 2, 3])
+
+    assert [item for item, _, _ in results] == [1, 2, 3]
+    assert all(thread.startswith("acme") for _, thread, _ in results)
+    assert all(
+        account == json.loads(acme_user.registration_json) for *_, account in results
+    )
+
+
+def test_map_concurrently_raises_errors(acme_user, cached_directory):
+    def fail_on_two(client, item):
+        if item == 2:
+            raise RuntimeError("two")
+        return item
+
+    with pytest.raises(RuntimeError, match="two"):
+        acme_client.map_concurrently(acme_user, fail_on_two, [1, 2, 3])
+
+
+def test_completed_concurrently_yields_each_item_with_its_future(
+    acme_user, cached_directory
+):
+    def fail_on_two(client, item):
+        if item == 2:
+            raise RuntimeError("two")
+        return item * 10
+
+    completed = dict(
+        acme_client.completed_concurrently(acme_user, fail_on_two, [1, 2, 3])
+    )
+
+    assert completed[1].result() == 10
+    assert completed[3].result() == 30
+    with pytest.raises(RuntimeError, match="two"):
+        completed[2].result()
+
+
+CAS = [
+    {"name": "first", "directory": "https://first.example/dir"},
+    {"name": "second", "directory": "https://second.example/dir"},
+    {"name": "third", "directory": "https://third.example/dir"},
+]
+
+
+def test_certificate_authorities_default_to_acme_directory(monkeypatch):
+    monkeypatch.setattr(config, "ACME_CAS", None)
+
+    [ca] = acme_client.certificate_authorities()
+
+    assert ca.directory == config.ACME_DIRECTORY
+    assert ca.rate_limits == config.ACME_RATE_LIMITS
+
+
+def test_client_for_uses_the_accounts_ca(acme_user):
+    acme_user.acme_directory = "https://second.example/dir"
+    acme_client.get_directory(FakeNetwork(), "https://second.example/dir")
+
+    assert acme_client.client_for(acme_user).directory_url == acme_user.acme_directory
+
+
+@pytest.mark.parametrize(
+    "unhealthy,preferred,expected",
+    [
+        (set(), None, ["first", "second", "third"]),
+        (set(), "https://third.example/dir", ["third", "first", "second"]),
+        ({"https://first.example/dir"}, None, ["second", "third", "first"]),
+        (
+            {"https://third.example/dir"},
+            "https://third.example/dir",
+            ["first", "second", "third"],
+        ),
+    ],
+)
+def test_ranked_certificate_authorities(monkeypatch, unhealthy, preferred, expected):
+    monkeypatch.setattr(config, "ACME_CAS", CAS)
+    monkeypatch.setattr(
+        acme_client.ca_health,
+        "is_healthy",
+        lambda directory: directory not in unhealthy,
+    )
+
+    ranked = acme_client.ranked_certificate_authorities(preferred)
+
+    assert [ca.name for ca in ranked] == expected
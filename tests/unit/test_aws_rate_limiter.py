@@ -0,0 +1,23 @@
+from redis import Redis
+
+from broker.lib.aws_rate_limiter import AWSRateLimiter
+
+
+def test_api_rate_is_used_over_service_rate():
+    limiter = AWSRateLimiter(
+        {"cloudfront": 5, "cloudfront.UpdateDistribution": 1}, redis=Redis()
+    )
+
+    assert limiter.bucket_for("cloudfront", "UpdateDistribution") == (
+        "cloudfront.UpdateDistribution"
+    )
+    assert limiter.bucket_for("cloudfront", "GetDistribution") == "cloudfront"
+    assert limiter.bucket_for("route53", "GetChange") is None
+
+
+def test_unlimited_apis_do_not_wait():
+    # no redis is configured, so this would fail if it tried to take a token
+    limiter = AWSRateLimiter({"route53": 0}, redis=Redis(host="nowhere"))
+
+    assert limiter.wait("aws", "route53", "GetChange") == 0
+    assert limiter.wait("aws", "cloudfront", "GetDistribution") == 0
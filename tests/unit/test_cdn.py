@@ -3,7 +3,13 @@ import pytest
 from openbrokerapi import errors
 
 from broker.aws import cloudfront as real_cloudfront
-from broker.lib.cdn import parse_cache_policy, parse_origin_request_policy
+from broker.lib.cdn import (
+    parse_cache_policy,
+    parse_compress,
+    parse_http_version,
+    parse_origin_request_policy,
+    parse_origin_shield_region,
+)
 from broker.lib.cache_policy_manager import CachePolicyManager
 from broker.lib.origin_request_policy_manager import OriginRequestPolicyManager
 
@@ -67,3 +73,47 @@ def test_parse_origin_request_policy_raises_error_invalid_origin_request_policy(
         parse_origin_request_policy(
             {"origin_request_policy": "FakePolicy"}, origin_request_policy_manager
         )
+
+
+def test_parse_origin_shield_region_returns_none():
+    assert parse_origin_shield_region({}) == None
+    assert parse_origin_shield_region({"origin_shield_region": None}) == None
+
+
+def test_parse_origin_shield_region_returns_valid_region():
+    assert (
+        parse_origin_shield_region({"origin_shield_region": "us-east-1"}) == "us-east-1"
+    )
+
+
+def test_parse_origin_shield_region_raises_error_invalid_region():
+    with pytest.raises(errors.ErrBadRequest):
+        parse_origin_shield_region({"origin_shield_region": "us-gov-west-1"})
+
+
+def test_parse_http_version_returns_default():
+    assert parse_http_version({}) == "http2and3"
+    assert parse_http_version({"http_version": None}) == "http2and3"
+
+
+def test_parse_http_version_returns_valid_version():
+    assert parse_http_version({"http_version": "http2"}) == "http2"
+
+
+def test_parse_http_version_raises_error_invalid_version():
+    with pytest.raises(errors.ErrBadRequest):
+        parse_http_version({"http_version": "http1.1"})
+
+
+def test_parse_compress_returns_default():
+    assert parse_compress({}) is True
+    assert parse_compress({"compress": None}) is True
+
+
+def test_parse_compress_returns_false():
+    assert parse_compress({"compress": False}) is False
+
+
+def test_parse_compress_raises_error_not_bool():
+    with pytest.raises(errors.ErrBadRequest):
+        parse_compress({"compress": "yes"})
@@ -0,0 +1,81 @@
+import pytest
+
+from broker.lib.distribution_config import diff, DistributionConfigBuilder
+
+# registers the broker's edits
+import broker.tasks.cloudfront  # noqa F401
+
+
+def distribution_config(**overrides):
+    config = {
+        "Aliases": {"Quantity": 2, "Items": ["example.com", "foo.com"]},
+        "Origins": {
+            "Quantity": 1,
+            "Items": [
+                {
+                    "Id": "default-origin",
+                    "DomainName": "origin.example.com",
+                    "OriginPath": "",
+                }
+            ],
+        },
+        "ViewerCertificate": {"IAMCertificateId": "certificate_id"},
+        "Enabled": True,
+    }
+    config.update(overrides)
+    return config
+
+
+def test_diff_same_config():
+    assert diff(distribution_config(), distribution_config()) == []
+
+
+def test_diff_nested_value():
+    new = distribution_config()
+    new["Origins"]["Items"][0]["DomainName"] = "new-origin.example.com"
+
+    assert diff(distribution_config(), new) == ["Origins.Items[0].DomainName"]
+
+
+def test_diff_list_length():
+    new = distribution_config(
+        Aliases={"Quantity": 1, "Items": ["example.com"]},
+    )
+
+    assert diff(distribution_config(), new) == ["Aliases.Items", "Aliases.Quantity"]
+
+
+def test_diff_added_and_removed_keys():
+    new = distribution_config(WebACLId="arn:aws:wafv2::acl")
+    del new["Enabled"]
+
+    assert diff(distribution_config(), new) == ["Enabled", "WebACLId"]
+
+
+def test_builder_makes_every_edit():
+    builder = DistributionConfigBuilder()
+    builder.add("certificate", iam_server_certificate_id="new_certificate_id")
+    builder.add("remove_acme_challenge_origin")
+
+    # saved between steps
+    builder = DistributionConfigBuilder(builder.edits)
+    config = builder.build(distribution_config(CacheBehaviors={"Quantity": 0}), None)
+
+    assert config["ViewerCertificate"]["IAMCertificateId"] == "new_certificate_id"
+    assert builder.edits == [
+        ["certificate", {"iam_server_certificate_id": "new_certificate_id"}],
+        ["remove_acme_challenge_origin", {}],
+    ]
+
+
+def test_builder_replaces_an_edit_added_again():
+    builder = DistributionConfigBuilder()
+    builder.add("certificate", iam_server_certificate_id="first")
+    builder.add("certificate", iam_server_certificate_id="second")
+
+    assert builder.edits == [["certificate", {"iam_server_certificate_id": "second"}]]
+
+
+def test_builder_rejects_unknown_edits():
+    with pytest.raises(ValueError):
+        DistributionConfigBuilder().add("enable_http3")
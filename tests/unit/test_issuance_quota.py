@@ -0,0 +1,69 @@
+import pytest
+
+from broker.lib.issuance_quota import IssuanceQuota, registered_domain
+
+LIMITS = {
+    "new_orders_per_account": [300, 10800],
+    "certificates_per_registered_domain": [50, 604800],
+    "certificates_per_exact_set": [5, 604800],
+    "failed_validations_per_hostname": [5, 3600],
+}
+
+
+@pytest.mark.parametrize(
+    "hostname,expected",
+    [
+        ("example.com", "example.com"),
+        ("www.example.com", "example.com"),
+        ("a.b.agency.gov", "agency.gov"),
+        ("www.example.co.uk", "example.co.uk"),
+        ("WWW.Example.com.", "example.com"),
+        ("www.example.io", "example.io"),
+    ],
+)
+def test_registered_domain(hostname, expected):
+    assert registered_domain(hostname) == expected
+
+
+def test_windows_for_new_certificates():
+    quota = IssuanceQuota("letsencrypt", LIMITS, True, {})
+
+    windows = quota.windows_for(1, ["www.example.com", "example.com"], False)
+
+    keys = [(key.split(":")[2], counts) for key, _, _, counts in windows]
+    assert keys == [
+        ("new_orders_per_account", True),
+        ("certificates_per_registered_domain", True),
+        ("certificates_per_exact_set", True),
+        ("failed_validations_per_hostname", False),
+        ("failed_validations_per_hostname", False),
+    ]
+
+
+def test_windows_for_renewals_skip_registered_domain():
+    quota = IssuanceQuota("letsencrypt", LIMITS, True, {})
+
+    windows = quota.windows_for(1, ["example.com"], True)
+
+    assert not any("certificates_per_registered_domain" in key for key, *_ in windows)
+
+
+def test_exact_set_ignores_order_and_case():
+    quota = IssuanceQuota("letsencrypt", LIMITS, True, {})
+
+    def exact_set(domain_names):
+        return [
+            key
+            for key, *_ in quota.windows_for(1, domain_names, False)
+            if "exact_set" in key
+        ]
+
+    assert exact_set(["a.example.com", "B.example.com"]) == exact_set(
+        ["b.example.com", "a.example.com"]
+    )
+
+
+def test_disabled_quota_admits_everything():
+    quota = IssuanceQuota("letsencrypt", LIMITS, False, {})
+
+    assert quota.admit("certificate:1", 1, ["example.com"], False) == 0
@@ -0,0 +1,26 @@
+from acme import messages
+
+from broker.tasks.letsencrypt import valid_authorization_domains
+
+
+def authorization(domain, status):
+    return messages.AuthorizationResource(
+        uri=f"https://localhost:14000/authZ/{domain}",
+        body=messages.Authorization(
+            identifier=messages.Identifier(typ=messages.IDENTIFIER_FQDN, value=domain),
+            status=status,
+        ),
+    )
+
+
+def test_valid_authorization_domains():
+    order = messages.OrderResource(
+        uri="https://localhost:14000/my-order",
+        authorizations=[
+            authorization("example.com", messages.STATUS_VALID),
+            authorization("foo.com", messages.STATUS_PENDING),
+            authorization("bar.com", messages.STATUS_INVALID),
+        ],
+    )
+
+    assert valid_authorization_domains(order) == {"example.com"}
@@ -0,0 +1,49 @@
+import pytest
+import requests
+from acme import errors as acme_errors
+from acme import messages as acme_messages
+from botocore.exceptions import ClientError, EndpointConnectionError
+from sqlalchemy.exc import OperationalError
+
+from broker.lib.retry_policy import Retry, RetryPolicy
+
+
+def client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": "oops"}}, "SomeOperation")
+
+
+@pytest.mark.parametrize(
+    "error,expected",
+    [
+        (client_error("Throttling"), Retry.FAST),
+        (client_error("PriorRequestNotComplete"), Retry.FAST),
+        (client_error("AccessDenied"), Retry.NEVER),
+        (client_error("InvalidChangeBatch"), Retry.NEVER),
+        (client_error("NoSuchDistribution"), Retry.SLOW),
+        (EndpointConnectionError(endpoint_url="https://example.com"), Retry.FAST),
+        (requests.ConnectionError(), Retry.FAST),
+        (acme_errors.ValidationError([]), Retry.NEVER),
+        (acme_messages.Error.with_code("badNonce"), Retry.FAST),
+        (acme_messages.Error.with_code("rejectedIdentifier"), Retry.NEVER),
+        (acme_messages.Error.with_code("serverInternal"), Retry.SLOW),
+        (OperationalError("select 1", {}, Exception("gone")), Retry.FAST),
+        (RuntimeError("who knows"), Retry.SLOW),
+    ],
+)
+def test_classifies_errors(error, expected):
+    assert RetryPolicy().classify(error) == expected
+
+
+def test_fast_retries_back_off_up_to_the_max():
+    policy = RetryPolicy(fast_delay=2, max_fast_delay=60)
+
+    for attempt, ceiling in [(0, 2), (1, 4), (3, 16), (10, 60)]:
+        delay = policy.delay(Retry.FAST, attempt)
+        assert ceiling / 2 <= delay <= ceiling
+
+
+def test_slow_retries_wait_the_slow_delay():
+    policy = RetryPolicy(slow_delay=600)
+
+    assert policy.delay(Retry.SLOW, 0) == 600
+    assert policy.delay(Retry.SLOW, 10) == 600
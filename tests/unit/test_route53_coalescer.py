@@ -0,0 +1,52 @@
+from broker.lib.route53_coalescer import chunk_changes
+
+
+def txt_change(action, name, value):
+    return {
+        "Action": action,
+        "ResourceRecordSet": {
+            "Type": "TXT",
+            "Name": name,
+            "ResourceRecords": [{"Value": value}],
+            "TTL": 60,
+        },
+    }
+
+
+def alias_change(action, name):
+    return {
+        "Action": action,
+        "ResourceRecordSet": {
+            "Type": "A",
+            "Name": name,
+            "AliasTarget": {
+                "DNSName": "example.cloudfront.net",
+                "HostedZoneId": "Z2FDTNDATAQYW2",
+                "EvaluateTargetHealth": False,
+            },
+        },
+    }
+
+
+def test_small_change_sets_are_one_batch():
+    changes = [txt_change("UPSERT", f"{i}.example.com", '"abc"') for i in range(10)]
+
+    assert chunk_changes(changes) == [changes]
+
+
+def test_upserts_count_twice_toward_the_record_limit():
+    upserts = [alias_change("UPSERT", f"{i}.example.com") for i in range(600)]
+    deletes = [alias_change("DELETE", f"{i}.example.com") for i in range(600)]
+
+    assert [len(chunk) for chunk in chunk_changes(upserts)] == [500, 100]
+    assert [len(chunk) for chunk in chunk_changes(deletes)] == [600]
+
+
+def test_batches_stay_under_the_character_limit():
+    # each upsert counts as 2 x 100 characters
+    changes = [txt_change("UPSERT", f"{i}.example.com", "x" * 100) for i in range(300)]
+
+    chunks = chunk_changes(changes)
+
+    assert [len(chunk) for chunk in chunks] == [160, 140]
+    assert [change for chunk in chunks for change in chunk] == changes
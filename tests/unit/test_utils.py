@@ -3,7 +3,11 @@ import uuid
 
 from openbrokerapi import errors
 
-from broker.lib.utils import parse_domain_options, validate_domain_name_changes
+from broker.lib.utils import (
+    parse_domain_options,
+    parse_key_type,
+    validate_domain_name_changes,
+)
 from tests.lib import factories
 
 
@@ -230,3 +234,13 @@ def test_validate_domain_name_changes_errors_on_non_unique_domains(
 
         with pytest.raises(errors.ErrBadRequest):
             validate_domain_name_changes(domain_names, new_instance)
+
+
+def test_parse_key_type():
+    assert parse_key_type({}) is None
+    assert parse_key_type(dict(key_type="rsa")) == "RSA"
+    assert parse_key_type(dict(key_type="ECDSA")) == "ECDSA"
+    with pytest.raises(errors.ErrBadRequest):
+        parse_key_type(dict(key_type="dsa"))
+    with pytest.raises(errors.ErrBadRequest):
+        parse_key_type(dict(key_type=256))